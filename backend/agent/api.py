@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, Body, File, UploadFile, Form, Query
 from fastapi.responses import StreamingResponse
 import asyncio
+import base64
 import json
 import traceback
 from datetime import datetime, timezone
@@ -16,13 +17,15 @@ from utils.logger import logger, structlog
 from services.billing import check_billing_status, can_use_model
 from utils.config import config
 from sandbox.sandbox import create_sandbox, delete_sandbox, get_or_start_sandbox
+from sandbox.file_transfer import upload_files
 from services.llm import make_llm_api_call
 from agent.run_agent import run_agent_run_stream, update_agent_run_status, get_stream_context
 from utils.constants import MODEL_NAME_ALIASES
 from flags.flags import is_enabled
 
-from .config_helper import extract_agent_config, build_unified_config, extract_tools_for_agent_run, get_mcp_configs
+from .config_helper import build_unified_config, extract_tools_for_agent_run, get_mcp_configs
 from .utils import check_for_active_project_agent_run
+from .config_cache import get_agent_config, get_default_agent_config, invalidate_agent_config
 
 # Initialize shared resources
 router = APIRouter()
@@ -115,6 +118,7 @@ class PaginationInfo(BaseModel):
     limit: int
     total: int
     pages: int
+    next_cursor: Optional[str] = None
 
 class AgentsResponse(BaseModel):
     agents: List[AgentResponse]
@@ -261,34 +265,26 @@ async def start_agent(
     effective_agent_id = body.agent_id or thread_agent_id  # Use provided agent_id or the one stored in thread
     
     if effective_agent_id:
-        # Get agent with current version
-        agent_result = await client.table('agents').select('*, agent_versions!current_version_id(*)').eq('agent_id', effective_agent_id).eq('account_id', account_id).execute()
-        if not agent_result.data:
+        # Get agent with current version (cached until the agent or its versions change)
+        agent_config = await get_agent_config(client, effective_agent_id, account_id)
+        if not agent_config:
             if body.agent_id:
                 raise HTTPException(status_code=404, detail="Agent not found or access denied")
             else:
                 logger.warning(f"Stored agent_id {effective_agent_id} not found, falling back to default")
                 effective_agent_id = None
         else:
-            agent_data = agent_result.data[0]
-            version_data = agent_data.get('agent_versions')
-            agent_config = extract_agent_config(agent_data, version_data)
-            
-            if version_data:
-                logger.info(f"Using agent {agent_config['name']} ({effective_agent_id}) version {agent_config.get('version_name', 'v1')}")
+            if agent_config.get('version_name'):
+                logger.info(f"Using agent {agent_config['name']} ({effective_agent_id}) version {agent_config['version_name']}")
             else:
                 logger.info(f"Using agent {agent_config['name']} ({effective_agent_id}) - no version data")
             source = "request" if body.agent_id else "thread"
     
     if not agent_config:
-        default_agent_result = await client.table('agents').select('*, agent_versions!current_version_id(*)').eq('account_id', account_id).eq('is_default', True).execute()
-        if default_agent_result.data:
-            agent_data = default_agent_result.data[0]
-            version_data = agent_data.get('agent_versions')
-            agent_config = extract_agent_config(agent_data, version_data)
-            
-            if version_data:
-                logger.info(f"Using default agent: {agent_config['name']} ({agent_config['agent_id']}) version {agent_config.get('version_name', 'v1')}")
+        agent_config = await get_default_agent_config(client, account_id)
+        if agent_config:
+            if agent_config.get('version_name'):
+                logger.info(f"Using default agent: {agent_config['name']} ({agent_config['agent_id']}) version {agent_config['version_name']}")
             else:
                 logger.info(f"Using default agent: {agent_config['name']} ({agent_config['agent_id']}) - no version data")
     
@@ -739,16 +735,14 @@ async def initiate_agent_with_files(
     # Load agent configuration if agent_id is provided
     agent_config = None
     if agent_id:
-        agent_result = await client.table('agents').select('*').eq('agent_id', agent_id).eq('account_id', account_id).execute()
-        if not agent_result.data:
+        agent_config = await get_agent_config(client, agent_id, account_id)
+        if not agent_config:
             raise HTTPException(status_code=404, detail="Agent not found or access denied")
-        agent_config = agent_result.data[0]
         logger.info(f"Using custom agent: {agent_config['name']} ({agent_id})")
     else:
         # Try to get default agent for the account
-        default_agent_result = await client.table('agents').select('*').eq('account_id', account_id).eq('is_default', True).execute()
-        if default_agent_result.data:
-            agent_config = default_agent_result.data[0]
+        agent_config = await get_default_agent_config(client, account_id)
+        if agent_config:
             logger.info(f"Using default agent: {agent_config['name']} ({agent_config['agent_id']})")
     
     can_use, model_message, allowed_models = await can_use_model(client, account_id, model_name)
@@ -856,46 +850,28 @@ async def initiate_agent_with_files(
         if files:
             successful_uploads = []
             failed_uploads = []
+            uploads = []
             for file in files:
                 if file.filename:
-                    try:
-                        safe_filename = file.filename.replace('/', '_').replace('\\', '_')
-                        target_path = f"/workspace/{safe_filename}"
-                        logger.info(f"Attempting to upload {safe_filename} to {target_path} in sandbox {sandbox_id}")
-                        content = await file.read()
-                        upload_successful = False
-                        try:
-                            if hasattr(sandbox, 'fs') and hasattr(sandbox.fs, 'upload_file'):
-                                await sandbox.fs.upload_file(content, target_path)
-                                logger.debug(f"Called sandbox.fs.upload_file for {target_path}")
-                                upload_successful = True
-                            else:
-                                raise NotImplementedError("Suitable upload method not found on sandbox object.")
-                        except Exception as upload_error:
-                            logger.error(f"Error during sandbox upload call for {safe_filename}: {str(upload_error)}", exc_info=True)
-
-                        if upload_successful:
-                            try:
-                                await asyncio.sleep(0.2)
-                                parent_dir = os.path.dirname(target_path)
-                                files_in_dir = await sandbox.fs.list_files(parent_dir)
-                                file_names_in_dir = [f.name for f in files_in_dir]
-                                if safe_filename in file_names_in_dir:
-                                    successful_uploads.append(target_path)
-                                    logger.info(f"Successfully uploaded and verified file {safe_filename} to sandbox path {target_path}")
-                                else:
-                                    logger.error(f"Verification failed for {safe_filename}: File not found in {parent_dir} after upload attempt.")
-                                    failed_uploads.append(safe_filename)
-                            except Exception as verify_error:
-                                logger.error(f"Error verifying file {safe_filename} after upload: {str(verify_error)}", exc_info=True)
-                                failed_uploads.append(safe_filename)
-                        else:
-                            failed_uploads.append(safe_filename)
-                    except Exception as file_error:
-                        logger.error(f"Error processing file {file.filename}: {str(file_error)}", exc_info=True)
-                        failed_uploads.append(file.filename)
-                    finally:
-                        await file.close()
+                    safe_filename = file.filename.replace('/', '_').replace('\\', '_')
+                    uploads.append((f"/workspace/{safe_filename}", file.file))
+            try:
+                # Send all files in one archive; the manifest carries per-file hash verification
+                logger.info(f"Uploading {len(uploads)} files to sandbox {sandbox_id}")
+                manifest = await upload_files(sandbox, uploads)
+                for target_path, entry in manifest.items():
+                    if entry["verified"]:
+                        successful_uploads.append(target_path)
+                        logger.info(f"Successfully uploaded and verified file {target_path} in sandbox {sandbox_id}")
+                    else:
+                        logger.error(f"Verification failed for {target_path}: hash mismatch after upload.")
+                        failed_uploads.append(os.path.basename(target_path))
+            except Exception as upload_error:
+                logger.error(f"Error uploading files to sandbox {sandbox_id}: {str(upload_error)}", exc_info=True)
+                failed_uploads.extend(os.path.basename(target_path) for target_path, _ in uploads)
+            finally:
+                for file in files:
+                    await file.close()
 
             if successful_uploads:
                 message_content += "\n\n" if message_content else ""
@@ -959,9 +935,14 @@ async def get_agents(
     has_default: Optional[bool] = Query(None, description="Filter by default agents"),
     has_mcp_tools: Optional[bool] = Query(None, description="Filter by agents with MCP tools"),
     has_agentpress_tools: Optional[bool] = Query(None, description="Filter by agents with AgentPress tools"),
-    tools: Optional[str] = Query(None, description="Comma-separated list of tools to filter by")
+    tools: Optional[str] = Query(None, description="Comma-separated list of tools to filter by"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page, for keyset pagination")
 ):
-    """Get agents for the current user with pagination, search, sort, and filter support."""
+    """Get agents for the current user with pagination, search, sort, and filter support.
+    
+    Filtering, sorting, counting and pagination all run in the get_account_agents RPC,
+    which also joins each agent's current version.
+    """
     if not await is_enabled("custom_agents"):
         raise HTTPException(
             status_code=403, 
@@ -970,127 +951,41 @@ async def get_agents(
     logger.info(f"Fetching agents for user: {user_id} with page={page}, limit={limit}, search='{search}', sort_by={sort_by}, sort_order={sort_order}")
     client = await db.client
     
+    tools_filter = []
+    if tools:
+        tools_filter = [tool.strip() for tool in tools.split(',') if tool.strip()]
+    
+    params = {
+        'p_account_id': user_id,
+        'p_search': search or None,
+        'p_has_default': has_default,
+        'p_has_mcp_tools': has_mcp_tools,
+        'p_has_agentpress_tools': has_agentpress_tools,
+        'p_tools': tools_filter or None,
+        'p_sort_by': sort_by if sort_by in ("name", "created_at", "updated_at", "tools_count") else "created_at",
+        'p_sort_order': sort_order,
+        'p_limit': limit,
+        'p_offset': (page - 1) * limit
+    }
+    if cursor:
+        try:
+            cursor_value, cursor_agent_id = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        params['p_cursor_value'] = str(cursor_value)
+        params['p_cursor_agent_id'] = cursor_agent_id
+    
     try:
-        # Calculate offset
-        offset = (page - 1) * limit
-        
-        # Start building the query - include version data
-        query = client.table('agents').select('*, agent_versions!current_version_id(*)', count='exact').eq("account_id", user_id)
-        
-        # Apply search filter
-        if search:
-            search_term = f"%{search}%"
-            query = query.or_(f"name.ilike.{search_term},description.ilike.{search_term}")
-        
-        # Apply filters
-        if has_default is not None:
-            query = query.eq("is_default", has_default)
-        
-        # For MCP and AgentPress tools filtering, we'll need to do post-processing
-        # since Supabase doesn't have great JSON array/object filtering
-        
-        # Apply sorting
-        if sort_by == "name":
-            query = query.order("name", desc=(sort_order == "desc"))
-        elif sort_by == "updated_at":
-            query = query.order("updated_at", desc=(sort_order == "desc"))
-        elif sort_by == "created_at":
-            query = query.order("created_at", desc=(sort_order == "desc"))
-        else:
-            # Default to created_at
-            query = query.order("created_at", desc=(sort_order == "desc"))
-        
-        # Execute query to get total count first
-        count_result = await query.execute()
-        total_count = count_result.count
-        
-        # Now get the actual data with pagination
-        query = query.range(offset, offset + limit - 1)
-        agents_result = await query.execute()
-        
-        if not agents_result.data:
-            logger.info(f"No agents found for user: {user_id}")
-            return {
-                "agents": [],
-                "pagination": {
-                    "page": page,
-                    "limit": limit,
-                    "total": 0,
-                    "pages": 0
-                }
-            }
-        
-        # Post-process for tool filtering and tools_count sorting
-        agents_data = agents_result.data
-        
-        # Apply tool-based filters
-        if has_mcp_tools is not None or has_agentpress_tools is not None or tools:
-            filtered_agents = []
-            tools_filter = []
-            if tools:
-                tools_filter = [tool.strip() for tool in tools.split(',') if tool.strip()]
-            
-            for agent in agents_data:
-                # Check MCP tools filter
-                if has_mcp_tools is not None:
-                    has_mcp = bool(agent.get('configured_mcps') and len(agent.get('configured_mcps', [])) > 0)
-                    if has_mcp_tools != has_mcp:
-                        continue
-                
-                # Check AgentPress tools filter
-                if has_agentpress_tools is not None:
-                    agentpress_tools = agent.get('agentpress_tools', {})
-                    has_enabled_tools = any(
-                        tool_data and isinstance(tool_data, dict) and tool_data.get('enabled', False)
-                        for tool_data in agentpress_tools.values()
-                    )
-                    if has_agentpress_tools != has_enabled_tools:
-                        continue
-                
-                # Check specific tools filter
-                if tools_filter:
-                    agent_tools = set()
-                    # Add MCP tools
-                    for mcp in agent.get('configured_mcps', []):
-                        if isinstance(mcp, dict) and 'name' in mcp:
-                            agent_tools.add(f"mcp:{mcp['name']}")
-                    
-                    # Add enabled AgentPress tools
-                    for tool_name, tool_data in agent.get('agentpress_tools', {}).items():
-                        if tool_data and isinstance(tool_data, dict) and tool_data.get('enabled', False):
-                            agent_tools.add(f"agentpress:{tool_name}")
-                    
-                    # Check if any of the requested tools are present
-                    if not any(tool in agent_tools for tool in tools_filter):
-                        continue
-                
-                filtered_agents.append(agent)
-            
-            agents_data = filtered_agents
-        
-        # Handle tools_count sorting (post-processing required)
-        if sort_by == "tools_count":
-            def get_tools_count(agent):
-                mcp_count = len(agent.get('configured_mcps', []))
-                agentpress_count = sum(
-                    1 for tool_data in agent.get('agentpress_tools', {}).values()
-                    if tool_data and isinstance(tool_data, dict) and tool_data.get('enabled', False)
-                )
-                return mcp_count + agentpress_count
-            
-            agents_data.sort(key=get_tools_count, reverse=(sort_order == "desc"))
-        
-        # Apply pagination to filtered results if we did post-processing
-        if has_mcp_tools is not None or has_agentpress_tools is not None or tools or sort_by == "tools_count":
-            total_count = len(agents_data)
-            agents_data = agents_data[offset:offset + limit]
+        result = await client.rpc('get_account_agents', params).execute()
+        agents_data = result.data['agents']
+        total_count = result.data['total']
         
         # Format the response
         agent_list = []
         for agent in agents_data:
             current_version = None
-            if agent.get('agent_versions'):
-                version_data = agent['agent_versions']
+            if agent.get('current_version'):
+                version_data = agent['current_version']
                 current_version = AgentVersionResponse(
                     version_id=version_data['version_id'],
                     agent_id=version_data['agent_id'],
@@ -1129,6 +1024,12 @@ async def get_agents(
                 current_version=current_version
             ))
         
+        next_cursor = None
+        if len(agents_data) == limit:
+            last = agents_data[-1]
+            position = [last[params['p_sort_by']], last['agent_id']]
+            next_cursor = base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('utf-8')
+        
         total_pages = (total_count + limit - 1) // limit
         
         logger.info(f"Found {len(agent_list)} agents for user: {user_id} (page {page}/{total_pages})")
@@ -1138,7 +1039,8 @@ async def get_agents(
                 "page": page,
                 "limit": limit,
                 "total": total_count,
-                "pages": total_pages
+                "pages": total_pages,
+                "next_cursor": next_cursor
             }
         }
         
@@ -1236,7 +1138,9 @@ async def create_agent(
     try:
         # If this is set as default, we need to unset other defaults first
         if agent_data.is_default:
-            await client.table('agents').update({"is_default": False}).eq("account_id", user_id).eq("is_default", True).execute()
+            previous_defaults = await client.table('agents').update({"is_default": False}).eq("account_id", user_id).eq("is_default", True).execute()
+            for previous_default in previous_defaults.data or []:
+                await invalidate_agent_config(previous_default['agent_id'])
         
         # Build unified config
         unified_config = build_unified_config(
@@ -1299,6 +1203,7 @@ async def create_agent(
             agent['current_version_id'] = version['version_id']
             agent['current_version'] = version
         
+        await invalidate_agent_config(agent['agent_id'], user_id)
         logger.info(f"Created agent {agent['agent_id']} with v1 for user: {user_id}")
         
         return AgentResponse(
@@ -1464,7 +1369,9 @@ async def update_agent(
             update_data["is_default"] = agent_data.is_default
             # If setting as default, unset other defaults first
             if agent_data.is_default:
-                await client.table('agents').update({"is_default": False}).eq("account_id", user_id).eq("is_default", True).neq("agent_id", agent_id).execute()
+                previous_defaults = await client.table('agents').update({"is_default": False}).eq("account_id", user_id).eq("is_default", True).neq("agent_id", agent_id).execute()
+                for previous_default in previous_defaults.data or []:
+                    await invalidate_agent_config(previous_default['agent_id'])
         if agent_data.avatar is not None:
             update_data["avatar"] = agent_data.avatar
         if agent_data.avatar_color is not None:
@@ -1629,6 +1536,9 @@ async def update_agent(
     except Exception as e:
         logger.error(f"Error updating agent {agent_id} for user {user_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to update agent: {str(e)}")
+    finally:
+        # Any exit may follow a partial write (initial version, default flag, new version)
+        await invalidate_agent_config(agent_id, user_id)
 
 @router.delete("/agents/{agent_id}")
 async def delete_agent(agent_id: str, user_id: str = Depends(get_current_user_id_from_jwt)):
@@ -1657,6 +1567,7 @@ async def delete_agent(agent_id: str, user_id: str = Depends(get_current_user_id
         
         # Delete the agent
         await client.table('agents').delete().eq('agent_id', agent_id).execute()
+        await invalidate_agent_config(agent_id, user_id)
         
         logger.info(f"Successfully deleted agent: {agent_id}")
         return {"message": "Agent deleted successfully"}
@@ -1807,6 +1718,7 @@ async def create_agent_version(
         "current_version_id": version['version_id'],
         "version_count": next_version_number
     }).eq("agent_id", agent_id).execute()
+    await invalidate_agent_config(agent_id)
     
     logger.info(f"Created version v{next_version_number} for agent {agent_id}")
     
@@ -1835,6 +1747,7 @@ async def activate_agent_version(
     await client.table('agents').update({
         "current_version_id": version_id
     }).eq("agent_id", agent_id).execute()
+    await invalidate_agent_config(agent_id)
     
     return {"message": "Version activated successfully"}
 
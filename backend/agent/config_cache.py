@@ -0,0 +1,168 @@
+"""
+Cache of resolved agent configurations.
+
+Starting a run needs the agent row, its current version and the merged config built
+by extract_agent_config. That result only changes when the agent is edited or a new
+version is created, so it is cached in Redis (shared by all workers) with a short-lived
+in-process copy in front of it. Configs are keyed by agent ID and version ID and are
+reached through a small per-agent pointer holding the agent's current_version_id and
+updated_at; the code paths that update agents or create/activate versions call
+invalidate_agent_config, which drops that pointer so the next lookup follows the new
+version.
+
+The default agent of each account is cached the same way, as a pointer to its agent ID.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from services import redis
+from utils.logger import logger
+
+from .config_helper import extract_agent_config
+
+AGENT_CONFIG_CACHE_KEY = "agent_config:{agent_id}:{version_id}"
+AGENT_VERSION_CACHE_KEY = "agent_config:current:{agent_id}"
+DEFAULT_AGENT_CACHE_KEY = "agent_config:default:{account_id}"
+AGENT_CONFIG_CACHE_TTL = 60 * 60
+# The in-process copy is not reached by invalidations from other workers, so it is
+# kept only briefly; within a worker invalidation is immediate
+AGENT_CONFIG_LOCAL_TTL = 10
+AGENT_CONFIG_LOCAL_MAX_ENTRIES = 512
+# Stored in place of an agent ID for accounts without a default agent
+NO_DEFAULT_AGENT = "none"
+# Used in the config key of agents without a current version
+NO_VERSION = "none"
+
+_local: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+
+
+def _local_get(key: str) -> Any:
+    entry = _local.get(key)
+    if entry is None:
+        return None
+    value, expires_at = entry
+    if time.monotonic() >= expires_at:
+        del _local[key]
+        return None
+    _local.move_to_end(key)
+    return value
+
+
+def _local_set(key: str, value: Any):
+    _local[key] = (value, time.monotonic() + AGENT_CONFIG_LOCAL_TTL)
+    _local.move_to_end(key)
+    while len(_local) > AGENT_CONFIG_LOCAL_MAX_ENTRIES:
+        _local.popitem(last=False)
+
+
+async def _cache_get(key: str, what: str) -> Any:
+    value = _local_get(key)
+    if value is not None:
+        return value
+    try:
+        cached = await redis.get(key)
+        if cached:
+            value = json.loads(cached)
+            _local_set(key, value)
+            return value
+    except Exception as e:
+        logger.warning(f"Failed to read cached {what}: {str(e)}")
+    return None
+
+
+async def _cache_set(key: str, value: Any, what: str):
+    _local_set(key, value)
+    try:
+        await redis.set(key, json.dumps(value), ex=AGENT_CONFIG_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to cache {what}: {str(e)}")
+
+
+async def _load_entry(client, agent_id: str) -> Optional[Dict[str, Any]]:
+    """Resolve an agent's config for its current version, from the caches when possible."""
+    pointer_key = AGENT_VERSION_CACHE_KEY.format(agent_id=agent_id)
+    pointer = await _cache_get(pointer_key, f"current version of agent {agent_id}")
+    if pointer is not None:
+        key = AGENT_CONFIG_CACHE_KEY.format(agent_id=agent_id, version_id=pointer['version_id'] or NO_VERSION)
+        entry = await _cache_get(key, f"config of agent {agent_id}")
+        # updated_at catches edits to the agent row that didn't create a new version
+        if entry is not None and entry['updated_at'] == pointer['updated_at']:
+            return entry
+
+    result = await client.table('agents').select('*, agent_versions!current_version_id(*)').eq('agent_id', agent_id).execute()
+    if not result.data:
+        return None
+    agent_data = result.data[0]
+    version_data = agent_data.get('agent_versions')
+    version_id = agent_data.get('current_version_id')
+    entry = {
+        'agent_id': agent_data['agent_id'],
+        'account_id': agent_data['account_id'],
+        'version_id': version_id,
+        'updated_at': agent_data.get('updated_at'),
+        'config': extract_agent_config(agent_data, version_data)
+    }
+
+    key = AGENT_CONFIG_CACHE_KEY.format(agent_id=agent_id, version_id=version_id or NO_VERSION)
+    await _cache_set(key, entry, f"config of agent {agent_id}")
+    await _cache_set(pointer_key, {'version_id': version_id, 'updated_at': entry['updated_at']},
+                     f"current version of agent {agent_id}")
+    return entry
+
+
+async def get_agent_config(client, agent_id: str, account_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Resolved configuration of an agent (as built by extract_agent_config).
+
+    Returns None if the agent doesn't exist or doesn't belong to `account_id` when given.
+    The returned dict is a copy and may be modified by the caller.
+    """
+    entry = await _load_entry(client, agent_id)
+    if not entry or (account_id and entry['account_id'] != account_id):
+        return None
+    return json.loads(json.dumps(entry['config']))
+
+
+async def get_default_agent_config(client, account_id: str) -> Optional[Dict[str, Any]]:
+    """Resolved configuration of the account's default agent, if it has one."""
+    key = DEFAULT_AGENT_CACHE_KEY.format(account_id=account_id)
+    agent_id = _local_get(key)
+    if agent_id is None:
+        try:
+            agent_id = await redis.get(key)
+        except Exception as e:
+            logger.warning(f"Failed to read cached default agent of account {account_id}: {str(e)}")
+        if agent_id is None:
+            result = await client.table('agents').select('agent_id').eq('account_id', account_id).eq('is_default', True).execute()
+            agent_id = result.data[0]['agent_id'] if result.data else NO_DEFAULT_AGENT
+            try:
+                await redis.set(key, agent_id, ex=AGENT_CONFIG_CACHE_TTL)
+            except Exception as e:
+                logger.warning(f"Failed to cache default agent of account {account_id}: {str(e)}")
+        _local_set(key, agent_id)
+
+    if agent_id == NO_DEFAULT_AGENT:
+        return None
+    return await get_agent_config(client, agent_id, account_id)
+
+
+async def invalidate_agent_config(agent_id: Optional[str] = None, account_id: Optional[str] = None):
+    """Drop cached configs after an agent or its versions change.
+
+    Only the agent's current-version pointer is dropped; configs cached for other
+    versions are left to expire. Pass `account_id` when the change can affect which agent is the account's default
+    (creating, deleting or updating an agent).
+    """
+    keys = []
+    if agent_id:
+        keys.append(AGENT_VERSION_CACHE_KEY.format(agent_id=agent_id))
+    if account_id:
+        keys.append(DEFAULT_AGENT_CACHE_KEY.format(account_id=account_id))
+    for key in keys:
+        _local.pop(key, None)
+        try:
+            await redis.delete(key)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate cached agent config {key}: {str(e)}")
@@ -68,11 +68,12 @@ You have the ability to execute operations using both Python and CLI tools:
 ### 2.3.5 BROWSER TOOLS AND CAPABILITIES
 - BROWSER OPERATIONS:
   * Navigate to URLs and manage history
-  * Fill forms and submit data
+  * Fill forms and submit data - use browser_batch_actions to run a known sequence of steps (e.g. filling every field of a form and submitting it) in one call
   * Click elements and interact with pages
   * Extract text and HTML content
   * Wait for elements to load
   * Scroll pages and handle infinite scroll
+  * Element indices stay the same while you remain on a page. After the first action on a page, browser results only list the elements that were added (+), changed (~) or removed (-); use browser_get_state to see the full list again
   * YOU CAN DO ANYTHING ON THE BROWSER - including clicking on elements, filling forms, submitting data, etc.
   * The browser is in a sandboxed environment, so nothing to worry about.
 
@@ -22,8 +22,10 @@ from agent.tools.expand_msg_tool import ExpandMessageTool
 from agent.prompt import get_system_prompt
 from utils.logger import logger
 from utils.auth_utils import get_account_id_from_thread
+from utils.image_context_store import get_image_context_url, delete_image_context
 from services.billing import check_billing_status
 from agent.tools.sb_vision_tool import SandboxVisionTool
+from agent.tools.computer_use_tool import ComputerUseTool
 from agent.tools.sb_image_edit_tool import SandboxImageEditTool
 from services.langfuse import langfuse
 from langfuse.client import StatefulTraceClient
@@ -128,6 +130,8 @@ async def run_agent(
             thread_manager.add_tool(SandboxWebSearchTool, project_id=project_id, thread_manager=thread_manager)
         if enabled_tools.get('sb_vision_tool', {}).get('enabled', False):
             thread_manager.add_tool(SandboxVisionTool, project_id=project_id, thread_id=thread_id, thread_manager=thread_manager)
+        if enabled_tools.get('computer_use_tool', {}).get('enabled', False):
+            thread_manager.add_tool(ComputerUseTool, project_id=project_id, thread_manager=thread_manager, thread_id=thread_id)
         if config.RAPID_API_KEY and enabled_tools.get('data_providers_tool', {}).get('enabled', False):
             thread_manager.add_tool(DataProvidersTool)
 
@@ -182,19 +186,8 @@ async def run_agent(
             
             if mcp_wrapper_instance:
                 try:
-                    await mcp_wrapper_instance.initialize_and_register_tools()
+                    await mcp_wrapper_instance.initialize_and_register_tools(thread_manager.tool_registry)
                     logger.info("MCP tools initialized successfully")
-                    updated_schemas = mcp_wrapper_instance.get_schemas()
-                    logger.info(f"MCP wrapper has {len(updated_schemas)} schemas available")
-                    for method_name, schema_list in updated_schemas.items():
-                        if method_name != 'call_mcp_tool':
-                            for schema in schema_list:
-                                if schema.schema_type == SchemaType.OPENAPI:
-                                    thread_manager.tool_registry.tools[method_name] = {
-                                        "instance": mcp_wrapper_instance,
-                                        "schema": schema
-                                    }
-                                    logger.info(f"Registered dynamic MCP tool: {method_name}")
                     
                     # Log all registered tools for debugging
                     all_tools = list(thread_manager.tool_registry.tools.keys())
@@ -274,37 +267,43 @@ async def run_agent(
         
         # List available MCP tools
         mcp_info += "Available MCP tools:\n"
-        try:
-            # Get the actual registered schemas from the wrapper
-            registered_schemas = mcp_wrapper_instance.get_schemas()
-            for method_name, schema_list in registered_schemas.items():
-                if method_name == 'call_mcp_tool':
-                    continue  # Skip the fallback method
+        if mcp_wrapper_instance.compact_mode:
+            # Large toolsets: names and one-line descriptions only, schemas are loaded on demand
+            mcp_info += mcp_wrapper_instance.get_tool_index() + "\n\n"
+            mcp_info += "This is a compact index: the full parameter schemas of most of these tools are not loaded yet.\n"
+            mcp_info += "Before calling an MCP tool whose parameters you don't know, call discover_mcp_tools with the tool names (or a short query describing the task) to load their schemas, then call the tools directly by name.\n"
+        else:
+            try:
+                # Get the actual registered schemas from the wrapper
+                registered_schemas = mcp_wrapper_instance.get_schemas()
+                for method_name, schema_list in registered_schemas.items():
+                    if method_name in ('call_mcp_tool', 'discover_mcp_tools'):
+                        continue  # Skip the fallback and discovery methods
                     
-                # Get the schema info
-                for schema in schema_list:
-                    if schema.schema_type == SchemaType.OPENAPI:
-                        func_info = schema.schema.get('function', {})
-                        description = func_info.get('description', 'No description available')
-                        # Extract server name from description if available
-                        server_match = description.find('(MCP Server: ')
-                        if server_match != -1:
-                            server_end = description.find(')', server_match)
-                            server_info = description[server_match:server_end+1]
-                        else:
-                            server_info = ''
+                    # Get the schema info
+                    for schema in schema_list:
+                        if schema.schema_type == SchemaType.OPENAPI:
+                            func_info = schema.schema.get('function', {})
+                            description = func_info.get('description', 'No description available')
+                            # Extract server name from description if available
+                            server_match = description.find('(MCP Server: ')
+                            if server_match != -1:
+                                server_end = description.find(')', server_match)
+                                server_info = description[server_match:server_end+1]
+                            else:
+                                server_info = ''
                         
-                        mcp_info += f"- **{method_name}**: {description}\n"
+                            mcp_info += f"- **{method_name}**: {description}\n"
                         
-                        # Show parameter info
-                        params = func_info.get('parameters', {})
-                        props = params.get('properties', {})
-                        if props:
-                            mcp_info += f"  Parameters: {', '.join(props.keys())}\n"
+                            # Show parameter info
+                            params = func_info.get('parameters', {})
+                            props = params.get('properties', {})
+                            if props:
+                                mcp_info += f"  Parameters: {', '.join(props.keys())}\n"
                             
-        except Exception as e:
-            logger.error(f"Error listing MCP tools: {e}")
-            mcp_info += "- Error loading MCP tool list\n"
+            except Exception as e:
+                logger.error(f"Error listing MCP tools: {e}")
+                mcp_info += "- Error loading MCP tool list\n"
         
         # Add critical instructions for using search results
         mcp_info += "\n🚨 CRITICAL MCP TOOL RESULT INSTRUCTIONS 🚨\n"
@@ -334,6 +333,8 @@ async def run_agent(
             data = json.loads(data)
         if trace:
             trace.update(input=data['content'])
+        if mcp_wrapper_instance and mcp_wrapper_instance.compact_mode and isinstance(data.get('content'), str):
+            mcp_wrapper_instance.expose_relevant_tools(data['content'])
 
     while continue_execution and iteration_count < max_iterations:
         iteration_count += 1
@@ -366,6 +367,7 @@ async def run_agent(
         # ---- Temporary Message Handling (Browser State & Image Context) ----
         temporary_message = None
         temp_message_content_list = [] # List to hold text/image blocks
+        consumed_image_ref = None # Stored image to delete once this iteration's LLM call is done
 
         # Get the latest browser_state message
         latest_browser_state_msg = await client.table('messages').select('*').eq('thread_id', thread_id).eq('type', 'browser_state').order('created_at', desc=True).limit(1).execute()
@@ -381,6 +383,11 @@ async def run_agent(
                 browser_state_text = browser_content.copy()
                 browser_state_text.pop('screenshot_base64', None)
                 browser_state_text.pop('image_url', None)
+                if 'elements_summary' in browser_state_text:
+                    # Elements (or their diff) are already in the browser tool results
+                    browser_state_text.pop('elements', None)
+                    browser_state_text.pop('elements_diff', None)
+                    browser_state_text.pop('interactive_elements', None)
 
                 if browser_state_text:
                     temp_message_content_list.append({
@@ -430,11 +437,21 @@ async def run_agent(
         if latest_image_context_msg.data and len(latest_image_context_msg.data) > 0:
             try:
                 image_context_content = latest_image_context_msg.data[0]["content"] if isinstance(latest_image_context_msg.data[0]["content"], dict) else json.loads(latest_image_context_msg.data[0]["content"])
+                image_ref = image_context_content.get("image_ref")
                 base64_image = image_context_content.get("base64")
                 mime_type = image_context_content.get("mime_type")
                 file_path = image_context_content.get("file_path", "unknown file")
 
-                if base64_image and mime_type:
+                image_url = None
+                if image_ref:
+                    # Providers that fetch URLs get a signed URL, others the inlined image
+                    accepts_urls = any(provider in model_name.lower() for provider in ('gemini', 'anthropic', 'openai'))
+                    image_url = await get_image_context_url(image_ref, allow_remote_url=accepts_urls)
+                elif base64_image and mime_type:
+                    # Messages written before images were moved to object storage
+                    image_url = f"data:{mime_type};base64,{base64_image}"
+
+                if image_url:
                     temp_message_content_list.append({
                         "type": "text",
                         "text": f"Here is the image you requested to see: '{file_path}'"
@@ -442,13 +459,14 @@ async def run_agent(
                     temp_message_content_list.append({
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:{mime_type};base64,{base64_image}",
+                            "url": image_url,
                         }
                     })
                 else:
-                    logger.warning(f"Image context found for '{file_path}' but missing base64 or mime_type.")
+                    logger.warning(f"Image context found for '{file_path}' but missing image reference or mime_type.")
 
                 await client.table('messages').delete().eq('message_id', latest_image_context_msg.data[0]["message_id"]).execute()
+                consumed_image_ref = image_ref
             except Exception as e:
                 logger.error(f"Error parsing image context: {e}")
                 if trace:
@@ -643,6 +661,11 @@ async def run_agent(
             }
             # Stop execution immediately on any error
             break
+        finally:
+            # The image context message is deleted when it is consumed, so its blob is
+            # no longer referenced once the provider has read it during this call
+            if consumed_image_ref:
+                await delete_image_context(consumed_image_ref)
         if generation:
             generation.end(output=full_response)
 
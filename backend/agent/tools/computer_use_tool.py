@@ -4,11 +4,16 @@ import base64
 import aiohttp
 import asyncio
 import logging
-from typing import Optional, Dict
+from collections import OrderedDict
+from io import BytesIO
+from typing import Optional, Dict, Tuple
 import os
 
+from PIL import Image, ImageChops
+
 from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
 from sandbox.tool_base import SandboxToolsBase
+from utils.image_context_store import store_image_context
 from daytona_sdk import AsyncSandbox
 
 KEYBOARD_KEYS = [
@@ -23,15 +28,116 @@ KEYBOARD_KEYS = [
     'alt+tab', 'alt+f4', 'ctrl+alt+delete'
 ]
 
+# Factor applied to screenshots before they are returned (1.0 keeps the native resolution)
+SCREENSHOT_SCALE = float(os.getenv("COMPUTER_USE_SCREENSHOT_SCALE", "1.0"))
+# Side length of the square captured around the action point for region screenshots
+SCREENSHOT_REGION_SIZE = int(os.getenv("COMPUTER_USE_SCREENSHOT_REGION_SIZE", "400"))
+# Width of the grayscale thumbnail used to compare consecutive frames
+SCREENSHOT_DIFF_WIDTH = 320
+# Per-pixel intensity difference below which a pixel counts as unchanged (filters compression noise)
+SCREENSHOT_DIFF_PIXEL_THRESHOLD = 16
+# Fraction of changed thumbnail pixels below which a frame is reported as "no visible change"
+SCREENSHOT_DIFF_MIN_CHANGE = float(os.getenv("COMPUTER_USE_SCREENSHOT_MIN_CHANGE", "0.002"))
+# Number of (region, scale) captures whose last frame is kept for change detection
+SCREENSHOT_FRAME_CACHE_SIZE = 16
+# Debug copies of screenshots are only written when a directory is configured
+SCREENSHOT_DEBUG_DIR = os.getenv("COMPUTER_USE_SCREENSHOT_DEBUG_DIR")
+# Number of debug copies kept on disk; older ones are removed
+SCREENSHOT_DEBUG_KEEP = int(os.getenv("COMPUTER_USE_SCREENSHOT_DEBUG_KEEP", "20"))
+
+
+def _diff_thumbnail(image: Image.Image) -> Image.Image:
+    """Reduce a frame to a small grayscale image for cheap change detection."""
+    height = max(1, round(image.height * SCREENSHOT_DIFF_WIDTH / image.width))
+    return image.convert("L").resize((SCREENSHOT_DIFF_WIDTH, height), Image.BILINEAR)
+
+
+def _changed_fraction(previous: Image.Image, current: Image.Image) -> float:
+    """Fraction of pixels that differ noticeably between two diff thumbnails."""
+    if previous.size != current.size:
+        return 1.0
+    mask = ImageChops.difference(previous, current).point(
+        lambda value: 255 if value > SCREENSHOT_DIFF_PIXEL_THRESHOLD else 0
+    )
+    changed = mask.histogram()[255]
+    return changed / (current.width * current.height)
+
+
+def _clamp_region(region: Tuple[int, int, int, int], size: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    """Clamp an (x, y, width, height) region to the screen bounds."""
+    x, y, width, height = region
+    left = max(0, min(int(x), size[0] - 1))
+    top = max(0, min(int(y), size[1] - 1))
+    right = max(left + 1, min(int(x + width), size[0]))
+    bottom = max(top + 1, min(int(y + height), size[1]))
+    return left, top, right - left, bottom - top
+
+
+def _process_screenshot(
+    image_data: bytes,
+    previous: Optional[Image.Image],
+    region: Optional[Tuple[int, int, int, int]],
+    scale: float
+) -> Tuple[Image.Image, bool, float, Optional[bytes], Tuple[int, int, int, int]]:
+    """Decode a frame, crop the requested part, compare it with the previous capture of
+    the same part and encode it.
+
+    Returns the new diff thumbnail, whether the frame changed, the changed fraction,
+    the encoded PNG (None when unchanged) and the captured region in screen coordinates.
+    """
+    image = Image.open(BytesIO(image_data))
+    image.load()
+    captured = _clamp_region(region, image.size) if region else (0, 0, image.width, image.height)
+    x, y, width, height = captured
+    if region:
+        image = image.crop((x, y, x + width, y + height))
+    thumbnail = _diff_thumbnail(image)
+    fraction = 1.0 if previous is None else _changed_fraction(previous, thumbnail)
+    if fraction < SCREENSHOT_DIFF_MIN_CHANGE:
+        return thumbnail, False, fraction, None, captured
+
+    if scale != 1.0:
+        image = image.resize(
+            (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+            Image.LANCZOS
+        )
+    output = BytesIO()
+    image.save(output, format="PNG", optimize=True)
+    return thumbnail, True, fraction, output.getvalue(), captured
+
+
+def _write_debug_copy(image_data: bytes, timestamp: str) -> Optional[str]:
+    """Write a screenshot to the debug directory, keeping only the newest copies."""
+    os.makedirs(SCREENSHOT_DEBUG_DIR, exist_ok=True)
+    filename = os.path.join(SCREENSHOT_DEBUG_DIR, f"screenshot_{timestamp}_{time.time_ns() % 1_000_000_000:09d}.png")
+    with open(filename, 'wb') as f:
+        f.write(image_data)
+
+    existing = sorted(
+        (entry for entry in os.scandir(SCREENSHOT_DEBUG_DIR)
+         if entry.is_file() and entry.name.startswith("screenshot_")),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in existing[:-SCREENSHOT_DEBUG_KEEP]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+    return filename
+
 class ComputerUseTool(SandboxToolsBase):
     """Computer automation tool for controlling the sandbox browser and GUI."""
     
-    def __init__(self, project_id: str, thread_manager):
+    def __init__(self, project_id: str, thread_manager, thread_id: Optional[str] = None):
         """Initialize automation tool with sandbox connection."""
         super().__init__(project_id, thread_manager)
+        # Screenshots are attached to this thread as image context for the next LLM call
+        self.thread_id = thread_id
         self.session = None
         self.mouse_x = 0  # Track current mouse position
         self.mouse_y = 0
+        # Thumbnail of the last capture per (region, scale), used to detect screens that did not change
+        self._last_frames: "OrderedDict[Tuple, Image.Image]" = OrderedDict()
         # API URL will be set when first needed
         self.api_base_url = None
         self._url_initialized = False
@@ -583,45 +689,188 @@ class ComputerUseTool(SandboxToolsBase):
         except Exception as e:
             return ToolResult(success=False, output=f"Failed to drag: {str(e)}")
 
-    async def get_screenshot_base64(self) -> Optional[dict]:
-        """Capture screen and return as base64 encoded image."""
+    async def get_screenshot_base64(
+        self,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        around_cursor: bool = False,
+        detect_changes: bool = True,
+        scale: Optional[float] = None
+    ) -> Optional[dict]:
+        """Capture the screen and return it as a base64 encoded image.
+
+        Args:
+            region: Optional (x, y, width, height) area to return instead of the full screen
+            around_cursor: Return a SCREENSHOT_REGION_SIZE square centred on the mouse position
+            detect_changes: Skip the image when the screen looks the same as the last capture
+            scale: Resize factor for the returned image, defaults to SCREENSHOT_SCALE
+
+        Returns:
+            Dict with `changed`, `region` and `scale`, plus `base64` and `content_type`
+            when the screen changed. `filename` is set when a debug copy was written.
+        """
         try:
             result = await self._api_request("POST", "/automation/screenshot")
             
-            if "image" in result:
-                base64_str = result["image"]
-                timestamp = time.strftime("%Y%m%d_%H%M%S")
-                
-                # Save screenshot to file
-                screenshots_dir = "screenshots"
-                if not os.path.exists(screenshots_dir):
-                    os.makedirs(screenshots_dir)
-                
-                timestamped_filename = os.path.join(screenshots_dir, f"screenshot_{timestamp}.png")
-                latest_filename = "latest_screenshot.png"
-                
-                # Decode base64 string and save to file
-                img_data = base64.b64decode(base64_str)
-                with open(timestamped_filename, 'wb') as f:
-                    f.write(img_data)
-                
-                # Save a copy as the latest screenshot
-                with open(latest_filename, 'wb') as f:
-                    f.write(img_data)
-                
-                return {
-                    "content_type": "image/png",
-                    "base64": base64_str,
-                    "timestamp": timestamp,
-                    "filename": timestamped_filename
-                }
-            else:
+            if "image" not in result:
                 return None
+
+            if region is None and around_cursor:
+                half = SCREENSHOT_REGION_SIZE // 2
+                region = (self.mouse_x - half, self.mouse_y - half, SCREENSHOT_REGION_SIZE, SCREENSHOT_REGION_SIZE)
+            scale = SCREENSHOT_SCALE if scale is None else float(scale)
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+
+            # Only a capture of the same area at the same scale can count as unchanged
+            frame_key = (tuple(int(value) for value in region) if region else None, scale)
+            img_data = base64.b64decode(result["image"])
+            thumbnail, changed, fraction, encoded, captured = await asyncio.to_thread(
+                _process_screenshot,
+                img_data,
+                self._last_frames.get(frame_key) if detect_changes else None,
+                region,
+                scale
+            )
+            self._last_frames[frame_key] = thumbnail
+            self._last_frames.move_to_end(frame_key)
+            while len(self._last_frames) > SCREENSHOT_FRAME_CACHE_SIZE:
+                self._last_frames.popitem(last=False)
+
+            screenshot = {
+                "changed": changed,
+                "changed_fraction": round(fraction, 4),
+                "region": {"x": captured[0], "y": captured[1], "width": captured[2], "height": captured[3]},
+                "scale": scale,
+                "timestamp": timestamp,
+                "filename": None
+            }
+            if not changed:
+                screenshot["message"] = "No visible change since the last screenshot"
+                return screenshot
+
+            screenshot["content_type"] = "image/png"
+            screenshot["base64"] = base64.b64encode(encoded).decode("utf-8")
+            if SCREENSHOT_DEBUG_DIR:
+                screenshot["filename"] = await asyncio.to_thread(_write_debug_copy, encoded, timestamp)
+            return screenshot
                 
         except Exception as e:
             print(f"[Screenshot] Error during screenshot process: {str(e)}")
             return None
 
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "screenshot",
+            "description": "Take a screenshot to see the screen. The image is shown to you on your next turn. Capture only the part you need (a region or the area around the cursor) to keep it small; if nothing changed since the last screenshot, no image is attached.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "region_x": {
+                        "type": "integer",
+                        "description": "Left edge of the region to capture, in screen pixels"
+                    },
+                    "region_y": {
+                        "type": "integer",
+                        "description": "Top edge of the region to capture, in screen pixels"
+                    },
+                    "region_width": {
+                        "type": "integer",
+                        "description": "Width of the region to capture"
+                    },
+                    "region_height": {
+                        "type": "integer",
+                        "description": "Height of the region to capture"
+                    },
+                    "around_cursor": {
+                        "type": "boolean",
+                        "description": "Capture a square area centred on the mouse position instead of the full screen",
+                        "default": False
+                    },
+                    "only_if_changed": {
+                        "type": "boolean",
+                        "description": "Skip the image when the screen looks the same as in the last screenshot",
+                        "default": True
+                    },
+                    "scale": {
+                        "type": "number",
+                        "description": "Resize factor for the image, e.g. 0.5 for half size"
+                    }
+                }
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="screenshot",
+        mappings=[
+            {"param_name": "region_x", "node_type": "attribute", "path": "region_x"},
+            {"param_name": "region_y", "node_type": "attribute", "path": "region_y"},
+            {"param_name": "region_width", "node_type": "attribute", "path": "region_width"},
+            {"param_name": "region_height", "node_type": "attribute", "path": "region_height"},
+            {"param_name": "around_cursor", "node_type": "attribute", "path": "around_cursor"},
+            {"param_name": "only_if_changed", "node_type": "attribute", "path": "only_if_changed"},
+            {"param_name": "scale", "node_type": "attribute", "path": "scale"}
+        ],
+        example='''
+        <function_calls>
+        <invoke name="screenshot">
+        <parameter name="around_cursor">true</parameter>
+        </invoke>
+        </function_calls>
+        '''
+    )
+    async def screenshot(
+        self,
+        region_x: Optional[int] = None,
+        region_y: Optional[int] = None,
+        region_width: Optional[int] = None,
+        region_height: Optional[int] = None,
+        around_cursor: bool = False,
+        only_if_changed: bool = True,
+        scale: Optional[float] = None
+    ) -> ToolResult:
+        """Capture the screen (or part of it) and attach it to the thread as image context."""
+        try:
+            if not self.thread_id:
+                return ToolResult(success=False, output="Failed to take screenshot: no thread to attach it to")
+            region_values = (region_x, region_y, region_width, region_height)
+            region = None
+            if any(value is not None for value in region_values):
+                if any(value is None for value in region_values):
+                    return ToolResult(success=False, output="Failed to take screenshot: region_x, region_y, region_width and region_height must be given together")
+                region = tuple(int(value) for value in region_values)
+            around_cursor = str(around_cursor).lower() == "true"
+            only_if_changed = str(only_if_changed).lower() != "false"
+
+            screenshot = await self.get_screenshot_base64(
+                region=region,
+                around_cursor=around_cursor,
+                detect_changes=only_if_changed,
+                scale=float(scale) if scale is not None else None
+            )
+            if screenshot is None:
+                return ToolResult(success=False, output="Failed to take screenshot")
+            captured = screenshot["region"]
+            area = f"{captured['width']}x{captured['height']} at ({captured['x']}, {captured['y']})"
+            if not screenshot["changed"]:
+                return ToolResult(success=True, output=f"{screenshot['message']} ({area})")
+
+            image_bytes = base64.b64decode(screenshot["base64"])
+            image_reference = await store_image_context(self.thread_id, image_bytes, screenshot["content_type"])
+            await self.thread_manager.add_message(
+                thread_id=self.thread_id,
+                type="image_context",
+                content={
+                    "mime_type": screenshot["content_type"],
+                    "image_ref": image_reference,
+                    "file_path": f"screenshot {area}",
+                    "compressed_size": len(image_bytes)
+                },
+                is_llm_message=False
+            )
+            return ToolResult(success=True, output=f"Captured screenshot of {area}; it will be shown on your next turn")
+        except Exception as e:
+            return ToolResult(success=False, output=f"Failed to take screenshot: {str(e)}")
+
     @openapi_schema({
         "type": "function",
         "function": {
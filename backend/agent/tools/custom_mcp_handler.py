@@ -141,17 +141,17 @@ class CustomMCPHandler:
         
         try:
             from services.supabase import DBConnection
-            from utils.encryption import decrypt_data
+            from utils.encryption import decrypt_profile_config
             
             db = DBConnection()
             supabase = await db.client
             
             result = await supabase.table('user_mcp_credential_profiles').select(
-                'encrypted_config'
+                'profile_id, encrypted_config, config_hash, updated_at'
             ).eq('profile_id', profile_id).single().execute()
             
             if result.data:
-                decrypted_config = decrypt_data(result.data['encrypted_config'])
+                decrypted_config = decrypt_profile_config(result.data)
                 config_data = json.loads(decrypted_config)
                 profile_external_user_id = config_data.get('external_user_id')
                 
@@ -168,17 +168,17 @@ class MCPToolExecutor:
         
         try:
             from services.supabase import DBConnection
-            from utils.encryption import decrypt_data
+            from utils.encryption import decrypt_profile_config
             
             db = DBConnection()
             supabase = await db.client
             
             result = await supabase.table('user_mcp_credential_profiles').select(
-                'encrypted_config'
+                'profile_id, encrypted_config, config_hash, updated_at'
             ).eq('profile_id', profile_id).single().execute()
             
             if result.data:
-                decrypted_config = decrypt_data(result.data['encrypted_config'])
+                decrypted_config = decrypt_profile_config(result.data)
                 config_data = json.loads(decrypted_config)
                 return config_data.get('external_user_id', external_user_id)
             
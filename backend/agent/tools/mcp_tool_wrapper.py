@@ -3,11 +3,23 @@ from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema, ToolSc
 from mcp_service.client import MCPManager
 from utils.logger import logger
 import inspect
+import os
+import re
 from .mcp_connection_manager import MCPConnectionManager
 from .custom_mcp_handler import CustomMCPHandler
 from .dynamic_tool_builder import DynamicToolBuilder
 from .mcp_tool_executor import MCPToolExecutor
 
+# With more MCP tools than this, only a compact index is put in the prompt and full
+# schemas are loaded on demand through discover_mcp_tools
+MCP_COMPACT_TOOL_THRESHOLD = int(os.getenv("MCP_COMPACT_TOOL_THRESHOLD", "15"))
+# Tools most relevant to the latest user message that are exposed up front in compact mode
+MCP_PRELOAD_TOOL_COUNT = 5
+# Upper bound on the schemas loaded by one discover_mcp_tools query
+MCP_DISCOVER_MAX_RESULTS = 8
+# Length of the one-line descriptions in the compact index
+MCP_INDEX_DESCRIPTION_LENGTH = 100
+
 
 class MCPToolWrapper(Tool):
     def __init__(self, mcp_configs: Optional[List[Dict[str, Any]]] = None):
@@ -22,6 +34,8 @@ class MCPToolWrapper(Tool):
         self.custom_handler = CustomMCPHandler(self.connection_manager)
         self.tool_builder = DynamicToolBuilder()
         self.tool_executor = None
+        self.tool_registry = None
+        self.compact_mode = False
         
         super().__init__()
         
@@ -109,12 +123,73 @@ class MCPToolWrapper(Tool):
     
     async def initialize_and_register_tools(self, tool_registry=None):
         await self._ensure_initialized()
-        if tool_registry and self._dynamic_tools:
-            logger.info(f"Updating tool registry with {len(self._dynamic_tools)} MCP tools")
-            for method_name, schemas in self._schemas.items():
-                if method_name not in ['call_mcp_tool']:
-                    pass
-             
+        if not tool_registry:
+            return
+        self.tool_registry = tool_registry
+        dynamic_names = []
+        for method_name, schemas in self._schemas.items():
+            if method_name in ('call_mcp_tool', 'discover_mcp_tools'):
+                continue
+            for schema in schemas:
+                if schema.schema_type == SchemaType.OPENAPI:
+                    tool_registry.tools[method_name] = {
+                        "instance": self,
+                        "schema": schema
+                    }
+                    dynamic_names.append(method_name)
+        logger.info(f"Updated tool registry with {len(dynamic_names)} MCP tools")
+
+        self.compact_mode = len(dynamic_names) > MCP_COMPACT_TOOL_THRESHOLD
+        if self.compact_mode:
+            # Every tool stays callable; only the schemas sent to the LLM are withheld
+            tool_registry.defer_tools(dynamic_names)
+            logger.info(f"Using compact MCP tool index: {len(dynamic_names)} tools exceed threshold of {MCP_COMPACT_TOOL_THRESHOLD}")
+        else:
+            tool_registry.defer_tools(['discover_mcp_tools'])
+
+    def _summary(self, tool_data: Dict[str, Any]) -> str:
+        """First line of a tool's description, shortened for the compact index."""
+        description = (tool_data['info'].get('description') or '').strip()
+        summary = re.split(r'(?<=[.!?])\s|\n', description, maxsplit=1)[0]
+        if len(summary) > MCP_INDEX_DESCRIPTION_LENGTH:
+            summary = summary[:MCP_INDEX_DESCRIPTION_LENGTH - 3].rstrip() + '...'
+        return summary
+
+    def get_tool_index(self) -> str:
+        """Compact listing of every MCP tool: name, server and a one-line description."""
+        lines = []
+        for tool_data in self._dynamic_tools.values():
+            lines.append(f"- {tool_data['method_name']} ({tool_data['server_name']}): {self._summary(tool_data)}")
+        return "\n".join(lines)
+
+    def rank_tools(self, query: str, limit: int) -> List[str]:
+        """Method names of the tools most relevant to a query, best first.
+
+        Query words are matched against each tool's name (weighted higher) and
+        description; tools that match nothing are left out.
+        """
+        words = {word for word in re.findall(r'[a-z0-9]+', (query or '').lower()) if len(word) > 2}
+        if not words:
+            return []
+        scored = []
+        for tool_data in self._dynamic_tools.values():
+            name_words = set(re.findall(r'[a-z0-9]+', tool_data['method_name'].lower()))
+            description_words = set(re.findall(r'[a-z0-9]+', (tool_data['info'].get('description') or '').lower()))
+            score = 3 * len(words & name_words) + len(words & description_words)
+            if score:
+                scored.append((score, tool_data['method_name']))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [method_name for _, method_name in scored[:limit]]
+
+    def expose_relevant_tools(self, query: str, limit: int = MCP_PRELOAD_TOOL_COUNT) -> List[str]:
+        """In compact mode, load the full schemas of the tools most relevant to a query."""
+        if not self.compact_mode or not self.tool_registry:
+            return []
+        exposed = self.tool_registry.expose_tools(self.rank_tools(query, limit))
+        if exposed:
+            logger.info(f"Exposed MCP tool schemas relevant to the conversation: {exposed}")
+        return exposed
+
     async def get_available_tools(self) -> List[Dict[str, Any]]:
         await self._ensure_initialized()
         return self.mcp_manager.get_all_tools_openapi()
@@ -162,6 +237,74 @@ class MCPToolWrapper(Tool):
     )
     async def call_mcp_tool(self, tool_name: str, arguments: Dict[str, Any]) -> ToolResult:
         return await self._execute_mcp_tool(tool_name, arguments)
+
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "discover_mcp_tools",
+            "description": "Load the full parameter schemas of MCP tools listed in the MCP tool index. Pass the exact tool names you intend to use, or a short query describing the task to find the most relevant tools. The loaded tools can then be called directly by name.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "tool_names": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Exact names of MCP tools from the index, e.g. ['create_issue', 'list_issues']"
+                    },
+                    "query": {
+                        "type": "string",
+                        "description": "What you want to do, used to find relevant tools when you don't know their exact names, e.g. 'send a slack message'"
+                    }
+                }
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="discover-mcp-tools",
+        mappings=[
+            {"param_name": "tool_names", "node_type": "attribute", "path": "."},
+            {"param_name": "query", "node_type": "attribute", "path": "."}
+        ],
+        example='''
+        <function_calls>
+        <invoke name="discover_mcp_tools">
+        <parameter name="query">create a github issue</parameter>
+        </invoke>
+        </function_calls>
+        '''
+    )
+    async def discover_mcp_tools(self, tool_names: Optional[List[str]] = None, query: Optional[str] = None) -> ToolResult:
+        await self._ensure_initialized()
+        if isinstance(tool_names, str):
+            tool_names = [name.strip() for name in tool_names.split(',') if name.strip()]
+
+        by_method = {tool_data['method_name']: tool_data for tool_data in self._dynamic_tools.values()}
+        selected = [name for name in (tool_names or []) if name in by_method]
+        unknown = [name for name in (tool_names or []) if name not in by_method]
+        if query:
+            selected += [name for name in self.rank_tools(query, MCP_DISCOVER_MAX_RESULTS) if name not in selected]
+        selected = selected[:MCP_DISCOVER_MAX_RESULTS]
+
+        if not selected:
+            return self.fail_response(
+                "No matching MCP tools found. Use exact names from the MCP tool index or a different query."
+            )
+
+        if self.tool_registry:
+            self.tool_registry.expose_tools(selected)
+
+        tools = [
+            {
+                "name": name,
+                "description": by_method[name]['schema'].schema['function']['description'],
+                "parameters": by_method[name]['schema'].schema['function']['parameters']
+            }
+            for name in selected
+        ]
+        result = {"tools": tools}
+        if unknown:
+            result["unknown_tool_names"] = unknown
+        return self.success_response(result)
             
     async def cleanup(self):
         if self._initialized:
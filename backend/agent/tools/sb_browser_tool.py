@@ -8,7 +8,7 @@ from agentpress.tool import ToolResult, openapi_schema, xml_schema
 from agentpress.thread_manager import ThreadManager
 from sandbox.tool_base import SandboxToolsBase
 from utils.logger import logger
-from utils.s3_upload_utils import upload_base64_image
+from utils.s3_upload_utils import upload_base64_image, upload_image_bytes
 
 
 class SandboxBrowserTool(SandboxToolsBase):
@@ -17,6 +17,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     def __init__(self, project_id: str, thread_id: str, thread_manager: ThreadManager):
         super().__init__(project_id, thread_manager)
         self.thread_id = thread_id
+        # (url, perceptual hash, image url) of the last uploaded screenshot
+        self._last_screenshot = None
 
     def _validate_base64_image(self, base64_string: str, max_size_mb: int = 10) -> tuple[bool, str]:
         """
@@ -57,6 +59,24 @@ class SandboxBrowserTool(SandboxToolsBase):
             except Exception as e:
                 return False, f"Base64 decoding failed: {str(e)}"
             
+            return self._validate_image_bytes(image_data, max_size_mb)
+            
+        except Exception as e:
+            logger.error(f"Unexpected error during base64 image validation: {e}")
+            return False, f"Validation error: {str(e)}"
+
+    def _validate_image_bytes(self, image_data: bytes, max_size_mb: int = 10) -> tuple[bool, str]:
+        """
+        Validate decoded image data.
+        
+        Args:
+            image_data (bytes): The encoded image
+            max_size_mb (int): Maximum allowed image size in megabytes
+            
+        Returns:
+            tuple[bool, str]: (is_valid, error_message)
+        """
+        try:
             # Check decoded data size
             if len(image_data) == 0:
                 return False, "Decoded image data is empty"
@@ -100,16 +120,37 @@ class SandboxBrowserTool(SandboxToolsBase):
             return True, "Valid image"
             
         except Exception as e:
-            logger.error(f"Unexpected error during base64 image validation: {e}")
+            logger.error(f"Unexpected error during image validation: {e}")
             return False, f"Validation error: {str(e)}"
 
-    async def _execute_browser_action(self, endpoint: str, params: dict = None, method: str = "POST") -> ToolResult:
+    async def _upload_screenshot(self, result: dict) -> str:
+        """Upload the screenshot file referenced by a browser action result and return its URL.
+        
+        The image is read from the sandbox as raw bytes. If it is visually identical to the
+        previous screenshot of the same page (same perceptual hash), the previous upload is reused.
+        """
+        page_url = result.get("url")
+        phash = result.get("screenshot_phash")
+        if phash and self._last_screenshot and self._last_screenshot[:2] == (page_url, phash):
+            logger.debug("Screenshot unchanged since the last action, reusing previous upload")
+            return self._last_screenshot[2]
+        
+        image_data = await self.sandbox.fs.download_file(result["screenshot_path"])
+        is_valid, validation_message = self._validate_image_bytes(image_data)
+        if not is_valid:
+            raise ValueError(validation_message)
+        
+        image_url = await upload_image_bytes(image_data, f"image/{result.get('screenshot_format') or 'jpeg'}")
+        self._last_screenshot = (page_url, phash, image_url)
+        return image_url
+
+    async def _execute_browser_action(self, endpoint: str, params: dict = None, timeout: int = 30) -> ToolResult:
         """Execute a browser automation action through the API
         
         Args:
             endpoint (str): The API endpoint to call
             params (dict, optional): Parameters to send. Defaults to None.
-            method (str, optional): HTTP method to use. Defaults to "POST".
+            timeout (int, optional): Request timeout in seconds. Defaults to 30.
             
         Returns:
             ToolResult: Result of the execution
@@ -118,100 +159,111 @@ class SandboxBrowserTool(SandboxToolsBase):
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
             
-            # Build the curl command
-            url = f"http://localhost:8003/api/automation/{endpoint}"
+            logger.debug(f"\033[95mExecuting browser action {endpoint}\033[0m")
+            result = await self._call_sandbox_api(f"automation/{endpoint}", params or {}, timeout=timeout)
             
-            if method == "GET" and params:
-                query_params = "&".join([f"{k}={v}" for k, v in params.items()])
-                url = f"{url}?{query_params}"
-                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
-            else:
-                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
-                if params:
-                    json_data = json.dumps(params)
-                    curl_cmd += f" -d '{json_data}'"
+            if result is None:
+                logger.error(f"Browser automation request {endpoint} failed")
+                return self.fail_response(f"Browser automation request {endpoint} failed")
+
+            if not "content" in result:
+                result["content"] = ""
             
-            logger.debug("\033[95mExecuting curl command:\033[0m")
-            logger.debug(f"{curl_cmd}")
+            if not "role" in result:
+                result["role"] = "assistant"
+
+            logger.info("Browser automation request completed successfully")
+
+            if result.get("screenshot_path"):
+                try:
+                    image_url = await self._upload_screenshot(result)
+                    result["image_url"] = image_url
+                    logger.debug(f"Uploaded screenshot to {image_url}")
+                except ValueError as e:
+                    logger.warning(f"Screenshot validation failed: {e}")
+                    result["image_validation_error"] = str(e)
+                except Exception as e:
+                    logger.error(f"Failed to process screenshot: {e}")
+                    result["image_upload_error"] = str(e)
             
-            response = await self.sandbox.process.exec(curl_cmd, timeout=30)
+            # Screenshot file details are only needed for the upload
+            for key in ("screenshot_path", "screenshot_hash", "screenshot_phash", "screenshot_format"):
+                result.pop(key, None)
             
-            if response.exit_code == 0:
+            # Sandboxes built from older images still return the screenshot inline
+            if "screenshot_base64" in result:
                 try:
-                    result = json.loads(response.result)
-
-                    if not "content" in result:
-                        result["content"] = ""
+                    # Comprehensive validation of the base64 image data
+                    screenshot_data = result["screenshot_base64"]
+                    is_valid, validation_message = self._validate_base64_image(screenshot_data)
                     
-                    if not "role" in result:
-                        result["role"] = "assistant"
-
-                    logger.info("Browser automation request completed successfully")
-
-                    if "screenshot_base64" in result:
-                        try:
-                            # Comprehensive validation of the base64 image data
-                            screenshot_data = result["screenshot_base64"]
-                            is_valid, validation_message = self._validate_base64_image(screenshot_data)
-                            
-                            if is_valid:
-                                logger.debug(f"Screenshot validation passed: {validation_message}")
-                                image_url = await upload_base64_image(screenshot_data)
-                                result["image_url"] = image_url
-                                logger.debug(f"Uploaded screenshot to {image_url}")
-                            else:
-                                logger.warning(f"Screenshot validation failed: {validation_message}")
-                                result["image_validation_error"] = validation_message
-                                
-                            # Remove base64 data from result to keep it clean
-                            del result["screenshot_base64"]
-                            
-                        except Exception as e:
-                            logger.error(f"Failed to process screenshot: {e}")
-                            result["image_upload_error"] = str(e)
+                    if is_valid:
+                        logger.debug(f"Screenshot validation passed: {validation_message}")
+                        image_url = await upload_base64_image(screenshot_data)
+                        result["image_url"] = image_url
+                        logger.debug(f"Uploaded screenshot to {image_url}")
+                    else:
+                        logger.warning(f"Screenshot validation failed: {validation_message}")
+                        result["image_validation_error"] = validation_message
+                        
+                    # Remove base64 data from result to keep it clean
+                    del result["screenshot_base64"]
+                    
+                except Exception as e:
+                    logger.error(f"Failed to process screenshot: {e}")
+                    result["image_upload_error"] = str(e)
 
-                    added_message = await self.thread_manager.add_message(
-                        thread_id=self.thread_id,
-                        type="browser_state",
-                        content=result,
-                        is_llm_message=False
-                    )
+            added_message = await self.thread_manager.add_message(
+                thread_id=self.thread_id,
+                type="browser_state",
+                content=result,
+                is_llm_message=False
+            )
 
-                    success_response = {}
+            success_response = {}
 
-                    if result.get("success"):
-                        success_response["success"] = result["success"]
-                        success_response["message"] = result.get("message", "Browser action completed successfully")
-                    else:
-                        success_response["success"] = False
-                        success_response["message"] = result.get("message", "Browser action failed")
-
-                    if added_message and 'message_id' in added_message:
-                        success_response['message_id'] = added_message['message_id']
-                    if result.get("url"):
-                        success_response["url"] = result["url"]
-                    if result.get("title"):
-                        success_response["title"] = result["title"]
-                    if result.get("element_count"):
-                        success_response["elements_found"] = result["element_count"]
-                    if result.get("pixels_below"):
-                        success_response["scrollable_content"] = result["pixels_below"] > 0
-                    if result.get("ocr_text"):
-                        success_response["ocr_text"] = result["ocr_text"]
-                    if result.get("image_url"):
-                        success_response["image_url"] = result["image_url"]
+            if result.get("success"):
+                success_response["success"] = result["success"]
+                success_response["message"] = result.get("message", "Browser action completed successfully")
+            else:
+                success_response["success"] = False
+                success_response["message"] = result.get("message", "Browser action failed")
 
-                    if success_response.get("success"):
-                        return self.success_response(success_response)
-                    else:
-                        return self.fail_response(success_response)
+            if added_message and 'message_id' in added_message:
+                success_response['message_id'] = added_message['message_id']
+            if result.get("url"):
+                success_response["url"] = result["url"]
+            if result.get("title"):
+                success_response["title"] = result["title"]
+            if result.get("element_count"):
+                success_response["elements_found"] = result["element_count"]
+            if result.get("pixels_below"):
+                success_response["scrollable_content"] = result["pixels_below"] > 0
+            # The full element list is returned once per page; later states only carry a diff
+            if result.get("elements_diff") is not None and not result.get("full_state", True):
+                success_response["elements_diff"] = result["elements_diff"]
+            elif result.get("elements"):
+                success_response["elements"] = result["elements"]
+            if result.get("elements_summary"):
+                success_response["elements_summary"] = result["elements_summary"]
+            if result.get("ocr_text"):
+                success_response["ocr_text"] = result["ocr_text"]
+            if result.get("image_url"):
+                success_response["image_url"] = result["image_url"]
+            # Action output such as the per-step results of a batch
+            if result.get("content"):
+                if endpoint == "batch":
+                    try:
+                        success_response["step_results"] = json.loads(result["content"])
+                    except (TypeError, json.JSONDecodeError):
+                        success_response["content"] = result["content"]
+                else:
+                    success_response["content"] = result["content"]
 
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse response JSON: {response.result} {e}")
-                    return self.fail_response(f"Failed to parse response JSON: {response.result} {e}")
+            if success_response.get("success"):
+                return self.success_response(success_response)
             else:
-                logger.error(f"Browser automation request failed 2: {response}")
-                return self.fail_response(f"Browser automation request failed 2: {response}")
+                return self.fail_response(success_response)
 
         except Exception as e:
             logger.error(f"Error executing browser action: {e}")
@@ -687,6 +739,66 @@ class SandboxBrowserTool(SandboxToolsBase):
         
     #     return result
 
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "browser_get_state",
+            "description": "Get the full list of interactive elements on the current page. Browser actions only report elements that were added, changed or removed since the previous state, so use this when you need to see every element again",
+            "parameters": {
+                "type": "object",
+                "properties": {}
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="browser-get-state",
+        mappings=[],
+        example='''
+        <function_calls>
+        <invoke name="browser_get_state">
+        </invoke>
+        </function_calls>
+        '''
+    )
+    async def browser_get_state(self) -> ToolResult:
+        """Get the full browser state including all interactive elements
+
+        Returns:
+            dict: Result of the execution
+        """
+        logger.debug(f"\033[95mGetting full browser state\033[0m")
+        return await self._execute_browser_action("get_state", {})
+
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "browser_get_page_text",
+            "description": "Read the text visible on the current page using OCR on a screenshot. Use this when the page content can't be read from the interactive elements, e.g. text rendered in images or canvases",
+            "parameters": {
+                "type": "object",
+                "properties": {}
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="browser-get-page-text",
+        mappings=[],
+        example='''
+        <function_calls>
+        <invoke name="browser_get_page_text">
+        </invoke>
+        </function_calls>
+        '''
+    )
+    async def browser_get_page_text(self) -> ToolResult:
+        """Read the visible page text using OCR
+
+        Returns:
+            dict: Result of the execution
+        """
+        logger.debug(f"\033[95mExtracting page text with OCR\033[0m")
+        return await self._execute_browser_action("get_page_text", {})
+
     @openapi_schema({
         "type": "function",
         "function": {
@@ -1049,4 +1161,85 @@ class SandboxBrowserTool(SandboxToolsBase):
             dict: Result of the execution
         """
         logger.debug(f"\033[95mClicking at coordinates: ({x}, {y})\033[0m")
-        return await self._execute_browser_action("click_coordinates", {"x": x, "y": y})
\ No newline at end of file
+        return await self._execute_browser_action("click_coordinates", {"x": x, "y": y})
+
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "browser_batch_actions",
+            "description": "Run several browser actions in order with a single call, e.g. to fill and submit a form, and get one browser state at the end. Each step waits for the page to settle before the next one runs. Supported actions: navigate_to (url), go_back, click_element (index), click_coordinates (x, y), input_text (index, text), send_keys (keys), scroll_down (amount), scroll_up (amount), scroll_to_text (text), select_dropdown_option (index, text), wait (seconds)",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "steps": {
+                        "type": "array",
+                        "description": "Ordered list of steps to run",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "action": {
+                                    "type": "string",
+                                    "description": "Name of the action to run"
+                                },
+                                "params": {
+                                    "type": "object",
+                                    "description": "Parameters of the action"
+                                },
+                                "wait_for_selector": {
+                                    "type": "string",
+                                    "description": "Optional CSS selector to wait for before the next step"
+                                },
+                                "wait_ms": {
+                                    "type": "integer",
+                                    "description": "Optional extra pause in milliseconds after the step"
+                                }
+                            },
+                            "required": ["action"]
+                        }
+                    },
+                    "abort_on_failure": {
+                        "type": "boolean",
+                        "description": "Skip the remaining steps after the first failure (default: true)"
+                    }
+                },
+                "required": ["steps"]
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="browser-batch-actions",
+        mappings=[
+            {"param_name": "steps", "node_type": "content", "path": "."},
+            {"param_name": "abort_on_failure", "node_type": "attribute", "path": "."}
+        ],
+        example='''
+        <function_calls>
+        <invoke name="browser_batch_actions">
+        <parameter name="steps">[{"action": "input_text", "params": {"index": 3, "text": "jane@example.com"}}, {"action": "input_text", "params": {"index": 4, "text": "Jane Doe"}}, {"action": "click_element", "params": {"index": 7}, "wait_for_selector": ".confirmation"}]</parameter>
+        <parameter name="abort_on_failure">true</parameter>
+        </invoke>
+        </function_calls>
+        '''
+    )
+    async def browser_batch_actions(self, steps: list, abort_on_failure: bool = True) -> ToolResult:
+        """Run several browser actions in order and return the final state
+        
+        Args:
+            steps (list): Ordered list of {action, params, wait_for_selector, wait_ms} steps
+            abort_on_failure (bool, optional): Skip remaining steps after a failure. Defaults to True.
+            
+        Returns:
+            dict: Result of the execution
+        """
+        if isinstance(steps, str):
+            try:
+                steps = json.loads(steps)
+            except json.JSONDecodeError as e:
+                return self.fail_response(f"Invalid steps JSON: {e}")
+        if isinstance(abort_on_failure, str):
+            abort_on_failure = abort_on_failure.lower() != "false"
+        if not isinstance(steps, list) or not steps:
+            return self.fail_response("steps must be a non-empty list")
+        
+        logger.debug(f"\033[95mRunning {len(steps)} browser actions in one batch\033[0m")
+        return await self._execute_browser_action("batch", {"steps": steps, "abort_on_failure": abort_on_failure}, timeout=180)
@@ -1,8 +1,10 @@
 from agentpress.tool import ToolResult, openapi_schema, xml_schema
-from sandbox.tool_base import SandboxToolsBase    
+from sandbox.tool_base import SandboxToolsBase, SandboxApiError
+from sandbox.file_transfer import download_files
 from utils.files_utils import should_exclude_file, clean_path
 from agentpress.thread_manager import ThreadManager
 from utils.logger import logger
+from typing import Optional
 import os
 import json
 
@@ -13,6 +15,7 @@ class SandboxFilesTool(SandboxToolsBase):
         super().__init__(project_id, thread_manager)
         self.SNIPPET_LINES = 4  # Number of context lines to show around edits
         self.workspace_path = "/workspace"  # Ensure we're always operating in /workspace
+        self._file_api_available: Optional[bool] = None  # Whether the sandbox serves the in-place edit API
 
     def clean_path(self, path: str) -> str:
         """Clean and normalize a path to be relative to /workspace"""
@@ -30,34 +33,55 @@ class SandboxFilesTool(SandboxToolsBase):
         except Exception:
             return False
 
+    async def _edit_in_sandbox(self, endpoint: str, payload: dict) -> Optional[dict]:
+        """Apply an edit through the in-sandbox file API, avoiding a full download and upload.
+
+        Returns the API result, or None if the sandbox does not serve the API and the
+        caller should fall back to editing the file locally. Raises SandboxApiError if
+        the request failed after it may have reached the API; the edit must not be
+        repeated locally then.
+        """
+        if self._file_api_available is False:
+            return None
+        result = await self._call_sandbox_api(f"files/{endpoint}", payload, raise_errors=True)
+        if result is None:
+            logger.info("In-sandbox file API unavailable, falling back to download/upload edits")
+            self._file_api_available = False
+            return None
+        self._file_api_available = True
+        logger.debug(f"Edited {payload.get('path')} in sandbox (sha256={result.get('sha256')}):\n{result.get('diff')}")
+        return result
+
     async def get_workspace_state(self) -> dict:
-        """Get the current workspace state by reading all files"""
+        """Get the current workspace state by reading all top-level files in one batched download"""
         files_state = {}
         try:
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
             
             files = await self.sandbox.fs.list_files(self.workspace_path)
-            for file_info in files:
+            # Skip excluded files and directories
+            file_infos = [
+                file_info for file_info in files
+                if not (self._should_exclude_file(file_info.name) or file_info.is_dir)
+            ]
+            downloaded = await download_files(
+                self.sandbox, [f"{self.workspace_path}/{file_info.name}" for file_info in file_infos]
+            )
+            for file_info in file_infos:
                 rel_path = file_info.name
-                
-                # Skip excluded files and directories
-                if self._should_exclude_file(rel_path) or file_info.is_dir:
-                    continue
-
                 try:
-                    full_path = f"{self.workspace_path}/{rel_path}"
-                    content = (await self.sandbox.fs.download_file(full_path)).decode()
+                    content = downloaded[f"{self.workspace_path}/{rel_path}"].decode()
                     files_state[rel_path] = {
                         "content": content,
                         "is_dir": file_info.is_dir,
                         "size": file_info.size,
                         "modified": file_info.mod_time
                     }
-                except Exception as e:
-                    print(f"Error reading file {rel_path}: {e}")
                 except UnicodeDecodeError:
                     print(f"Skipping binary file: {rel_path}")
+                except Exception as e:
+                    print(f"Error reading file {rel_path}: {e}")
 
             return files_state
         
@@ -208,12 +232,24 @@ class SandboxFilesTool(SandboxToolsBase):
             
             file_path = self.clean_path(file_path)
             full_path = f"{self.workspace_path}/{file_path}"
+            old_str = old_str.expandtabs()
+            new_str = new_str.expandtabs()
+            
+            # Prefer editing in place inside the sandbox
+            result = await self._edit_in_sandbox("str_replace", {
+                "path": file_path,
+                "old_str": old_str,
+                "new_str": new_str
+            })
+            if result is not None:
+                if not result.get("success"):
+                    return self.fail_response(result.get("error") or "Error replacing string")
+                return self.success_response("Replacement successful.")
+            
             if not await self._file_exists(full_path):
                 return self.fail_response(f"File '{file_path}' does not exist")
             
             content = (await self.sandbox.fs.download_file(full_path)).decode()
-            old_str = old_str.expandtabs()
-            new_str = new_str.expandtabs()
             
             occurrences = content.count(old_str)
             if occurrences == 0:
@@ -240,6 +276,8 @@ class SandboxFilesTool(SandboxToolsBase):
             
             return self.success_response(message)
             
+        except SandboxApiError as e:
+            return self.fail_response(f"Error replacing string: {str(e)}. The edit may or may not have been applied; check the file before retrying.")
         except Exception as e:
             return self.fail_response(f"Error replacing string: {str(e)}")
 
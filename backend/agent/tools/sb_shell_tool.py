@@ -1,5 +1,6 @@
 import asyncio
-from typing import Optional, Dict, Any
+import re
+from typing import Optional, Dict, Any, Tuple
 import time
 import asyncio
 from uuid import uuid4
@@ -11,9 +12,22 @@ class SandboxShellTool(SandboxToolsBase):
     """Tool for executing tasks in a Daytona sandbox with browser-use capabilities. 
     Uses sessions for maintaining state between commands and provides comprehensive process management."""
 
+    # Full output of every tmux session is piped here (outside /workspace so it is never deployed)
+    LOG_DIR = "/tmp/shell_logs"
+    # Bytes kept from the start and end of a command's output when returning it to the LLM
+    OUTPUT_HEAD_BYTES = 4000
+    OUTPUT_TAIL_BYTES = 8000
+    # Minimum seconds between progress events and the max bytes of new output per event
+    PROGRESS_INTERVAL = 1.0
+    PROGRESS_MAX_BYTES = 16000
+
+    _TRUNCATION_SEPARATOR = "__SHELL_OUTPUT_TRUNCATED__"
+    _ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07]*\x07|\x1b[()][0-9A-Za-z]|\x1b[=>]")
+
     def __init__(self, project_id: str, thread_manager: ThreadManager):
         super().__init__(project_id, thread_manager)
         self._sessions: Dict[str, str] = {}  # Maps session names to session IDs
+        self._output_offsets: Dict[str, int] = {}  # Maps tmux session names to log bytes already returned
         self.workspace_path = "/workspace"  # Ensure we're always operating in /workspace
 
     async def _ensure_session(self, session_name: str = "default") -> str:
@@ -38,6 +52,84 @@ class SandboxShellTool(SandboxToolsBase):
             except Exception as e:
                 print(f"Warning: Failed to cleanup session {session_name}: {str(e)}")
 
+    def _log_file(self, session_name: str) -> str:
+        """Path of the sandbox file holding the full output of a tmux session."""
+        return f"{self.LOG_DIR}/{session_name}.log"
+
+    def _clean_output(self, output: str) -> str:
+        """Strip terminal escape sequences and carriage returns from raw pane output."""
+        output = self._ANSI_ESCAPE_RE.sub("", output)
+        return output.replace("\r\n", "\n").replace("\r", "")
+
+    async def _start_output_log(self, session_name: str):
+        """Pipe everything printed in a tmux session to its log file."""
+        log_file = self._log_file(session_name)
+        await self._execute_raw_command(
+            f"mkdir -p {self.LOG_DIR} && : > {log_file} && tmux pipe-pane -t {session_name} -o 'cat >> {log_file}'"
+        )
+        self._output_offsets[session_name] = 0
+
+    async def _ensure_output_log(self, session_name: str):
+        """Make sure an existing tmux session pipes its output to a log file.
+
+        Sessions created elsewhere (by another tool instance or an older version of this
+        tool) may have no log yet. An existing log is kept and only output written from
+        now on is treated as new.
+        """
+        log_file = self._log_file(session_name)
+        result = await self._execute_raw_command(
+            f"if [ -f {log_file} ]; then stat -c %s {log_file}; "
+            f"else mkdir -p {self.LOG_DIR} && : > {log_file} && echo 0; fi; "
+            f"tmux pipe-pane -t {session_name} -o 'cat >> {log_file}'"
+        )
+        try:
+            self._output_offsets[session_name] = int(result.get("output", "").split()[0])
+        except (IndexError, ValueError):
+            self._output_offsets[session_name] = 0
+
+    async def _read_new_output(self, session_name: str, offset: int, max_bytes: int) -> Tuple[Optional[str], int, int]:
+        """Read output appended to a session log since `offset`, keeping at most the last `max_bytes`.
+
+        Returns:
+            Tuple of (new output or None if the session has no log, new offset, bytes skipped)
+        """
+        log_file = self._log_file(session_name)
+        result = await self._execute_raw_command(
+            f"s=$(stat -c %s {log_file} 2>/dev/null || echo -1); "
+            f"start=$(( s - {max_bytes} > {offset} ? s - {max_bytes} : {offset} )); "
+            f"echo $s $start; "
+            f"tail -c +$(( start + 1 )) {log_file} 2>/dev/null | head -c $(( s > start ? s - start : 0 ))"
+        )
+        header, _, chunk = result.get("output", "").partition("\n")
+        try:
+            size, start = (int(value) for value in header.split())
+        except ValueError:
+            # Empty or garbled output from the exec: report no new output this time
+            return "", offset, 0
+        if size < 0:
+            return None, offset, 0
+        return self._clean_output(chunk), max(size, offset), start - offset
+
+    async def _read_output_summary(self, session_name: str) -> str:
+        """Return the head and tail of a session log, eliding the middle of long outputs."""
+        log_file = self._log_file(session_name)
+        head, tail = self.OUTPUT_HEAD_BYTES, self.OUTPUT_TAIL_BYTES
+        result = await self._execute_raw_command(
+            f"s=$(stat -c %s {log_file} 2>/dev/null || echo -1); echo $s; "
+            f"if [ $s -lt 0 ]; then tmux capture-pane -t {session_name} -p -S - -E -; "
+            f"elif [ $s -le {head + tail} ]; then cat {log_file}; "
+            f"else head -c {head} {log_file}; echo; echo {self._TRUNCATION_SEPARATOR}; tail -c {tail} {log_file}; fi"
+        )
+        header, _, output = result.get("output", "").partition("\n")
+        if self._TRUNCATION_SEPARATOR in output:
+            omitted = int(header) - head - tail
+            output = output.replace(
+                self._TRUNCATION_SEPARATOR,
+                f"... [{omitted} bytes omitted, full output in {log_file}] ...",
+                1
+            )
+        return self._clean_output(output)
+
     @openapi_schema({
         "type": "function",
         "function": {
@@ -136,8 +228,11 @@ class SandboxShellTool(SandboxToolsBase):
             session_exists = "not_exists" not in check_session.get("output", "")
             
             if not session_exists:
-                # Create a new tmux session
+                # Create a new tmux session and start logging its output
                 await self._execute_raw_command(f"tmux new-session -d -s {session_name}")
+                await self._start_output_log(session_name)
+            elif session_name not in self._output_offsets:
+                await self._ensure_output_log(session_name)
                 
             # Ensure we're in the correct directory and send command to tmux
             full_command = f"cd {cwd} && {command}"
@@ -145,16 +240,23 @@ class SandboxShellTool(SandboxToolsBase):
             
             if blocking:
                 # For blocking execution, use a more reliable approach
-                # Add a unique marker to detect command completion
+                # Add a unique marker to detect command completion. The exit code is
+                # escaped so it is only expanded in the pane: the echoed command line
+                # never matches the marker pattern, only the command's completion does.
                 marker = f"COMMAND_DONE_{str(uuid4())[:8]}"
-                completion_command = f"{command} ; echo {marker}"
-                wrapped_completion_command = completion_command.replace('"', '\\"')
+                marker_pattern = re.compile(rf"{marker}_(\d+)")
+                escaped_command = command.replace('"', '\\"')  # Escape double quotes
+                wrapped_completion_command = f"{escaped_command} ; echo {marker}_\\$?"
                 
                 # Send the command with completion marker
                 await self._execute_raw_command(f'tmux send-keys -t {session_name} "cd {cwd} && {wrapped_completion_command}" Enter')
                 
                 start_time = time.time()
-                final_output = ""
+                offset = self._output_offsets.get(session_name, 0)
+                last_progress_time = 0.0
+                pending_output = ""
+                scan_tail = ""
+                exit_code = None
                 
                 while (time.time() - start_time) < timeout:
                     # Wait a shorter interval for more responsive checking
@@ -165,24 +267,47 @@ class SandboxShellTool(SandboxToolsBase):
                     if "ended" in check_result.get("output", ""):
                         break
                         
-                    # Get current output and check for our completion marker
-                    output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-                    current_output = output_result.get("output", "")
+                    # Read only the output produced since the last poll
+                    new_output, offset, skipped = await self._read_new_output(session_name, offset, self.PROGRESS_MAX_BYTES)
+                    if new_output is None:
+                        # The log went missing (e.g. /tmp was cleaned): start a new one
+                        await self._ensure_output_log(session_name)
+                        offset = self._output_offsets[session_name]
+                        continue
+                    
+                    match = marker_pattern.search(scan_tail + new_output)
+                    if match:
+                        exit_code = int(match.group(1))
+                    scan_tail = (scan_tail + new_output)[-(len(marker) + 8):]
+                    
+                    if skipped:
+                        pending_output = f"... [{skipped} bytes skipped] ...\n"
+                    pending_output = (pending_output + new_output)[-self.PROGRESS_MAX_BYTES:]
                     
-                    if marker in current_output:
-                        final_output = current_output
+                    # Stream new output to the client at a bounded rate
+                    now = time.time()
+                    if pending_output and (exit_code is not None or now - last_progress_time >= self.PROGRESS_INTERVAL):
+                        self._publish_progress({
+                            "session_name": session_name,
+                            "output": pending_output
+                        })
+                        pending_output = ""
+                        last_progress_time = now
+                    
+                    if exit_code is not None:
                         break
                 
-                # If we didn't get the marker, capture whatever output we have
-                if not final_output:
-                    output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-                    final_output = output_result.get("output", "")
+                # Return a bounded head and tail, the full log stays in the sandbox
+                final_output = await self._read_output_summary(session_name)
                 
                 # Kill the session after capture
                 await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+                self._output_offsets.pop(session_name, None)
                 
                 return self.success_response({
                     "output": final_output,
+                    "exit_code": exit_code,
+                    "log_file": self._log_file(session_name),
                     "session_name": session_name,
                     "cwd": cwd,
                     "completed": True
@@ -241,7 +366,7 @@ class SandboxShellTool(SandboxToolsBase):
         "type": "function",
         "function": {
             "name": "check_command_output",
-            "description": "Check the output of a previously executed command in a tmux session. Use this to monitor the progress or results of non-blocking commands.",
+            "description": "Check the output of a previously executed command in a tmux session. Use this to monitor the progress or results of non-blocking commands. Returns only the output produced since the last check; the full output is kept in the session's log file.",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -295,19 +420,29 @@ class SandboxShellTool(SandboxToolsBase):
             if "not_exists" in check_result.get("output", ""):
                 return self.fail_response(f"Tmux session '{session_name}' does not exist.")
             
-            # Get output from tmux pane
-            output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-            output = output_result.get("output", "")
+            # Read only the output produced since the last check
+            offset = self._output_offsets.get(session_name, 0)
+            output, new_offset, skipped = await self._read_new_output(session_name, offset, self.OUTPUT_TAIL_BYTES)
+            if output is None:
+                # Session was not started by execute_command, fall back to the pane contents
+                output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
+                output = output_result.get("output", "")
+            else:
+                self._output_offsets[session_name] = new_offset
+                if skipped:
+                    output = f"... [{skipped} bytes omitted, full output in {self._log_file(session_name)}] ...\n{output}"
             
             # Kill session if requested
             if kill_session:
                 await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+                self._output_offsets.pop(session_name, None)
                 termination_status = "Session terminated."
             else:
                 termination_status = "Session still running."
             
             return self.success_response({
                 "output": output,
+                "log_file": self._log_file(session_name),
                 "session_name": session_name,
                 "status": termination_status
             })
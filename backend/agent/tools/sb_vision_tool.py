@@ -1,6 +1,8 @@
 import os
-import base64
+import asyncio
+import hashlib
 import mimetypes
+from collections import OrderedDict
 from typing import Optional, Tuple
 from io import BytesIO
 from PIL import Image
@@ -8,8 +10,9 @@ from urllib.parse import urlparse
 from agentpress.tool import ToolResult, openapi_schema, xml_schema
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
+from utils.image_context_store import store_image_context
 import json
-import requests
+import aiohttp
 
 # Add common image MIME types if mimetypes module is limited
 mimetypes.add_type("image/webp", ".webp")
@@ -28,6 +31,57 @@ DEFAULT_MAX_HEIGHT = 1080
 DEFAULT_JPEG_QUALITY = 85
 DEFAULT_PNG_COMPRESS_LEVEL = 6
 
+# Download settings for image URLs
+DOWNLOAD_TIMEOUT = 10
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Compressed images are cached by the sha256 of the original bytes and shared by all
+# tool instances in the process, so repeated views of the same image skip compression
+COMPRESSED_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Number of workspace files whose content hash is remembered, keyed by path, size and
+# modification time, so unchanged files are not downloaded again
+FILE_HASH_CACHE_SIZE = 1024
+
+_compressed_cache: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+_compressed_cache_bytes = 0
+_file_hashes: "OrderedDict[Tuple[str, str, int, str], str]" = OrderedDict()
+_http_session: Optional[aiohttp.ClientSession] = None
+
+
+def _get_http_session() -> aiohttp.ClientSession:
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            headers={"User-Agent": "Mozilla/5.0"},  # Some servers block default Python
+            timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT)
+        )
+    return _http_session
+
+
+def _get_cached_image(content_hash: str) -> Optional[Tuple[bytes, str]]:
+    cached = _compressed_cache.get(content_hash)
+    if cached is not None:
+        _compressed_cache.move_to_end(content_hash)
+    return cached
+
+
+def _cache_image(content_hash: str, compressed_bytes: bytes, mime_type: str):
+    global _compressed_cache_bytes
+    if content_hash in _compressed_cache or len(compressed_bytes) > COMPRESSED_CACHE_MAX_BYTES:
+        return
+    _compressed_cache[content_hash] = (compressed_bytes, mime_type)
+    _compressed_cache_bytes += len(compressed_bytes)
+    while _compressed_cache_bytes > COMPRESSED_CACHE_MAX_BYTES:
+        _, (evicted, _) = _compressed_cache.popitem(last=False)
+        _compressed_cache_bytes -= len(evicted)
+
+
+def _remember_file_hash(key: Tuple[str, str, int, str], content_hash: str):
+    _file_hashes[key] = content_hash
+    _file_hashes.move_to_end(key)
+    if len(_file_hashes) > FILE_HASH_CACHE_SIZE:
+        _file_hashes.popitem(last=False)
+
 class SandboxVisionTool(SandboxToolsBase):
     """Tool for allowing the agent to 'see' images within the sandbox."""
 
@@ -106,39 +160,45 @@ class SandboxVisionTool(SandboxToolsBase):
         parsed_url = urlparse(file_path)
         return parsed_url.scheme in ('http', 'https')
     
-    def download_image_from_url(self, url: str) -> Tuple[bytes, str]:
-        """Download image from a URL"""
-        try:
-            headers = {
-                "User-Agent": "Mozilla/5.0"  # Some servers block default Python
-            }
-
-            # HEAD request to get the image size
-            head_response = requests.head(url, timeout=10, headers=headers, stream=True)
-            head_response.raise_for_status()
-            
-            # Check content length
-            content_length = int(head_response.headers.get('Content-Length'))
-            if content_length and content_length > MAX_IMAGE_SIZE:
-                raise Exception(f"Image is too large ({(content_length)/(1024*1024):.2f}MB) for the maximum allowed size of {MAX_IMAGE_SIZE/(1024*1024):.2f}MB")
-            
-            # Download the image
-            response = requests.get(url, timeout=10, headers=headers, stream=True)
+    async def download_image_from_url(self, url: str) -> Tuple[bytes, str]:
+        """Download image from a URL using the shared HTTP session."""
+        session = _get_http_session()
+        async with session.get(url) as response:
             response.raise_for_status()
 
-            image_bytes = response.content
-            if len(image_bytes) > MAX_IMAGE_SIZE:
-                raise Exception(f"Downloaded image is too large ({(len(image_bytes))/(1024*1024):.2f}MB). Maximum allowed size of {MAX_IMAGE_SIZE/(1024*1024):.2f}MB")
-
             # Get MIME type
-            mime_type = response.headers.get('Content-Type')
+            mime_type = response.headers.get('Content-Type', '').split(';')[0].strip()
             if not mime_type or not mime_type.startswith('image/'):
                 raise Exception(f"URL does not point to an image (Content-Type: {mime_type}): {url}")
-            
-            return image_bytes, mime_type
-        except Exception as e:
-            return self.fail_response(f"Failed to download image from URL: {str(e)}")
-    
+
+            # Check content length before reading the body
+            if response.content_length and response.content_length > MAX_IMAGE_SIZE:
+                raise Exception(f"Image is too large ({(response.content_length)/(1024*1024):.2f}MB) for the maximum allowed size of {MAX_IMAGE_SIZE/(1024*1024):.2f}MB")
+
+            # Stream the body so servers that omit Content-Length can't exceed the limit
+            buffer = BytesIO()
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                buffer.write(chunk)
+                if buffer.tell() > MAX_IMAGE_SIZE:
+                    raise Exception(f"Downloaded image is too large. Maximum allowed size of {MAX_IMAGE_SIZE/(1024*1024):.2f}MB")
+
+            return buffer.getvalue(), mime_type
+
+    async def get_compressed_image(self, image_bytes: bytes, mime_type: str, file_path: str,
+                                   content_hash: Optional[str] = None) -> Tuple[bytes, str]:
+        """Compress an image in a worker thread, reusing earlier results for identical content."""
+        content_hash = content_hash or hashlib.sha256(image_bytes).hexdigest()
+        cached = _get_cached_image(content_hash)
+        if cached is not None:
+            print(f"[SeeImage] Using cached compressed image for '{file_path}'")
+            return cached
+
+        compressed_bytes, compressed_mime_type = await asyncio.to_thread(
+            self.compress_image, image_bytes, mime_type, file_path
+        )
+        _cache_image(content_hash, compressed_bytes, compressed_mime_type)
+        return compressed_bytes, compressed_mime_type
+
     @openapi_schema({
         "type": "function",
         "function": {
@@ -183,9 +243,10 @@ class SandboxVisionTool(SandboxToolsBase):
             is_url = self.is_url(file_path)
             if is_url:
                 try:
-                    image_bytes, mime_type = self.download_image_from_url(file_path)
+                    image_bytes, mime_type = await self.download_image_from_url(file_path)
                     original_size = len(image_bytes)
                     cleaned_path = file_path
+                    content_hash = None
                 except Exception as e:
                     return self.fail_response(f"Failed to download image from URL: {str(e)}")
             else:
@@ -208,11 +269,17 @@ class SandboxVisionTool(SandboxToolsBase):
                 if file_info.size > MAX_IMAGE_SIZE:
                     return self.fail_response(f"Image file '{cleaned_path}' is too large ({file_info.size / (1024*1024):.2f}MB). Maximum size is {MAX_IMAGE_SIZE / (1024*1024)}MB.")
 
-                # Read image file content
-                try:
-                    image_bytes = await self.sandbox.fs.download_file(full_path)
-                except Exception as e:
-                    return self.fail_response(f"Could not read image file: {cleaned_path}")
+                # Read image file content, unless an unchanged file was already compressed
+                file_key = (self.sandbox.id, full_path, file_info.size, str(file_info.mod_time))
+                content_hash = _file_hashes.get(file_key)
+                image_bytes = None
+                if content_hash is None or _get_cached_image(content_hash) is None:
+                    try:
+                        image_bytes = await self.sandbox.fs.download_file(full_path)
+                    except Exception as e:
+                        return self.fail_response(f"Could not read image file: {cleaned_path}")
+                    content_hash = hashlib.sha256(image_bytes).hexdigest()
+                    _remember_file_hash(file_key, content_hash)
 
                 # Determine MIME type
                 mime_type, _ = mimetypes.guess_type(full_path)
@@ -230,19 +297,24 @@ class SandboxVisionTool(SandboxToolsBase):
             
 
             # Compress the image
-            compressed_bytes, compressed_mime_type = self.compress_image(image_bytes, mime_type, cleaned_path)
+            compressed_bytes, compressed_mime_type = await self.get_compressed_image(
+                image_bytes, mime_type, cleaned_path, content_hash
+            )
             
             # Check if compressed image is still too large
             if len(compressed_bytes) > MAX_COMPRESSED_SIZE:
                 return self.fail_response(f"Image file '{cleaned_path}' is still too large after compression ({len(compressed_bytes) / (1024*1024):.2f}MB). Maximum compressed size is {MAX_COMPRESSED_SIZE / (1024*1024)}MB.")
 
-            # Convert to base64
-            base64_image = base64.b64encode(compressed_bytes).decode('utf-8')
+            # Store the image as a blob; the message only keeps the reference
+            try:
+                image_reference = await store_image_context(self.thread_id, compressed_bytes, compressed_mime_type)
+            except Exception as e:
+                return self.fail_response(f"Could not store image '{cleaned_path}': {str(e)}")
 
             # Prepare the temporary message content
             image_context_data = {
                 "mime_type": compressed_mime_type,
-                "base64": base64_image,
+                "image_ref": image_reference,
                 "file_path": cleaned_path, # Include path for context
                 "original_size": original_size,
                 "compressed_size": len(compressed_bytes)
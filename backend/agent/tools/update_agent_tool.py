@@ -1,8 +1,9 @@
 import json
-import httpx
 from typing import Optional, Dict, Any, List
 from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
 from agentpress.thread_manager import ThreadManager
+from mcp_service.registry import list_servers, get_server_details
+from agent.config_cache import invalidate_agent_config
 
 class UpdateAgentTool(Tool):
     """Tool for updating agent configuration.
@@ -16,10 +17,6 @@ class UpdateAgentTool(Tool):
         self.thread_manager = thread_manager
         self.db = db_connection
         self.agent_id = agent_id
-        # Smithery API configuration
-        self.smithery_api_base_url = "https://registry.smithery.ai"
-        import os
-        self.smithery_api_key = os.getenv("SMITHERY_API_KEY")
 
     @openapi_schema({
         "type": "function",
@@ -164,6 +161,7 @@ class UpdateAgentTool(Tool):
             
             if not result.data:
                 return self.fail_response("Failed to update agent")
+            await invalidate_agent_config(self.agent_id, result.data[0].get('account_id'))
 
             return self.success_response({
                 "message": "Agent updated successfully",
@@ -296,68 +294,45 @@ class UpdateAgentTool(Tool):
             ToolResult with matching MCP servers
         """
         try:
-            async with httpx.AsyncClient() as client:
-                headers = {
-                    "Accept": "application/json",
-                    "User-Agent": "Suna-MCP-Integration/1.0"
-                }
-                
-                if self.smithery_api_key:
-                    headers["Authorization"] = f"Bearer {self.smithery_api_key}"
-                
-                params = {
-                    "q": query,
-                    "page": 1,
-                    "pageSize": min(limit * 2, 50)  # Get more results to filter
-                }
-                
-                response = await client.get(
-                    f"{self.smithery_api_base_url}/servers",
-                    headers=headers,
-                    params=params,
-                    timeout=30.0
-                )
-                
-                response.raise_for_status()
-                data = response.json()
-                servers = data.get("servers", [])
-                
-                # Filter by category if specified
-                if category:
-                    filtered_servers = []
-                    for server in servers:
-                        server_category = self._categorize_server(server)
-                        if server_category == category:
-                            filtered_servers.append(server)
-                    servers = filtered_servers
-                
-                # Sort by useCount and limit results
-                servers = sorted(servers, key=lambda x: x.get("useCount", 0), reverse=True)[:limit]
-                
-                # Format results for user-friendly display
-                formatted_servers = []
+            data = await list_servers(q=query, page=1, page_size=min(limit * 2, 50))  # Get more results to filter
+            servers = data.get("servers", [])
+            
+            # Filter by category if specified
+            if category:
+                filtered_servers = []
                 for server in servers:
-                    formatted_servers.append({
-                        "name": server.get("displayName", server.get("qualifiedName", "Unknown")),
-                        "qualifiedName": server.get("qualifiedName"),
-                        "description": server.get("description", "No description available"),
-                        "useCount": server.get("useCount", 0),
-                        "category": self._categorize_server(server),
-                        "homepage": server.get("homepage", ""),
-                        "isDeployed": server.get("isDeployed", False)
-                    })
-                
-                if not formatted_servers:
-                    return ToolResult(
-                        success=False,
-                        output=json.dumps([], ensure_ascii=False)
-                    )
-                
+                    server_category = self._categorize_server(server)
+                    if server_category == category:
+                        filtered_servers.append(server)
+                servers = filtered_servers
+            
+            # Sort by useCount and limit results
+            servers = sorted(servers, key=lambda x: x.get("useCount", 0), reverse=True)[:limit]
+            
+            # Format results for user-friendly display
+            formatted_servers = []
+            for server in servers:
+                formatted_servers.append({
+                    "name": server.get("displayName", server.get("qualifiedName", "Unknown")),
+                    "qualifiedName": server.get("qualifiedName"),
+                    "description": server.get("description", "No description available"),
+                    "useCount": server.get("useCount", 0),
+                    "category": self._categorize_server(server),
+                    "homepage": server.get("homepage", ""),
+                    "isDeployed": server.get("isDeployed", False)
+                })
+            
+            if not formatted_servers:
                 return ToolResult(
-                    success=True,
-                    output=json.dumps(formatted_servers, ensure_ascii=False)
+                    success=False,
+                    output=json.dumps([], ensure_ascii=False)
                 )
-                
+            
+            return ToolResult(
+                success=True,
+                output=json.dumps(formatted_servers, ensure_ascii=False)
+            )
+            
         except Exception as e:
             return self.fail_response(f"Error searching MCP servers: {str(e)}")
 
@@ -402,32 +377,7 @@ class UpdateAgentTool(Tool):
         """
         try:
             # First get server metadata from registry
-            async with httpx.AsyncClient() as client:
-                headers = {
-                    "Accept": "application/json",
-                    "User-Agent": "Suna-MCP-Integration/1.0"
-                }
-                
-                if self.smithery_api_key:
-                    headers["Authorization"] = f"Bearer {self.smithery_api_key}"
-                
-                # URL encode the qualified name if it contains special characters
-                from urllib.parse import quote
-                if '@' in qualified_name or '/' in qualified_name:
-                    encoded_name = quote(qualified_name, safe='')
-                else:
-                    encoded_name = qualified_name
-                
-                url = f"{self.smithery_api_base_url}/servers/{encoded_name}"
-                
-                response = await client.get(
-                    url,
-                    headers=headers,
-                    timeout=30.0
-                )
-                
-                response.raise_for_status()
-                server_data = response.json()
+            server_data = await get_server_details(qualified_name)
             
             # Now connect to the MCP server to get actual tools using ClientSession
             try:
@@ -664,6 +614,7 @@ class UpdateAgentTool(Tool):
             
             if not update_result.data:
                 return self.fail_response("Failed to save MCP configuration")
+            await invalidate_agent_config(self.agent_id)
             
             return self.success_response({
                 "message": f"Successfully {action} MCP server '{display_name}' with {len(enabled_tools)} tools",
@@ -716,55 +667,38 @@ class UpdateAgentTool(Tool):
             ToolResult with popular MCP servers
         """
         try:
-            async with httpx.AsyncClient() as client:
-                headers = {
-                    "Accept": "application/json",
-                    "User-Agent": "Suna-MCP-Integration/1.0"
-                }
-                
-                if self.smithery_api_key:
-                    headers["Authorization"] = f"Bearer {self.smithery_api_key}"
-                
-                response = await client.get(
-                    f"{self.smithery_api_base_url}/servers",
-                    headers=headers,
-                    params={"page": 1, "pageSize": 50},
-                    timeout=30.0
-                )
-                
-                response.raise_for_status()
-                data = response.json()
-                servers = data.get("servers", [])
-                
-                # Categorize servers
-                categorized = {}
-                for server in servers:
-                    server_category = self._categorize_server(server)
-                    if category and server_category != category:
-                        continue
-                        
-                    if server_category not in categorized:
-                        categorized[server_category] = []
+            data = await list_servers(page=1, page_size=50)
+            servers = data.get("servers", [])
+            
+            # Categorize servers
+            categorized = {}
+            for server in servers:
+                server_category = self._categorize_server(server)
+                if category and server_category != category:
+                    continue
                     
-                    categorized[server_category].append({
-                        "name": server.get("displayName", server.get("qualifiedName", "Unknown")),
-                        "qualifiedName": server.get("qualifiedName"),
-                        "description": server.get("description", "No description available"),
-                        "useCount": server.get("useCount", 0),
-                        "homepage": server.get("homepage", ""),
-                        "isDeployed": server.get("isDeployed", False)
-                    })
-                
-                # Sort categories and servers within each category
-                for cat in categorized:
-                    categorized[cat] = sorted(categorized[cat], key=lambda x: x["useCount"], reverse=True)[:5]
-                
-                return self.success_response({
-                    "message": f"Found popular MCP servers" + (f" in category '{category}'" if category else ""),
-                    "categorized_servers": categorized,
-                    "total_categories": len(categorized)
+                if server_category not in categorized:
+                    categorized[server_category] = []
+                
+                categorized[server_category].append({
+                    "name": server.get("displayName", server.get("qualifiedName", "Unknown")),
+                    "qualifiedName": server.get("qualifiedName"),
+                    "description": server.get("description", "No description available"),
+                    "useCount": server.get("useCount", 0),
+                    "homepage": server.get("homepage", ""),
+                    "isDeployed": server.get("isDeployed", False)
                 })
-                
+            
+            # Sort categories and servers within each category
+            for cat in categorized:
+                categorized[cat] = sorted(categorized[cat], key=lambda x: x["useCount"], reverse=True)[:5]
+            
+            return self.success_response({
+                "message": f"Found popular MCP servers" + (f" in category '{category}'" if category else ""),
+                "categorized_servers": categorized,
+                "total_categories": len(categorized)
+            })
+            
         except Exception as e:
             return self.fail_response(f"Error getting popular MCP servers: {str(e)}")
 
@@ -4,7 +4,10 @@ from dotenv import load_dotenv
 from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
 from utils.config import config
 from sandbox.tool_base import SandboxToolsBase
+from sandbox.file_transfer import upload_files
 from agentpress.thread_manager import ThreadManager
+from typing import Optional
+from urllib.parse import urlparse
 import json
 import os
 import datetime
@@ -13,6 +16,27 @@ import logging
 
 # TODO: add subpages, etc... in filters as sometimes its necessary 
 
+# Number of URLs scraped at the same time by one scrape_webpage call
+SCRAPE_CONCURRENCY = 5
+# Per-attempt timeout for a single Firecrawl scrape
+SCRAPE_TIMEOUT_SECONDS = 120
+SCRAPE_MAX_RETRIES = 3
+# Firecrawl responses worth retrying (rate limiting and transient gateway errors)
+SCRAPE_RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+# Pooled client shared by all tool instances so connections to Firecrawl are reused
+_firecrawl_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_firecrawl_client() -> httpx.AsyncClient:
+    global _firecrawl_client
+    if _firecrawl_client is None or _firecrawl_client.is_closed:
+        _firecrawl_client = httpx.AsyncClient(
+            timeout=SCRAPE_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _firecrawl_client
+
 class SandboxWebSearchTool(SandboxToolsBase):
     """Tool for performing web searches using Tavily API and web scraping using Firecrawl."""
 
@@ -210,26 +234,23 @@ class SandboxWebSearchTool(SandboxToolsBase):
             
             logging.info(f"Processing {len(url_list)} URLs: {url_list}")
             
-            # Process each URL and collect results
-            results = []
-            for url in url_list:
-                try:
-                    # Add protocol if missing
-                    if not (url.startswith('http://') or url.startswith('https://')):
-                        url = 'https://' + url
-                        logging.info(f"Added https:// protocol to URL: {url}")
-                    
-                    # Scrape this URL
-                    result = await self._scrape_single_url(url)
-                    results.append(result)
-                    
-                except Exception as e:
-                    logging.error(f"Error processing URL {url}: {str(e)}")
-                    results.append({
-                        "url": url,
-                        "success": False,
-                        "error": str(e)
-                    })
+            # Add protocol if missing
+            url_list = [
+                url if url.startswith('http://') or url.startswith('https://') else 'https://' + url
+                for url in url_list
+            ]
+
+            # Scrape all URLs concurrently, a bounded number at a time
+            semaphore = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+
+            async def scrape_with_limit(url: str) -> dict:
+                async with semaphore:
+                    return await self._scrape_single_url(url)
+
+            results = list(await asyncio.gather(*(scrape_with_limit(url) for url in url_list)))
+
+            # Save all successful results to the sandbox in one transfer
+            await self._save_scrape_results(results)
             
             # Summarize results
             successful = sum(1 for r in results if r.get("success", False))
@@ -267,52 +288,50 @@ class SandboxWebSearchTool(SandboxToolsBase):
     async def _scrape_single_url(self, url: str) -> dict:
         """
         Helper function to scrape a single URL and return the result information.
+        The formatted content is returned under `file_content` to be saved by the caller.
         """
         logging.info(f"Scraping single URL: {url}")
         
         try:
             # ---------- Firecrawl scrape endpoint ----------
-            logging.info(f"Sending request to Firecrawl for URL: {url}")
-            async with httpx.AsyncClient() as client:
-                headers = {
-                    "Authorization": f"Bearer {self.firecrawl_api_key}",
-                    "Content-Type": "application/json",
-                }
-                payload = {
-                    "url": url,
-                    "formats": ["markdown"]
-                }
-                
-                # Use longer timeout and retry logic for more reliability
-                max_retries = 3
-                timeout_seconds = 120
-                retry_count = 0
-                
-                while retry_count < max_retries:
-                    try:
-                        logging.info(f"Sending request to Firecrawl (attempt {retry_count + 1}/{max_retries})")
-                        response = await client.post(
-                            f"{self.firecrawl_url}/v1/scrape",
-                            json=payload,
-                            headers=headers,
-                            timeout=timeout_seconds,
-                        )
-                        response.raise_for_status()
-                        data = response.json()
-                        logging.info(f"Successfully received response from Firecrawl for {url}")
-                        break
-                    except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ReadError) as timeout_err:
-                        retry_count += 1
-                        logging.warning(f"Request timed out (attempt {retry_count}/{max_retries}): {str(timeout_err)}")
-                        if retry_count >= max_retries:
-                            raise Exception(f"Request timed out after {max_retries} attempts with {timeout_seconds}s timeout")
-                        # Exponential backoff
-                        logging.info(f"Waiting {2 ** retry_count}s before retry")
-                        await asyncio.sleep(2 ** retry_count)
-                    except Exception as e:
-                        # Don't retry on non-timeout errors
-                        logging.error(f"Error during scraping: {str(e)}")
-                        raise e
+            client = _get_firecrawl_client()
+            headers = {
+                "Authorization": f"Bearer {self.firecrawl_api_key}",
+                "Content-Type": "application/json",
+            }
+            payload = {
+                "url": url,
+                "formats": ["markdown"]
+            }
+            
+            retry_count = 0
+            while True:
+                try:
+                    logging.info(f"Sending request to Firecrawl for {url} (attempt {retry_count + 1}/{SCRAPE_MAX_RETRIES})")
+                    response = await client.post(
+                        f"{self.firecrawl_url}/v1/scrape",
+                        json=payload,
+                        headers=headers,
+                        timeout=SCRAPE_TIMEOUT_SECONDS,
+                    )
+                    response.raise_for_status()
+                    data = response.json()
+                    logging.info(f"Successfully received response from Firecrawl for {url}")
+                    break
+                except (httpx.TimeoutException, httpx.ReadError, httpx.HTTPStatusError) as retry_err:
+                    # Retry timeouts and transient errors, not client errors
+                    retryable = (
+                        not isinstance(retry_err, httpx.HTTPStatusError)
+                        or retry_err.response.status_code in SCRAPE_RETRY_STATUS_CODES
+                    )
+                    retry_count += 1
+                    if not retryable or retry_count >= SCRAPE_MAX_RETRIES:
+                        if isinstance(retry_err, httpx.TimeoutException):
+                            raise Exception(f"Request timed out after {SCRAPE_MAX_RETRIES} attempts with {SCRAPE_TIMEOUT_SECONDS}s timeout")
+                        raise
+                    logging.warning(f"Request for {url} failed (attempt {retry_count}/{SCRAPE_MAX_RETRIES}): {str(retry_err)}")
+                    # Exponential backoff
+                    await asyncio.sleep(2 ** retry_count)
 
             # Format the response
             title = data.get("data", {}).get("metadata", {}).get("title", "")
@@ -328,41 +347,13 @@ class SandboxWebSearchTool(SandboxToolsBase):
             # Add metadata if available
             if "metadata" in data.get("data", {}):
                 formatted_result["metadata"] = data["data"]["metadata"]
-                logging.info(f"Added metadata: {data['data']['metadata'].keys()}")
-            
-            # Create a simple filename from the URL domain and date
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            # Extract domain from URL for the filename
-            from urllib.parse import urlparse
-            parsed_url = urlparse(url)
-            domain = parsed_url.netloc.replace("www.", "")
-            
-            # Clean up domain for filename
-            domain = "".join([c if c.isalnum() else "_" for c in domain])
-            safe_filename = f"{timestamp}_{domain}.json"
-            
-            logging.info(f"Generated filename: {safe_filename}")
-            
-            # Save results to a file in the /workspace/scrape directory
-            scrape_dir = f"{self.workspace_path}/scrape"
-            await self.sandbox.fs.create_folder(scrape_dir, "755")
-            
-            results_file_path = f"{scrape_dir}/{safe_filename}"
-            json_content = json.dumps(formatted_result, ensure_ascii=False, indent=2)
-            logging.info(f"Saving content to file: {results_file_path}, size: {len(json_content)} bytes")
-            
-            await self.sandbox.fs.upload_file(
-                json_content.encode(),
-                results_file_path,
-            )
             
             return {
                 "url": url,
                 "success": True,
                 "title": title,
-                "file_path": results_file_path,
-                "content_length": len(markdown_content)
+                "content_length": len(markdown_content),
+                "file_content": json.dumps(formatted_result, ensure_ascii=False, indent=2).encode()
             }
         
         except Exception as e:
@@ -376,6 +367,49 @@ class SandboxWebSearchTool(SandboxToolsBase):
                 "error": error_message
             }
 
+    async def _save_scrape_results(self, results: list):
+        """Save successful scrape results to /workspace/scrape with a single batched upload.
+
+        Sets `file_path` on each saved result; results that could not be saved are marked as failed.
+        """
+        # Create a simple filename from the URL domain and date
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        scrape_dir = f"{self.workspace_path}/scrape"
+        files = []
+        used_names = set()
+        for result in results:
+            content = result.pop("file_content", None)
+            if not result.get("success") or content is None:
+                continue
+            # Clean up domain for filename
+            domain = urlparse(result["url"]).netloc.replace("www.", "")
+            domain = "".join([c if c.isalnum() else "_" for c in domain])
+            safe_filename = f"{timestamp}_{domain}.json"
+            suffix = 1
+            while safe_filename in used_names:
+                suffix += 1
+                safe_filename = f"{timestamp}_{domain}_{suffix}.json"
+            used_names.add(safe_filename)
+            result["file_path"] = f"{scrape_dir}/{safe_filename}"
+            files.append((result["file_path"], content))
+
+        if not files:
+            return
+
+        logging.info(f"Saving {len(files)} scrape results to {scrape_dir}")
+        try:
+            manifest = await upload_files(self.sandbox, files)
+        except Exception as e:
+            logging.error(f"Error saving scrape results: {str(e)}")
+            manifest = {}
+
+        for result in results:
+            path = result.get("file_path")
+            if path and not manifest.get(path, {}).get("verified"):
+                result.pop("file_path")
+                result["success"] = False
+                result["error"] = "Scraped successfully but the result could not be saved to the workspace"
+
 if __name__ == "__main__":
     async def test_web_search():
         """Test function for the web search tool"""
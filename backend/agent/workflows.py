@@ -24,7 +24,7 @@ from agent.run_agent import get_stream_context, run_agent_run_stream
 from utils.constants import MODEL_NAME_ALIASES
 from flags.flags import is_enabled
 from .utils import check_for_active_project_agent_run, stop_agent_run as _stop_agent_run
-from .config_helper import extract_agent_config
+from .config_cache import get_agent_config
 
 router = APIRouter()
 db = None
@@ -448,17 +448,14 @@ async def execute_agent_workflow(
                 'order': step_data['step_order']
             })
     
-    agent_result = await client.table('agents').select('*, agent_versions!current_version_id(*)').eq('agent_id', agent_id).execute()
-    if not agent_result.data:
+    agent_config = await get_agent_config(client, agent_id)
+    if not agent_config:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    agent_data = agent_result.data[0]
-    account_id = agent_data['account_id']
+    account_id = agent_config['account_id']
     
-    version_data = agent_data.get('agent_versions')
-    agent_config = extract_agent_config(agent_data, version_data)
-    if version_data:
-        logger.info(f"Using agent {agent_config['name']} ({agent_id}) version {agent_config.get('version_name', 'v1')} for workflow")
+    if agent_config.get('version_name'):
+        logger.info(f"Using agent {agent_config['name']} ({agent_id}) version {agent_config['version_name']} for workflow")
     else:
         logger.info(f"Using agent {agent_config['name']} ({agent_id}) - no version data for workflow")
     
@@ -805,20 +802,13 @@ async def trigger_workflow_webhook(
                 content={"error": "Workflow is not active"}
             )
         
-        agent_result = await client.table('agents').select('*, agent_versions!current_version_id(*)').eq('agent_id', agent_id).execute()
-        if not agent_result.data:
+        agent_config = await get_agent_config(client, agent_id)
+        if not agent_config:
             return JSONResponse(
                 status_code=404,
                 content={"error": "Agent not found"}
             )
         
-        agent_data = agent_result.data[0]
-        account_id = agent_data['account_id']
-        
-        version_data = agent_data.get('agent_versions')
-        agent_config = extract_agent_config(agent_data, version_data)
-        agent_config['account_id'] = account_id  # Ensure account_id is in the config
-        
         from triggers.integration import WorkflowTriggerExecutor
         from triggers.core import TriggerResult, TriggerEvent, TriggerType
 
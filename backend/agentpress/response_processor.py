@@ -12,6 +12,7 @@ import json
 import re
 import uuid
 import asyncio
+from contextvars import ContextVar
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional, AsyncGenerator, Tuple, Union, Callable, Literal
 from dataclasses import dataclass
@@ -33,6 +34,9 @@ XmlAddingStrategy = Literal["user_message", "assistant_message", "inline_edit"]
 # Type alias for tool execution strategy
 ToolExecutionStrategy = Literal["sequential", "parallel"]
 
+# Tool call (and its index) executing in the current task, used to attribute progress events
+_current_tool_call: ContextVar[Optional[Tuple[Dict[str, Any], Optional[int]]]] = ContextVar("current_tool_call", default=None)
+
 @dataclass
 class ToolExecutionContext:
     """Context for a tool execution including call details, result, and display info."""
@@ -85,7 +89,12 @@ class ProcessorConfig:
 
 class ResponseProcessor:
     """Processes LLM responses, extracting and executing tool calls."""
-    
+
+    # Upper bound on buffered progress events; the oldest are dropped when exceeded
+    MAX_PENDING_TOOL_PROGRESS = 256
+    # How often pending tool executions are polled for progress events (seconds)
+    TOOL_PROGRESS_POLL_INTERVAL = 0.25
+
     def __init__(self, tool_registry: ToolRegistry, add_message_callback: Callable, trace: Optional[StatefulTraceClient] = None, is_agent_builder: bool = False, target_agent_id: Optional[str] = None, agent_config: Optional[dict] = None):
         """Initialize the ResponseProcessor.
         
@@ -103,6 +112,50 @@ class ResponseProcessor:
         self.is_agent_builder = is_agent_builder
         self.target_agent_id = target_agent_id
         self.agent_config = agent_config
+        # Transient progress events published by running tools, drained into the stream
+        self._tool_progress_queue: asyncio.Queue = asyncio.Queue(maxsize=self.MAX_PENDING_TOOL_PROGRESS)
+
+    def publish_tool_progress(self, content: Dict[str, Any]) -> None:
+        """Publish a transient progress event for the tool call running in the current task.
+
+        Progress events are streamed to the client as ``tool_progress`` status
+        messages but are never saved to the thread, so the LLM does not see them.
+        """
+        current = _current_tool_call.get()
+        if current is None:
+            logger.debug("Ignoring tool progress published outside of a tool execution")
+            return
+        tool_call, tool_index = current
+        if self._tool_progress_queue.full():
+            try:
+                self._tool_progress_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        self._tool_progress_queue.put_nowait((tool_call, tool_index, content))
+
+    def _drain_tool_progress(self, thread_id: str, thread_run_id: str) -> List[Dict[str, Any]]:
+        """Format all buffered tool progress events as transient (unsaved) status messages."""
+        messages = []
+        while not self._tool_progress_queue.empty():
+            tool_call, tool_index, content = self._tool_progress_queue.get_nowait()
+            now = datetime.now(timezone.utc).isoformat()
+            messages.append({
+                "message_id": None, "thread_id": thread_id, "type": "status", "is_llm_message": False,
+                "content": to_json_string({
+                    "role": "assistant", "status_type": "tool_progress",
+                    "function_name": tool_call.get("function_name"), "xml_tag_name": tool_call.get("xml_tag_name"),
+                    "tool_index": tool_index, "tool_call_id": tool_call.get("id"),
+                    **content
+                }),
+                "metadata": to_json_string({"thread_run_id": thread_run_id}),
+                "created_at": now, "updated_at": now
+            })
+        return messages
+
+    def _clear_tool_progress(self) -> None:
+        """Discard buffered tool progress events, e.g. left over from an interrupted run."""
+        while not self._tool_progress_queue.empty():
+            self._tool_progress_queue.get_nowait()
 
     async def _yield_message(self, message_obj: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
         """Helper to yield a message with proper formatting.
@@ -192,6 +245,7 @@ class ResponseProcessor:
                    f"Execute on stream={config.execute_on_stream}, Strategy={config.tool_execution_strategy}")
 
         thread_run_id = str(uuid.uuid4())
+        self._clear_tool_progress()
 
         try:
             # --- Save and Yield Start Events ---
@@ -293,7 +347,7 @@ class ResponseProcessor:
                                         if started_msg_obj: yield format_for_yield(started_msg_obj)
                                         yielded_tool_indices.add(tool_index) # Mark status as yielded
 
-                                        execution_task = asyncio.create_task(self._execute_tool(tool_call))
+                                        execution_task = asyncio.create_task(self._execute_tool(tool_call, tool_index))
                                         pending_tool_executions.append({
                                             "task": execution_task, "tool_call": tool_call,
                                             "tool_index": tool_index, "context": context
@@ -363,13 +417,16 @@ class ResponseProcessor:
                                 if started_msg_obj: yield format_for_yield(started_msg_obj)
                                 yielded_tool_indices.add(tool_index) # Mark status as yielded
 
-                                execution_task = asyncio.create_task(self._execute_tool(tool_call_data))
+                                execution_task = asyncio.create_task(self._execute_tool(tool_call_data, tool_index))
                                 pending_tool_executions.append({
                                     "task": execution_task, "tool_call": tool_call_data,
                                     "tool_index": tool_index, "context": context
                                 })
                                 tool_index += 1
 
+                for progress_msg in self._drain_tool_progress(thread_id, thread_run_id):
+                    yield progress_msg
+
                 if finish_reason == "xml_tool_limit_reached":
                     logger.info("Stopping stream processing after loop due to XML tool call limit")
                     self.trace.event(name="stopping_stream_processing_after_loop_due_to_xml_tool_call_limit", level="DEFAULT", status_message=(f"Stopping stream processing after loop due to XML tool call limit"))
@@ -417,8 +474,11 @@ class ResponseProcessor:
                 logger.info(f"Waiting for {len(pending_tool_executions)} pending streamed tool executions")
                 self.trace.event(name="waiting_for_pending_streamed_tool_executions", level="DEFAULT", status_message=(f"Waiting for {len(pending_tool_executions)} pending streamed tool executions"))
                 # ... (asyncio.wait logic) ...
-                pending_tasks = [execution["task"] for execution in pending_tool_executions]
-                done, _ = await asyncio.wait(pending_tasks)
+                remaining_tasks = {execution["task"] for execution in pending_tool_executions}
+                while remaining_tasks:
+                    _, remaining_tasks = await asyncio.wait(remaining_tasks, timeout=self.TOOL_PROGRESS_POLL_INTERVAL)
+                    for progress_msg in self._drain_tool_progress(thread_id, thread_run_id):
+                        yield progress_msg
 
                 for execution in pending_tool_executions:
                     tool_idx = execution.get("tool_index", -1)
@@ -610,7 +670,12 @@ class ResponseProcessor:
                 elif final_tool_calls_to_process and not config.execute_on_stream:
                     logger.info(f"Executing {len(final_tool_calls_to_process)} tools ({config.tool_execution_strategy}) after stream")
                     self.trace.event(name="executing_tools_after_stream", level="DEFAULT", status_message=(f"Executing {len(final_tool_calls_to_process)} tools ({config.tool_execution_strategy}) after stream"))
-                    results_list = await self._execute_tools(final_tool_calls_to_process, config.tool_execution_strategy)
+                    execution_task = asyncio.create_task(self._execute_tools(final_tool_calls_to_process, config.tool_execution_strategy))
+                    while not execution_task.done():
+                        await asyncio.wait({execution_task}, timeout=self.TOOL_PROGRESS_POLL_INTERVAL)
+                        for progress_msg in self._drain_tool_progress(thread_id, thread_run_id):
+                            yield progress_msg
+                    results_list = execution_task.result()
                     current_tool_idx = 0
                     for tc, res in results_list:
                        # Map back using all_tool_data_map which has correct indices
@@ -811,6 +876,8 @@ class ResponseProcessor:
             raise # Use bare 'raise' to preserve the original exception with its traceback
 
         finally:
+            # Progress of tools that are no longer awaited must not leak into the next run
+            self._clear_tool_progress()
             # Save and Yield the final thread_run_end status
             try:
                 end_content = {"status_type": "thread_run_end"}
@@ -845,6 +912,7 @@ class ResponseProcessor:
         """
         content = ""
         thread_run_id = str(uuid.uuid4())
+        self._clear_tool_progress()
         all_tool_data = [] # Stores {'tool_call': ..., 'parsing_details': ...}
         tool_index = 0
         assistant_message_object = None
@@ -927,7 +995,12 @@ class ResponseProcessor:
             if config.execute_tools and tool_calls_to_execute:
                 logger.info(f"Executing {len(tool_calls_to_execute)} tools with strategy: {config.tool_execution_strategy}")
                 self.trace.event(name="executing_tools_with_strategy", level="DEFAULT", status_message=(f"Executing {len(tool_calls_to_execute)} tools with strategy: {config.tool_execution_strategy}"))
-                tool_results = await self._execute_tools(tool_calls_to_execute, config.tool_execution_strategy)
+                execution_task = asyncio.create_task(self._execute_tools(tool_calls_to_execute, config.tool_execution_strategy))
+                while not execution_task.done():
+                    await asyncio.wait({execution_task}, timeout=self.TOOL_PROGRESS_POLL_INTERVAL)
+                    for progress_msg in self._drain_tool_progress(thread_id, thread_run_id):
+                        yield progress_msg
+                tool_results = execution_task.result()
 
                 for i, (returned_tool_call, result) in enumerate(tool_results):
                     original_data = all_tool_data[i]
@@ -1010,6 +1083,8 @@ class ResponseProcessor:
              raise # Use bare 'raise' to preserve the original exception with its traceback
 
         finally:
+            # Progress of tools that are no longer awaited must not leak into the next run
+            self._clear_tool_progress()
              # Save and Yield the final thread_run_end status
             end_content = {"status_type": "thread_run_end"}
             end_msg_obj = await self.add_message(
@@ -1343,9 +1418,10 @@ class ResponseProcessor:
         return parsed_data
 
     # Tool execution methods
-    async def _execute_tool(self, tool_call: Dict[str, Any]) -> ToolResult:
+    async def _execute_tool(self, tool_call: Dict[str, Any], tool_index: Optional[int] = None) -> ToolResult:
         """Execute a single tool call and return the result."""
         span = self.trace.span(name=f"execute_tool.{tool_call['function_name']}", input=tool_call["arguments"])            
+        progress_token = _current_tool_call.set((tool_call, tool_index))
         try:
             function_name = tool_call["function_name"]
             arguments = tool_call["arguments"]
@@ -1378,6 +1454,8 @@ class ResponseProcessor:
             logger.error(f"Error executing tool {tool_call['function_name']}: {str(e)}", exc_info=True)
             span.end(status_message="tool_execution_error", output=f"Error executing tool: {str(e)}", level="ERROR")
             return ToolResult(success=False, output=f"Error executing tool: {str(e)}")
+        finally:
+            _current_tool_call.reset(progress_token)
 
     async def _execute_tools(
         self, 
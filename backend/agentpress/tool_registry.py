@@ -1,4 +1,4 @@
-from typing import Dict, Type, Any, List, Optional, Callable
+from typing import Dict, Type, Any, List, Optional, Callable, Iterable, Set
 from agentpress.tool import Tool, SchemaType
 from utils.logger import logger
 
@@ -12,6 +12,8 @@ class ToolRegistry:
     Attributes:
         tools (Dict[str, Dict[str, Any]]): OpenAPI-style tools and schemas
         xml_tools (Dict[str, Dict[str, Any]]): XML-style tools and schemas
+        deferred_tools (Set[str]): Functions that stay callable but whose schemas
+            are withheld from the LLM until they are exposed
         
     Methods:
         register_tool: Register a tool with optional function filtering
@@ -19,12 +21,15 @@ class ToolRegistry:
         get_xml_tool: Get a tool by XML tag name
         get_openapi_schemas: Get OpenAPI schemas for function calling
         get_xml_examples: Get examples of XML tool usage
+        defer_tools: Withhold the schemas of registered functions
+        expose_tools: Include deferred schemas again
     """
     
     def __init__(self):
         """Initialize a new ToolRegistry instance."""
         self.tools = {}
         self.xml_tools = {}
+        self.deferred_tools: Set[str] = set()
         logger.debug("Initialized new ToolRegistry instance")
     
     def register_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, **kwargs):
@@ -131,8 +136,9 @@ class ToolRegistry:
         """
         schemas = [
             tool_info['schema'].schema 
-            for tool_info in self.tools.values()
+            for tool_name, tool_info in self.tools.items()
             if tool_info['schema'].schema_type == SchemaType.OPENAPI
+            and tool_name not in self.deferred_tools
         ]
         logger.debug(f"Retrieved {len(schemas)} OpenAPI schemas")
         return schemas
@@ -146,7 +152,35 @@ class ToolRegistry:
         examples = {}
         for tool_info in self.xml_tools.values():
             schema = tool_info['schema']
+            if tool_info['method'] in self.deferred_tools:
+                continue
             if schema.xml_schema and schema.xml_schema.example:
                 examples[schema.xml_schema.tag_name] = schema.xml_schema.example
         logger.debug(f"Retrieved {len(examples)} XML examples")
         return examples
+
+    def defer_tools(self, function_names: Iterable[str]):
+        """Withhold the schemas of registered functions from the LLM.
+
+        Deferred functions are left out of get_openapi_schemas and get_xml_examples
+        but remain in get_available_functions, so calls to them still execute.
+
+        Args:
+            function_names: Names of registered functions to defer
+        """
+        self.deferred_tools.update(function_names)
+        logger.debug(f"Deferred schemas of {len(self.deferred_tools)} functions")
+
+    def expose_tools(self, function_names: Iterable[str]) -> List[str]:
+        """Include the schemas of deferred functions again.
+
+        Args:
+            function_names: Names of functions to expose
+
+        Returns:
+            Names that were deferred and are now exposed
+        """
+        exposed = [name for name in function_names if name in self.deferred_tools]
+        self.deferred_tools.difference_update(exposed)
+        logger.debug(f"Exposed schemas of {len(exposed)} deferred functions")
+        return exposed
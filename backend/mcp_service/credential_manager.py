@@ -1,4 +1,3 @@
-import os
 import json
 import hashlib
 import base64
@@ -6,11 +5,11 @@ from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timezone
 
-from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 from utils.logger import logger
+from utils.encryption import get_encryption_key, get_cipher, credential_cache, decrypt_profile_config
 from services.supabase import DBConnection
 
 db = DBConnection()
@@ -59,27 +58,9 @@ class CredentialManager:
     """Manages secure storage and retrieval of MCP credentials"""
     
     def __init__(self):
-        self.encryption_key = self._get_or_create_encryption_key()
-        self.cipher = Fernet(self.encryption_key)
-    
-    def _get_or_create_encryption_key(self) -> bytes:
-        """Get or create encryption key for credentials"""
-        key_env = os.getenv("MCP_CREDENTIAL_ENCRYPTION_KEY")
-        
-        try:
-            if isinstance(key_env, str):
-                return key_env.encode('utf-8')
-            else:
-                return key_env
-                
-        except Exception as e:
-            logger.error(f"Invalid encryption key: {e}")
-            # Generate a new key as fallback
-            logger.warning("Generating new encryption key for this session")
-            key = Fernet.generate_key()
-            logger.info(f"Generated new encryption key. Set this in your environment:")
-            logger.info(f"MCP_CREDENTIAL_ENCRYPTION_KEY={key.decode()}")
-            return key
+        # Shared with utils.encryption so the key is resolved and Fernet is built once per process
+        self.encryption_key = get_encryption_key()
+        self.cipher = get_cipher()
     
     def _encrypt_config(self, config: Dict[str, Any]) -> Tuple[bytes, str]:
         """Encrypt configuration and return encrypted data + hash"""
@@ -94,8 +75,8 @@ class CredentialManager:
         
         return encrypted_config, config_hash
     
-    def _decrypt_config(self, encrypted_config: bytes, expected_hash: str) -> Dict[str, Any]:
-        """Decrypt configuration and verify integrity"""
+    def _decrypt_config_json(self, encrypted_config: bytes, expected_hash: str) -> str:
+        """Decrypt configuration to its JSON string and verify integrity"""
         try:
             decrypted_bytes = self.cipher.decrypt(encrypted_config)
             
@@ -104,13 +85,27 @@ class CredentialManager:
             if actual_hash != expected_hash:
                 raise ValueError("Credential integrity check failed")
             
-            config_json = decrypted_bytes.decode('utf-8')
-            return json.loads(config_json)
+            return decrypted_bytes.decode('utf-8')
             
         except Exception as e:
             logger.error(f"Failed to decrypt credential: {e}")
             raise ValueError("Failed to decrypt credential")
     
+    def _decrypt_config(self, encrypted_config: bytes, expected_hash: str) -> Dict[str, Any]:
+        """Decrypt configuration and verify integrity"""
+        return json.loads(self._decrypt_config_json(encrypted_config, expected_hash))
+    
+    def _decrypt_profile_row(self, profile_data: Dict[str, Any]) -> str:
+        """Decrypt a credential profile row's config, stored base64 encoded (or as raw bytes)"""
+        encrypted_config = profile_data['encrypted_config']
+        if isinstance(encrypted_config, str):
+            encrypted_config = base64.b64decode(encrypted_config.encode('utf-8'))
+        return self._decrypt_config_json(encrypted_config, profile_data['config_hash'])
+    
+    def _decrypt_profile_config(self, profile_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Decrypt a credential profile row, reusing the cached plaintext while the row is unchanged"""
+        return json.loads(decrypt_profile_config(profile_data, self._decrypt_profile_row))
+    
     async def store_credential(
         self, 
         account_id: str, 
@@ -418,6 +413,7 @@ class CredentialManager:
                 raise ValueError("Failed to store credential profile")
             
             profile_id = result.data[0]['profile_id']
+            credential_cache.invalidate(profile_id)
             logger.info(f"Successfully stored credential profile {profile_id} for {mcp_qualified_name}")
             
             return profile_id
@@ -455,17 +451,7 @@ class CredentialManager:
             profiles = []
             for profile_data in result.data:
                 try:
-                    # Decrypt the configuration
-                    encrypted_config = profile_data['encrypted_config']
-                    if isinstance(encrypted_config, str):
-                        encrypted_config_bytes = base64.b64decode(encrypted_config.encode('utf-8'))
-                    else:
-                        encrypted_config_bytes = encrypted_config
-                    
-                    config = self._decrypt_config(
-                        encrypted_config_bytes, 
-                        profile_data['config_hash']
-                    )
+                    config = self._decrypt_profile_config(profile_data)
                     
                     profiles.append(MCPCredentialProfile(
                         profile_id=profile_data['profile_id'],
@@ -519,17 +505,7 @@ class CredentialManager:
             
             profile_data = result.data[0]
             
-            # Decrypt the configuration
-            encrypted_config = profile_data['encrypted_config']
-            if isinstance(encrypted_config, str):
-                encrypted_config_bytes = base64.b64decode(encrypted_config.encode('utf-8'))
-            else:
-                encrypted_config_bytes = encrypted_config
-            
-            config = self._decrypt_config(
-                encrypted_config_bytes, 
-                profile_data['config_hash']
-            )
+            config = self._decrypt_profile_config(profile_data)
             
             # Update last used timestamp
             await client.table('user_mcp_credential_profiles')\
@@ -644,6 +620,7 @@ class CredentialManager:
                 .eq('profile_id', profile_id)\
                 .eq('account_id', account_id)\
                 .execute()
+            credential_cache.invalidate(profile_id)
             
             return len(result.data) > 0
             
@@ -667,16 +644,7 @@ class CredentialManager:
             profiles = []
             for profile_data in result.data:
                 try:
-                    encrypted_config = profile_data['encrypted_config']
-                    if isinstance(encrypted_config, str):
-                        encrypted_config_bytes = base64.b64decode(encrypted_config.encode('utf-8'))
-                    else:
-                        encrypted_config_bytes = encrypted_config
-                    
-                    config = self._decrypt_config(
-                        encrypted_config_bytes, 
-                        profile_data['config_hash']
-                    )
+                    config = self._decrypt_profile_config(profile_data)
                     
                     profiles.append(MCPCredentialProfile(
                         profile_id=profile_data['profile_id'],
@@ -701,5 +669,19 @@ class CredentialManager:
             logger.error(f"Error retrieving all user credential profiles: {str(e)}")
             return []
 
+    async def mark_profiles_used(self, account_id: str, profile_ids: List[str]) -> None:
+        """Update the last used timestamp of several profiles in one request"""
+        if not profile_ids:
+            return
+        try:
+            client = await db.client
+            await client.table('user_mcp_credential_profiles')\
+                .update({'last_used_at': datetime.now(timezone.utc).isoformat()})\
+                .eq('account_id', account_id)\
+                .in_('profile_id', list(profile_ids))\
+                .execute()
+        except Exception as e:
+            logger.warning(f"Failed to update last used timestamp of credential profiles: {str(e)}")
+
 
 credential_manager = CredentialManager() 
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""
+Cached access to the Smithery registry.
+
+Registry responses are cached in Redis per query. Within the TTL they are served
+directly. For STALE_TTL after that they are still served while a background refresh
+runs, and only older entries make the caller wait for the registry. Identical
+lookups in flight in the same process share one upstream request, and all requests
+go through one pooled HTTP client.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+import httpx
+
+from services import redis
+from utils.logger import logger
+
+SMITHERY_API_BASE_URL = "https://registry.smithery.ai"
+SMITHERY_API_KEY = os.getenv("SMITHERY_API_KEY")
+
+# Freshness of cached registry responses, in seconds
+LIST_TTL = 10 * 60
+SEARCH_TTL = 5 * 60
+DETAIL_TTL = 30 * 60
+# How long past its TTL an entry is still served while it is refreshed
+STALE_TTL = 60 * 60
+REGISTRY_CACHE_KEY = "smithery_registry:{path}"
+# Details of this many of the most used servers are fetched in the background when
+# the first page of the server list is refreshed (0 disables pre-warming)
+PREWARM_DETAIL_COUNT = int(os.getenv("SMITHERY_PREWARM_DETAIL_COUNT", "10"))
+PREWARM_CONCURRENCY = 4
+
+_http_client: Optional[httpx.AsyncClient] = None
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        headers = {
+            "Accept": "application/json",
+            "User-Agent": "Suna-MCP-Integration/1.0"
+        }
+        if SMITHERY_API_KEY:
+            headers["Authorization"] = f"Bearer {SMITHERY_API_KEY}"
+        _http_client = httpx.AsyncClient(
+            headers=headers,
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+        )
+    return _http_client
+
+
+def _cache_key(path: str, params: Optional[Dict[str, Any]]) -> str:
+    query = "&".join(f"{key}={params[key]}" for key in sorted(params)) if params else ""
+    return REGISTRY_CACHE_KEY.format(path=f"{path}?{query}" if query else path)
+
+
+async def _fetch(cache_key: str, path: str, params: Optional[Dict[str, Any]], ttl: int) -> Any:
+    response = await _get_http_client().get(f"{SMITHERY_API_BASE_URL}{path}", params=params)
+    if response.status_code == 401:
+        logger.warning("Smithery API authentication failed. API key may be required.")
+    response.raise_for_status()
+    data = response.json()
+    try:
+        await redis.set(
+            cache_key,
+            json.dumps({"data": data, "fetched_at": time.time()}),
+            ex=ttl + STALE_TTL
+        )
+    except Exception as e:
+        logger.warning(f"Failed to cache Smithery registry response for {path}: {str(e)}")
+    return data
+
+
+def _fetch_once(cache_key: str, path: str, params: Optional[Dict[str, Any]], ttl: int) -> asyncio.Task:
+    """Start an upstream fetch unless an identical one is already running."""
+    task = _inflight.get(cache_key)
+    if task is None:
+        task = asyncio.create_task(_fetch(cache_key, path, params, ttl))
+        _inflight[cache_key] = task
+        task.add_done_callback(lambda _: _inflight.pop(cache_key, None))
+    return task
+
+
+def _log_refresh_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        logger.warning(f"Background refresh of Smithery registry entry failed: {task.exception()}")
+
+
+async def _cached_get(path: str, params: Optional[Dict[str, Any]], ttl: int) -> Any:
+    cache_key = _cache_key(path, params)
+    try:
+        cached = await redis.get(cache_key)
+    except Exception as e:
+        logger.warning(f"Failed to read cached Smithery registry response for {path}: {str(e)}")
+        cached = None
+
+    if cached:
+        entry = json.loads(cached)
+        age = time.time() - entry["fetched_at"]
+        if age < ttl:
+            return entry["data"]
+        if age < ttl + STALE_TTL:
+            _fetch_once(cache_key, path, params, ttl).add_done_callback(_log_refresh_failure)
+            return entry["data"]
+
+    return await asyncio.shield(_fetch_once(cache_key, path, params, ttl))
+
+
+async def list_servers(q: Optional[str] = None, page: int = 1, page_size: int = 20) -> Dict[str, Any]:
+    """Search or list registry servers (the registry's /servers endpoint)."""
+    # Normalized so equivalent searches share one cache entry and one in-flight fetch
+    q = (q or '').strip().lower() or None
+    params: Dict[str, Any] = {"page": page, "pageSize": page_size}
+    if q:
+        params["q"] = q
+    data = await _cached_get("/servers", params, SEARCH_TTL if q else LIST_TTL)
+    if not q and page == 1 and PREWARM_DETAIL_COUNT > 0:
+        _schedule_prewarm(data.get("servers", []))
+    return data
+
+
+async def get_server_details(qualified_name: str) -> Dict[str, Any]:
+    """Metadata, connections and tools of one registry server."""
+    # URL encode the qualified name only if it contains special characters
+    if '@' in qualified_name or '/' in qualified_name:
+        encoded_name = quote(qualified_name, safe='')
+    else:
+        # Don't encode simple names like "exa"
+        encoded_name = qualified_name
+    return await _cached_get(f"/servers/{encoded_name}", None, DETAIL_TTL)
+
+
+_prewarm_task: Optional[asyncio.Task] = None
+_prewarmed_at: float = 0
+
+
+def _schedule_prewarm(servers: List[Dict[str, Any]]):
+    """Fetch details of the most used servers in the background, at most once per LIST_TTL."""
+    global _prewarm_task, _prewarmed_at
+    if (_prewarm_task and not _prewarm_task.done()) or time.time() - _prewarmed_at < LIST_TTL:
+        return
+    _prewarmed_at = time.time()
+    popular = sorted(servers, key=lambda server: server.get("useCount", 0), reverse=True)[:PREWARM_DETAIL_COUNT]
+    _prewarm_task = asyncio.create_task(_prewarm([server["qualifiedName"] for server in popular if server.get("qualifiedName")]))
+
+
+async def _prewarm(qualified_names: List[str]):
+    semaphore = asyncio.Semaphore(PREWARM_CONCURRENCY)
+
+    async def warm(qualified_name: str):
+        async with semaphore:
+            try:
+                await get_server_details(qualified_name)
+            except Exception as e:
+                logger.debug(f"Failed to pre-warm Smithery server details for {qualified_name}: {str(e)}")
+
+    await asyncio.gather(*(warm(name) for name in qualified_names))
+    logger.debug(f"Pre-warmed Smithery server details for {len(qualified_names)} servers")
@@ -8,7 +8,7 @@ This module provides API endpoints for template management:
 4. Browsing marketplace and user templates
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 
@@ -64,6 +64,7 @@ class InstallationResponse(BaseModel):
     missing_regular_credentials: Optional[List[Dict[str, Any]]] = None
     missing_custom_configs: Optional[List[Dict[str, Any]]] = None
     template: Optional[Dict[str, Any]] = None
+    timings: Optional[Dict[str, float]] = None  # Milliseconds spent per installation step
 
 # =====================================================
 # TEMPLATE MANAGEMENT ENDPOINTS
@@ -172,13 +173,19 @@ async def install_template(
 
 @router.get("/marketplace", response_model=List[TemplateResponse])
 async def get_marketplace_templates(
+    response: Response,
     limit: int = 50,
     offset: int = 0,
     search: Optional[str] = None,
     tags: Optional[str] = None,  # Comma-separated tags
+    cursor: Optional[str] = None,  # X-Next-Cursor of the previous page, replaces offset
     user_id: str = Depends(get_current_user_id_from_jwt)
 ):
-    """Get public templates from the marketplace"""
+    """Get public templates from the marketplace
+    
+    The total number of matches and the cursor of the next page are returned in the
+    X-Total-Count and X-Next-Cursor headers.
+    """
     logger.info(f"Getting marketplace templates for user {user_id}")
     
     try:
@@ -186,15 +193,20 @@ async def get_marketplace_templates(
         if tags:
             tag_list = [tag.strip() for tag in tags.split(',') if tag.strip()]
         
-        templates = await template_manager.get_marketplace_templates(
+        listing = await template_manager.get_marketplace_templates(
             limit=limit,
             offset=offset,
             search=search,
-            tags=tag_list
+            tags=tag_list,
+            cursor=cursor
         )
-        print("templates", templates)
-        return [TemplateResponse(**template) for template in templates]
+        response.headers["X-Total-Count"] = str(listing['total_count'])
+        if listing['next_cursor']:
+            response.headers["X-Next-Cursor"] = listing['next_cursor']
+        return [TemplateResponse(**template) for template in listing['templates']]
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting marketplace templates: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get marketplace templates: {str(e)}")
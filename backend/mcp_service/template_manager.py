@@ -8,18 +8,60 @@ This module handles:
 4. Converting between legacy agents and new secure architecture
 """
 
+import base64
+import hashlib
 import json
+import time
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 from datetime import datetime, timezone
 
 from utils.logger import logger
+from services import redis
 from services.supabase import DBConnection
 
 from .credential_manager import credential_manager, MCPRequirement, MCPCredential
 
 db = DBConnection()
 
+# Marketplace listing responses are cached per normalized query. Publishing or
+# unpublishing a template bumps the generation, which retires every cached page.
+MARKETPLACE_CACHE_TTL = 300
+MARKETPLACE_CACHE_KEY = "marketplace_templates:{generation}:{query}"
+MARKETPLACE_GENERATION_KEY = "marketplace_templates:generation"
+
+
+def _encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque keyset cursor pointing after the given listing row"""
+    position = [row['is_kortix_team'], row['sort_published_at'], row['template_id']]
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('utf-8')
+
+
+def _decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        is_kortix_team, published_at, template_id = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return {
+        'p_cursor_is_kortix_team': bool(is_kortix_team),
+        'p_cursor_published_at': published_at,
+        'p_cursor_template_id': template_id
+    }
+
+
+async def invalidate_marketplace_listings():
+    """Refresh the listing view and retire cached marketplace pages"""
+    try:
+        client = await db.client
+        await client.rpc('refresh_marketplace_template_listings', {}).execute()
+    except Exception as e:
+        logger.error(f"Failed to refresh marketplace template listings: {str(e)}")
+    try:
+        redis_client = await redis.get_client()
+        await redis_client.incr(MARKETPLACE_GENERATION_KEY)
+    except Exception as e:
+        logger.warning(f"Failed to invalidate cached marketplace listings: {str(e)}")
+
 
 @dataclass
 class AgentTemplate:
@@ -160,6 +202,8 @@ class TemplateManager:
             
             template_id = result.data[0]['template_id']
             logger.info(f"Successfully created template {template_id} from agent {agent_id} with is_kortix_team={is_kortix_team}")
+            if make_public:
+                await invalidate_marketplace_listings()
             
             return template_id
             
@@ -239,6 +283,16 @@ class TemplateManager:
         """
         logger.info(f"Installing template {template_id} for user {account_id}")
         
+        started = time.perf_counter()
+        step_started = started
+        timings: Dict[str, float] = {}
+        
+        def finish_step(step: str):
+            nonlocal step_started
+            now = time.perf_counter()
+            timings[f"{step}_ms"] = round((now - step_started) * 1000, 1)
+            step_started = now
+        
         try:
             # Get the template
             template = await self.get_template(template_id)
@@ -250,6 +304,7 @@ class TemplateManager:
                 # Check if user owns the template
                 if template.creator_id != account_id:
                     raise ValueError("Access denied to private template")
+            finish_step('load_template')
             
             # Debug: Log template requirements
             logger.info(f"Template MCP requirements: {[(req.qualified_name, req.display_name, getattr(req, 'custom_type', None)) for req in template.mcp_requirements]}")
@@ -258,14 +313,21 @@ class TemplateManager:
             custom_requirements = [req for req in template.mcp_requirements if getattr(req, 'custom_type', None)]
             regular_requirements = [req for req in template.mcp_requirements if not getattr(req, 'custom_type', None)]
             
+            # All of the account's active profiles come back in one query, ordered so the
+            # default (or else the oldest) profile of each MCP server comes first
+            profiles_by_id = {}
+            default_profiles = {}
+            if regular_requirements:
+                for profile in await credential_manager.get_all_user_credential_profiles(account_id):
+                    profiles_by_id[profile.profile_id] = profile
+                    default_profiles.setdefault(profile.mcp_qualified_name, profile)
+            finish_step('load_profiles')
+            
             # If no profile mappings provided, try to use default profiles
             if not profile_mappings and regular_requirements:
                 profile_mappings = {}
                 for req in regular_requirements:
-                    # Get default profile for this MCP service
-                    default_profile = await credential_manager.get_default_credential_profile(
-                        account_id, req.qualified_name
-                    )
+                    default_profile = default_profiles.get(req.qualified_name)
                     if default_profile:
                         profile_mappings[req.qualified_name] = default_profile.profile_id
             
@@ -296,6 +358,8 @@ class TemplateManager:
             
             # If we have any missing profile mappings or configs, return them
             if missing_profile_mappings or missing_custom_configs:
+                finish_step('resolve_requirements')
+                timings['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
                 return {
                     'status': 'configs_required',
                     'missing_regular_credentials': missing_profile_mappings,
@@ -304,15 +368,14 @@ class TemplateManager:
                         'template_id': template.template_id,
                         'name': template.name,
                         'description': template.description
-                    }
+                    },
+                    'timings': timings
                 }
             
-            # Create regular agent with secure credentials
-            client = await db.client
-            
             # Build configured_mcps and custom_mcps with user's credential profiles
             configured_mcps = []
             custom_mcps = []
+            used_profile_ids = []
             
             for req in template.mcp_requirements:
                 logger.info(f"Processing requirement: {req.qualified_name}, custom_type: {getattr(req, 'custom_type', None)}")
@@ -343,20 +406,13 @@ class TemplateManager:
                             logger.error(f"Empty profile_id provided for {req.qualified_name}")
                             raise ValueError(f"Invalid credential profile selected for {req.display_name}")
                         
-                        # Get the credential profile
-                        profile = await credential_manager.get_credential_by_profile(
-                            account_id, profile_id
-                        )
+                        # Only active profiles are loaded, so inactive ones are reported as not found
+                        profile = profiles_by_id.get(profile_id)
                         
                         if not profile:
                             logger.error(f"Credential profile {profile_id} not found for {req.qualified_name}")
                             raise ValueError(f"Credential profile not found for {req.display_name}. Please select a valid profile or create a new one.")
                         
-                        # Validate profile is active
-                        if not profile.is_active:
-                            logger.error(f"Credential profile {profile_id} is inactive for {req.qualified_name}")
-                            raise ValueError(f"Selected credential profile for {req.display_name} is inactive. Please select an active profile.")
-                        
                         mcp_config = {
                             'name': req.display_name,
                             'qualifiedName': req.qualified_name,
@@ -365,13 +421,12 @@ class TemplateManager:
                             'selectedProfileId': profile_id
                         }
                         configured_mcps.append(mcp_config)
-                        logger.info(f"Added regular MCP with profile: {mcp_config}")
+                        used_profile_ids.append(profile_id)
+                        logger.info(f"Added regular MCP with profile {profile_id} for {req.qualified_name}")
                     else:
                         logger.error(f"No profile mapping provided for {req.qualified_name}")
                         raise ValueError(f"Missing credential profile for {req.display_name}. Please select a credential profile.")
-            
-            logger.info(f"Final configured_mcps: {configured_mcps}")
-            logger.info(f"Final custom_mcps: {custom_mcps}")
+            finish_step('resolve_requirements')
             
             agent_data = {
                 'account_id': account_id,
@@ -386,50 +441,38 @@ class TemplateManager:
                 'avatar_color': template.avatar_color
             }
             
-            result = await client.table('agents').insert(agent_data).execute()
+            # The agent, its initial version and the download count are written in one transaction
+            client = await db.client
+            result = await client.rpc('install_template_agent', {
+                'p_template_id': template_id,
+                'p_account_id': account_id,
+                'p_name': agent_data['name'],
+                'p_description': agent_data['description'],
+                'p_system_prompt': agent_data['system_prompt'],
+                'p_configured_mcps': agent_data['configured_mcps'],
+                'p_custom_mcps': agent_data['custom_mcps'],
+                'p_agentpress_tools': agent_data['agentpress_tools'],
+                'p_avatar': agent_data['avatar'],
+                'p_avatar_color': agent_data['avatar_color']
+            }).execute()
             
             if not result.data:
                 raise ValueError("Failed to create agent")
             
-            instance_id = result.data[0]['agent_id']
-
-            try:
-                initial_version_data = {
-                    "agent_id": instance_id,
-                    "version_number": 1,
-                    "version_name": "v1",
-                    "system_prompt": agent_data['system_prompt'],
-                    "configured_mcps": agent_data['configured_mcps'],
-                    "custom_mcps": agent_data['custom_mcps'],
-                    "agentpress_tools": agent_data['agentpress_tools'],
-                    "is_active": True,
-                    "created_by": account_id
-                }
-                
-                version_result = await client.table('agent_versions').insert(initial_version_data).execute()
-                
-                if version_result.data:
-                    version_id = version_result.data[0]['version_id']
-                    await client.table('agents').update({
-                        'current_version_id': version_id,
-                        'version_count': 1
-                    }).eq('agent_id', instance_id).execute()
-                    logger.info(f"Created initial version v1 for installed agent {instance_id}")
-                else:
-                    logger.warning(f"Failed to create initial version for agent {instance_id}")
-                    
-            except Exception as e:
-                logger.warning(f"Failed to create initial version for agent {instance_id}: {e}")
-            await client.table('agent_templates')\
-                .update({'download_count': template.download_count + 1})\
-                .eq('template_id', template_id).execute()
+            instance_id = result.data['agent_id']
+            finish_step('create_agent')
             
-            logger.info(f"Successfully installed template {template_id} as instance {instance_id}")
+            await credential_manager.mark_profiles_used(account_id, used_profile_ids)
+            finish_step('mark_profiles_used')
+            timings['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            
+            logger.info(f"Successfully installed template {template_id} as instance {instance_id} with initial version {result.data['version_id']} (timings: {timings})")
             
             return {
                 'status': 'installed',
                 'instance_id': instance_id,
-                'name': agent_data['name']
+                'name': agent_data['name'],
+                'timings': timings
             }
             
         except Exception as e:
@@ -611,6 +654,7 @@ class TemplateManager:
                 .execute()
             
             logger.info(f"Published template {template_id} with is_kortix_team={is_kortix_team}")
+            await invalidate_marketplace_listings()
             return len(result.data) > 0
             
         except Exception as e:
@@ -638,6 +682,7 @@ class TemplateManager:
                 .eq('template_id', template_id)\
                 .execute()
             
+            await invalidate_marketplace_listings()
             return len(result.data) > 0
             
         except Exception as e:
@@ -649,41 +694,56 @@ class TemplateManager:
         limit: int = 50, 
         offset: int = 0,
         search: Optional[str] = None,
-        tags: Optional[List[str]] = None
-    ) -> List[Dict[str, Any]]:
-        """Get public templates from marketplace"""
+        tags: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get public templates from marketplace
+        
+        Pages are served from the marketplace listing view, with keyset pagination when
+        `cursor` (the `next_cursor` of the previous page) is given and `offset` otherwise.
+        
+        Returns:
+            Dict with `templates`, `total_count` and `next_cursor` (None on the last page)
+        """
+        search = (search or '').strip().lower() or None
+        tags = sorted({tag.strip() for tag in tags or [] if tag.strip()}) or None
+        params = {
+            'p_search': search,
+            'p_tags': tags,
+            'p_limit': limit,
+            'p_offset': 0 if cursor else offset
+        }
+        if cursor:
+            params.update(_decode_cursor(cursor))
+        
+        query_hash = hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+        cache_key = None
+        try:
+            generation = await redis.get(MARKETPLACE_GENERATION_KEY, '0')
+            cache_key = MARKETPLACE_CACHE_KEY.format(generation=generation, query=query_hash)
+            cached = await redis.get(cache_key)
+            if cached:
+                return json.loads(cached)
+        except Exception as e:
+            logger.warning(f"Failed to read cached marketplace listing: {str(e)}")
+        
         try:
             client = await db.client
-            
-            query = client.table('agent_templates')\
-                .select('*')\
-                .eq('is_public', True)\
-                .order('is_kortix_team', desc=True)\
-                .order('marketplace_published_at', desc=True)\
-                .range(offset, offset + limit - 1)
-            
-            if search:
-                query = query.or_(f'name.ilike.%{search}%,description.ilike.%{search}%')
-            
-            if tags:
-                query = query.overlaps('tags', tags)
-            
-            result = await query.execute()
+            result = await client.rpc('get_marketplace_template_listings', params).execute()
+            rows = result.data['templates']
             
             templates = []
-            for template_data in result.data:
-                # Use the database field for is_kortix_team
-                is_kortix_team = template_data.get('is_kortix_team', False)
-                
+            for template_data in rows:
+                is_kortix_team = template_data['is_kortix_team']
                 templates.append({
                     'template_id': template_data['template_id'],
                     'name': template_data['name'],
                     'description': template_data.get('description'),
-                    'mcp_requirements': template_data.get('mcp_requirements', []),
-                    'agentpress_tools': template_data.get('agentpress_tools', {}),
-                    'tags': template_data.get('tags', []),
-                    'is_public': template_data.get('is_public', True),
-                    'download_count': template_data.get('download_count', 0),
+                    'mcp_requirements': template_data.get('mcp_requirements') or [],
+                    'agentpress_tools': template_data.get('agentpress_tools') or {},
+                    'tags': template_data.get('tags') or [],
+                    'is_public': True,
+                    'download_count': template_data.get('download_count') or 0,
                     'marketplace_published_at': template_data.get('marketplace_published_at'),
                     'created_at': template_data['created_at'],
                     'creator_name': 'Kortix Team' if is_kortix_team else 'Community',
@@ -692,12 +752,23 @@ class TemplateManager:
                     'is_kortix_team': is_kortix_team
                 })
             
-            # Templates are already sorted by database query (Kortix team first, then by date)
-            return templates
+            # Rows are already sorted by the listing view (Kortix team first, then by date)
+            listing = {
+                'templates': templates,
+                'total_count': result.data['total_count'],
+                'next_cursor': _encode_cursor(rows[-1]) if len(rows) == limit else None
+            }
             
         except Exception as e:
             logger.error(f"Error getting marketplace templates: {str(e)}")
-            return []
+            return {'templates': [], 'total_count': 0, 'next_cursor': None}
+        
+        if cache_key:
+            try:
+                await redis.set(cache_key, json.dumps(listing), ex=MARKETPLACE_CACHE_TTL)
+            except Exception as e:
+                logger.warning(f"Failed to cache marketplace listing: {str(e)}")
+        return listing
 
     async def get_user_templates(
         self, 
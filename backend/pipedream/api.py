@@ -7,11 +7,14 @@ import time
 from utils.logger import logger
 from utils.auth_utils import get_current_user_id_from_jwt
 from .client import get_pipedream_client
+from .catalog import get_app_catalog
 from .profiles import (
     get_profile_manager, 
     PipedreamProfile, 
     CreateProfileRequest, 
-    UpdateProfileRequest
+    UpdateProfileRequest,
+    cache_connected_apps,
+    invalidate_connected_apps
 )
 
 router = APIRouter(prefix="/pipedream", tags=["pipedream"])
@@ -93,6 +96,7 @@ async def create_connection_token(
     try:
         client = get_pipedream_client()
         result = await client.create_connection_token(user_id, request.app)
+        await invalidate_connected_apps(user_id)
         
         logger.info(f"Successfully created connection token for user: {user_id}")
         return ConnectionTokenResponse(
@@ -119,6 +123,7 @@ async def get_user_connections(
     try:
         client = get_pipedream_client()
         connections = await client.get_connections(user_id)
+        await cache_connected_apps(user_id, connections)
         
         logger.info(f"Successfully retrieved {len(connections)} connections for user: {user_id}")
         return ConnectionResponse(
@@ -284,7 +289,8 @@ async def get_available_pipedream_tools(
                 
                 # Discover MCP servers with timeout
                 mcp_servers = await client.discover_mcp_servers(
-                    external_user_id=user_id
+                    external_user_id=user_id,
+                    refresh_tools=force_refresh
                 )
                 
                 apps_with_tools = []
@@ -361,31 +367,12 @@ async def get_pipedream_apps(
     logger.info(f"Fetching Pipedream apps registry, page: {page}, search: {q}")
     
     try:
-        import httpx
-        
-        async with httpx.AsyncClient() as client:
-            url = f"https://mcp.pipedream.com/api/apps"
-            params = {"page": page}
-            
-            if q:
-                params["q"] = q
-            if category:
-                params["category"] = category
-                
-            response = await client.get(url, params=params, timeout=30.0)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # print(data)
-
-            logger.info(f"Successfully fetched {len(data.get('data', []))} apps from Pipedream registry")
-            return {
-                "success": True,
-                "apps": data.get("data", []),
-                "page_info": data.get("page_info", {}),
-                "total_count": data.get("page_info", {}).get("total_count", 0)
-            }
+        result = await get_app_catalog().search(page=page, q=q, category=category)
+        logger.info(f"Returning {len(result['apps'])} of {result['total_count']} apps from the cached Pipedream registry")
+        return {
+            "success": True,
+            **result
+        }
             
     except Exception as e:
         logger.error(f"Failed to fetch Pipedream apps: {str(e)}")
@@ -0,0 +1,190 @@
+"""
+Local cache of the Pipedream app catalog.
+
+The catalog is crawled from the public MCP registry once and kept in memory, with a
+copy in Redis so other worker processes can start from it. Pages are revalidated with
+their ETags after CATALOG_TTL; stale data keeps being served while a refresh runs in
+the background. Listing, search and category filtering run against the local copy.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from services import redis
+from utils.logger import logger
+
+CATALOG_URL = "https://mcp.pipedream.com/api/apps"
+# Catalog age after which it is revalidated against the registry
+CATALOG_TTL = 6 * 60 * 60
+CATALOG_REDIS_KEY = "pipedream_app_catalog"
+# Redis copy outlives the TTL so a restarted worker can serve it while revalidating
+CATALOG_REDIS_EXPIRY = 7 * 24 * 60 * 60
+# Safety bound on the number of registry pages crawled in one refresh
+CATALOG_MAX_PAGES = 500
+# Page size used when the registry doesn't report one
+DEFAULT_PAGE_SIZE = 50
+
+
+class AppCatalog:
+    def __init__(self):
+        self.apps: List[Dict[str, Any]] = []
+        self.page_size = DEFAULT_PAGE_SIZE
+        self.fetched_at: float = 0
+        # Per registry page: (etag, apps on that page), used for conditional refreshes
+        self._pages: Dict[int, Dict[str, Any]] = {}
+        self._search_text: List[str] = []
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _is_fresh(self) -> bool:
+        return bool(self.apps) and time.time() - self.fetched_at < CATALOG_TTL
+
+    def _load(self, pages: Dict[int, Dict[str, Any]], page_size: int, fetched_at: float):
+        self._pages = pages
+        self.page_size = page_size
+        self.fetched_at = fetched_at
+        self.apps = [app for page in sorted(pages) for app in pages[page]["apps"]]
+        self._search_text = [
+            f"{app.get('name', '')} {app.get('name_slug', '')} {app.get('description') or ''}".lower()
+            for app in self.apps
+        ]
+
+    async def get_apps(self) -> List[Dict[str, Any]]:
+        """Return the catalog, refreshing it first only when there is nothing to serve yet."""
+        if self._is_fresh():
+            return self.apps
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        if not self.apps:
+            await asyncio.shield(self._refresh_task)
+        return self.apps
+
+    async def search(
+        self,
+        page: int = 1,
+        q: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Filter and paginate the cached catalog, in the same shape as the registry response."""
+        apps = await self.get_apps()
+        matches = range(len(apps))
+
+        if category:
+            category_lower = category.lower()
+            matches = [
+                i for i in matches
+                if any(c.lower() == category_lower for c in apps[i].get("categories") or [])
+            ]
+
+        if q:
+            query = q.lower().strip()
+
+            def rank(i: int) -> int:
+                name = (apps[i].get("name") or "").lower()
+                slug = (apps[i].get("name_slug") or "").lower()
+                if query in (name, slug):
+                    return 0
+                if name.startswith(query) or slug.startswith(query):
+                    return 1
+                if query in name or query in slug:
+                    return 2
+                return 3
+
+            # sorted() is stable, so the registry order is kept within each rank
+            matches = sorted((i for i in matches if query in self._search_text[i]), key=rank)
+
+        matches = list(matches)
+        start = (page - 1) * self.page_size
+        page_apps = [apps[i] for i in matches[start:start + self.page_size]]
+        return {
+            "apps": page_apps,
+            "page_info": {
+                "total_count": len(matches),
+                "current_page": page,
+                "page_size": self.page_size,
+                "count": len(page_apps),
+                "has_more": start + self.page_size < len(matches)
+            },
+            "total_count": len(matches)
+        }
+
+    async def _refresh(self):
+        try:
+            if await self._load_shared():
+                return
+        except Exception as e:
+            logger.warning(f"Failed to read cached Pipedream app catalog: {str(e)}")
+
+        try:
+            await self._crawl()
+        except Exception as e:
+            logger.error(f"Failed to refresh Pipedream app catalog: {str(e)}")
+            if not self.apps:
+                raise
+            return
+
+        try:
+            await redis.set(
+                CATALOG_REDIS_KEY,
+                json.dumps({"pages": self._pages, "page_size": self.page_size, "fetched_at": self.fetched_at}),
+                ex=CATALOG_REDIS_EXPIRY
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cache Pipedream app catalog: {str(e)}")
+
+    async def _load_shared(self) -> bool:
+        """Adopt the catalog another worker stored in Redis. Returns True if it is fresh."""
+        cached = await redis.get(CATALOG_REDIS_KEY)
+        if not cached:
+            return False
+        data = json.loads(cached)
+        if data["fetched_at"] > self.fetched_at:
+            self._load({int(page): value for page, value in data["pages"].items()}, data["page_size"], data["fetched_at"])
+        return self._is_fresh()
+
+    async def _crawl(self):
+        """Fetch every registry page, reusing pages the registry reports as unchanged."""
+        started = time.time()
+        pages: Dict[int, Dict[str, Any]] = {}
+        page_size = self.page_size
+        unchanged = 0
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            for page in range(1, CATALOG_MAX_PAGES + 1):
+                previous = self._pages.get(page)
+                headers = {"If-None-Match": previous["etag"]} if previous and previous.get("etag") else {}
+                response = await client.get(CATALOG_URL, params={"page": page}, headers=headers)
+                if response.status_code == 304:
+                    pages[page] = previous
+                    unchanged += 1
+                    has_more = previous.get("has_more", False)
+                else:
+                    response.raise_for_status()
+                    data = response.json()
+                    page_info = data.get("page_info", {})
+                    has_more = bool(page_info.get("has_more"))
+                    page_size = page_info.get("page_size") or page_size
+                    pages[page] = {
+                        "etag": response.headers.get("etag"),
+                        "apps": data.get("data", []),
+                        "has_more": has_more
+                    }
+                if not has_more or not pages[page]["apps"]:
+                    break
+
+        self._load(pages, page_size, time.time())
+        logger.info(
+            f"Refreshed Pipedream app catalog: {len(self.apps)} apps in {len(pages)} pages "
+            f"({unchanged} unchanged) in {time.time() - started:.1f}s"
+        )
+
+
+_app_catalog: Optional[AppCatalog] = None
+
+def get_app_catalog() -> AppCatalog:
+    global _app_catalog
+    if _app_catalog is None:
+        _app_catalog = AppCatalog()
+    return _app_catalog
@@ -1,9 +1,12 @@
 import os
 import asyncio
-from typing import Dict, Any, Optional, List
+import json
+import uuid
+from typing import Dict, Any, Optional, List, Callable, Awaitable
 from dataclasses import dataclass
 import httpx
 from utils.logger import logger
+from services import redis
 import time
 import random
 
@@ -22,13 +25,174 @@ class PipedreamConfig:
     client_id: str
     client_secret: str
 
+# Access tokens are refreshed this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 300
+# Lifetime assumed when the OAuth response doesn't include expires_in
+DEFAULT_TOKEN_TTL = 3600
+# The access token is shared by all worker processes through Redis
+TOKEN_CACHE_KEY = "pipedream_access_token:{client_id}"
+TOKEN_LOCK_KEY = "pipedream_access_token_lock:{client_id}"
+TOKEN_LOCK_TTL = 30
+# How long a process waits for another one to finish refreshing before fetching itself
+TOKEN_LOCK_WAIT = 10
+TOKEN_LOCK_POLL_INTERVAL = 0.2
+# Tools exposed by an app's MCP server are the same for every user, so the list is
+# cached by app slug. It is only used for display: whether a user's connection works
+# is checked per user, and a successful check is remembered for a short time only.
+APP_TOOLS_CACHE_KEY = "pipedream_app_tools:{app_slug}"
+APP_TOOLS_CACHE_TTL = 60 * 60
+CONNECTION_CHECK_KEY = "pipedream_connection_ok:{external_user_id}:{app_slug}:{oauth_app_id}"
+CONNECTION_CHECK_TTL = 5 * 60
+
+
+class PipedreamTokenManager:
+    """Expiry-aware OAuth access token shared across callers and worker processes.
+
+    Tokens are refreshed proactively TOKEN_REFRESH_MARGIN seconds before they expire.
+    Within a process only one refresh runs at a time and concurrent callers await it;
+    across processes the token lives in Redis and a lock ensures a single process
+    calls the OAuth endpoint while the others wait for its result.
+    """
+
+    def __init__(self, config: PipedreamConfig, token_url: str,
+                 get_session: Callable[[], Awaitable[httpx.AsyncClient]]):
+        self.config = config
+        self.token_url = token_url
+        self._get_session = get_session
+        self._token: Optional[str] = None
+        self._expires_at: float = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._cache_key = TOKEN_CACHE_KEY.format(client_id=config.client_id)
+        self._lock_key = TOKEN_LOCK_KEY.format(client_id=config.client_id)
+
+    def _is_fresh(self, expires_at: float) -> bool:
+        return expires_at - time.time() > TOKEN_REFRESH_MARGIN
+
+    async def get_token(self) -> str:
+        if self._token and self._is_fresh(self._expires_at):
+            return self._token
+
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        try:
+            return await asyncio.shield(self._refresh_task)
+        except Exception as e:
+            # A proactive refresh failed but the current token is still usable
+            if self._token and time.time() < self._expires_at:
+                logger.warning(f"Failed to refresh Pipedream access token, using current token: {str(e)}")
+                return self._token
+            raise
+
+    async def invalidate(self, token: Optional[str] = None) -> None:
+        """Drop a token the API rejected so the next call fetches a new one."""
+        if token is not None and token != self._token:
+            return
+        rejected = self._token
+        self._token = None
+        self._expires_at = 0
+        try:
+            shared = await self._read_shared_token()
+            if shared and shared[0] == rejected:
+                await redis.delete(self._cache_key)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate shared Pipedream access token: {str(e)}")
+
+    async def _read_shared_token(self) -> Optional[tuple]:
+        cached = await redis.get(self._cache_key)
+        if not cached:
+            return None
+        data = json.loads(cached)
+        return data["access_token"], data["expires_at"]
+
+    def _adopt(self, token: str, expires_at: float) -> str:
+        self._token = token
+        self._expires_at = expires_at
+        return token
+
+    async def _refresh(self) -> str:
+        lock_owner = uuid.uuid4().hex
+        try:
+            shared = await self._read_shared_token()
+            if shared and self._is_fresh(shared[1]):
+                return self._adopt(*shared)
+            acquired = await redis.set(self._lock_key, lock_owner, ex=TOKEN_LOCK_TTL, nx=True)
+        except Exception as e:
+            logger.warning(f"Shared Pipedream token cache unavailable, fetching token directly: {str(e)}")
+            return self._adopt(*await self._fetch_token())
+
+        if acquired:
+            try:
+                token, expires_at = await self._fetch_token()
+                await self._publish_token(token, expires_at)
+                return self._adopt(token, expires_at)
+            finally:
+                await self._release_lock(lock_owner)
+
+        # Another process is refreshing the token, wait for it to publish the result
+        deadline = time.time() + TOKEN_LOCK_WAIT
+        try:
+            while time.time() < deadline:
+                await asyncio.sleep(TOKEN_LOCK_POLL_INTERVAL)
+                shared = await self._read_shared_token()
+                if shared and self._is_fresh(shared[1]):
+                    return self._adopt(*shared)
+            logger.warning("Timed out waiting for another process to refresh the Pipedream access token")
+        except Exception as e:
+            logger.warning(f"Failed to read shared Pipedream access token: {str(e)}")
+        return self._adopt(*await self._fetch_token())
+
+    async def _publish_token(self, token: str, expires_at: float) -> None:
+        try:
+            await redis.set(
+                self._cache_key,
+                json.dumps({"access_token": token, "expires_at": expires_at}),
+                ex=max(1, int(expires_at - time.time()))
+            )
+        except Exception as e:
+            logger.warning(f"Failed to share Pipedream access token: {str(e)}")
+
+    async def _release_lock(self, lock_owner: str) -> None:
+        try:
+            if await redis.get(self._lock_key) == lock_owner:
+                await redis.delete(self._lock_key)
+        except Exception as e:
+            logger.warning(f"Failed to release Pipedream token lock: {str(e)}")
+
+    async def _fetch_token(self) -> tuple:
+        logger.info("Obtaining Pipedream access token via OAuth")
+        # Make this request without retry logic to avoid issues
+        session = await self._get_session()
+        response = await session.post(
+            self.token_url,
+            headers={"Content-Type": "application/json"},
+            json={
+                "grant_type": "client_credentials",
+                "client_id": self.config.client_id,
+                "client_secret": self.config.client_secret
+            }
+        )
+
+        response.raise_for_status()
+        data = response.json()
+
+        access_token = data.get("access_token")
+        if not access_token:
+            raise ValueError("No access token received from Pipedream OAuth")
+
+        expires_at = time.time() + int(data.get("expires_in") or DEFAULT_TOKEN_TTL)
+        logger.info("Successfully obtained Pipedream access token")
+        return access_token, expires_at
+
+
 class PipedreamClient:
     def __init__(self, config: Optional[PipedreamConfig] = None):
         self.config = config or self._load_config_from_env()
         self.base_url = "https://api.pipedream.com/v1"
-        self.access_token: Optional[str] = None
         self.rate_limit_token: Optional[str] = None
         self.session: Optional[httpx.AsyncClient] = None
+        self.token_manager = PipedreamTokenManager(
+            self.config, f"{self.base_url}/oauth/token", self._get_session
+        )
         
     def _load_config_from_env(self) -> PipedreamConfig:
         project_id = os.getenv("PIPEDREAM_PROJECT_ID")
@@ -61,6 +225,7 @@ class PipedreamClient:
         if self.session is None or self.session.is_closed:
             self.session = httpx.AsyncClient(
                 timeout=httpx.Timeout(30.0),
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60),
                 headers={"User-Agent": "Suna-Pipedream-Client/1.0"}
             )
         return self.session
@@ -130,6 +295,14 @@ class PipedreamClient:
                 
                 response = await session.request(method, url, headers=request_headers, **kwargs)
                 
+                if response.status_code == 401 and attempt < max_retries and "Authorization" in headers:
+                    # The access token was revoked or expired early, fetch a new one and retry
+                    rejected_token = headers["Authorization"].removeprefix("Bearer ")
+                    await self.token_manager.invalidate(rejected_token)
+                    headers = {**headers, "Authorization": f"Bearer {await self._obtain_access_token()}"}
+                    logger.warning(f"Pipedream rejected the access token, retrying with a new one (attempt {attempt + 1}/{max_retries + 1})")
+                    continue
+                
                 if response.status_code == 429:
                     if attempt < max_retries:
                         retry_after = response.headers.get('retry-after')
@@ -165,33 +338,8 @@ class PipedreamClient:
         raise Exception(f"Max retries ({max_retries}) exceeded for {method} {url}")
 
     async def _obtain_access_token(self) -> str:
-        if self.access_token:
-            return self.access_token
-            
-        logger.info("Obtaining Pipedream access token via OAuth")
         try:
-            # Make this request without retry logic to avoid issues
-            session = await self._get_session()
-            response = await session.post(
-                f"{self.base_url}/oauth/token",
-                headers={"Content-Type": "application/json"},
-                json={
-                    "grant_type": "client_credentials",
-                    "client_id": self.config.client_id,
-                    "client_secret": self.config.client_secret
-                }
-            )
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            self.access_token = data.get("access_token")
-            if not self.access_token:
-                raise ValueError("No access token received from Pipedream OAuth")
-            
-            logger.info("Successfully obtained Pipedream access token")
-            return self.access_token
-            
+            return await self.token_manager.get_token()
         except Exception as e:
             logger.error(f"Error obtaining access token: {str(e)}")
             raise
@@ -292,7 +440,8 @@ class PipedreamClient:
             logger.error(f"Error getting connections: {str(e)}")
             raise
 
-    async def discover_mcp_servers(self, external_user_id: str, app_slug: Optional[str] = None, oauth_app_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    async def discover_mcp_servers(self, external_user_id: str, app_slug: Optional[str] = None, oauth_app_id: Optional[str] = None,
+                                   refresh_tools: bool = False) -> List[Dict[str, Any]]:
         if not ClientSession or not streamablehttp_client:
             logger.error("MCP not available - cannot discover MCP servers")
             return []
@@ -308,14 +457,9 @@ class PipedreamClient:
         if app_slug:
             user_apps = [app for app in user_apps if app.get('name_slug') == app_slug]
         
-        mcp_servers = []
-        for app in user_apps:
+        async def discover(app: Dict[str, Any]) -> Dict[str, Any]:
             app_slug_current = app.get('name_slug')
             app_name = app.get('name')
-            
-            if not app_slug_current:
-                continue
-                
             mcp_config = {
                 'app_slug': app_slug_current,
                 'app_name': app_name,
@@ -327,20 +471,52 @@ class PipedreamClient:
             }
             
             try:
-                tools = await self._test_mcp_connection(mcp_config)
+                tools = await self._get_connected_tools(mcp_config, force_check=refresh_tools)
                 mcp_config['available_tools'] = tools
                 mcp_config['status'] = 'connected'
-                mcp_servers.append(mcp_config)
                 logger.info(f"Successfully discovered MCP server for {app_name} ({app_slug_current}) with {len(tools)} tools")
             except Exception as e:
                 logger.warning(f"Failed to connect to MCP server for {app_name} ({app_slug_current}): {str(e)}")
                 mcp_config['status'] = 'error'
                 mcp_config['error'] = str(e)
-                mcp_servers.append(mcp_config)
+            return mcp_config
+
+        mcp_servers = list(await asyncio.gather(*(discover(app) for app in user_apps if app.get('name_slug'))))
         
         logger.info(f"Discovered {len(mcp_servers)} MCP servers for user: {external_user_id}")
         return mcp_servers
 
+    async def _get_connected_tools(self, mcp_config: Dict[str, Any], force_check: bool = False) -> List[Dict[str, Any]]:
+        """Verify the user's MCP connection for an app and return the app's tools.
+
+        The user's connection is opened unless it was verified within CONNECTION_CHECK_TTL
+        (and `force_check` is not set); only then is the per-app tool list reused.
+        Raises if the connection can't be opened.
+        """
+        app_slug = mcp_config['app_slug']
+        check_key = CONNECTION_CHECK_KEY.format(
+            external_user_id=mcp_config['external_user_id'],
+            app_slug=app_slug,
+            oauth_app_id=mcp_config.get('oauth_app_id') or ''
+        )
+        if not force_check:
+            try:
+                if await redis.get(check_key):
+                    cached = await redis.get(APP_TOOLS_CACHE_KEY.format(app_slug=app_slug))
+                    if cached:
+                        return json.loads(cached)
+            except Exception as e:
+                logger.warning(f"Failed to read cached tools for {app_slug}: {str(e)}")
+
+        tools = await self._test_mcp_connection(mcp_config)
+        try:
+            await redis.set(check_key, "1", ex=CONNECTION_CHECK_TTL)
+            if tools:
+                await redis.set(APP_TOOLS_CACHE_KEY.format(app_slug=app_slug), json.dumps(tools), ex=APP_TOOLS_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Failed to cache tools for {app_slug}: {str(e)}")
+        return tools
+
     async def _test_mcp_connection(self, mcp_config: Dict[str, Any]) -> List[Dict[str, Any]]:
         if not ClientSession or not streamablehttp_client:
             raise Exception("MCP not available")
@@ -408,7 +584,8 @@ class PipedreamClient:
         }
         
         try:
-            tools = await self._test_mcp_connection(mcp_config)
+            # Always verify the user's own connection before reporting it as created
+            tools = await self._get_connected_tools(mcp_config, force_check=True)
             mcp_config['available_tools'] = tools
             mcp_config['status'] = 'connected'
             logger.info(f"Successfully created MCP connection for {app_slug} with {len(tools)} tools")
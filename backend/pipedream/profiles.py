@@ -8,9 +8,39 @@ import hashlib
 
 from utils.logger import logger
 from services.supabase import DBConnection
-from utils.encryption import encrypt_data, decrypt_data
+from services import redis
+from utils.encryption import encrypt_data, decrypt_data, decrypt_profile_config, credential_cache
 from .client import get_pipedream_client
 
+# Connected app slugs per external user are cached briefly, so listing profiles doesn't
+# call Pipedream for every profile on every request
+CONNECTIONS_CACHE_TTL = 30
+CONNECTIONS_CACHE_KEY = "pipedream_connections:{external_user_id}"
+# Maximum number of concurrent Pipedream connection lookups for one listing
+CONNECTION_CHECK_CONCURRENCY = 8
+
+
+async def cache_connected_apps(external_user_id: str, connections: List[Dict[str, Any]]):
+    """Store the connected app slugs for an external user from a fresh get_connections result."""
+    app_slugs = [conn.get('name_slug') for conn in connections if conn.get('name_slug')]
+    try:
+        await redis.set(
+            CONNECTIONS_CACHE_KEY.format(external_user_id=external_user_id),
+            json.dumps(app_slugs),
+            ex=CONNECTIONS_CACHE_TTL
+        )
+    except Exception as e:
+        logger.warning(f"Failed to cache Pipedream connections for {external_user_id}: {str(e)}")
+    return app_slugs
+
+
+async def invalidate_connected_apps(external_user_id: str):
+    """Drop the cached connection status of an external user, e.g. when a connect flow starts or a connection changes."""
+    try:
+        await redis.delete(CONNECTIONS_CACHE_KEY.format(external_user_id=external_user_id))
+    except Exception as e:
+        logger.warning(f"Failed to invalidate Pipedream connections for {external_user_id}: {str(e)}")
+
 
 class PipedreamProfile(BaseModel):
     profile_id: UUID
@@ -74,6 +104,45 @@ class ProfileManager:
     def _get_mcp_qualified_name(self, app_slug: str) -> str:
         """Convert app_slug to MCP qualified name for Pipedream"""
         return f"pipedream:{app_slug}"
+
+    async def _get_connected_apps(self, external_user_ids: List[str]) -> Dict[str, List[str]]:
+        """Connected app slugs for each external user.
+
+        Users are deduplicated, cached results are read with a single MGET and the
+        remaining users are looked up concurrently. Users whose lookup failed map to
+        an empty list and are not cached.
+        """
+        unique_ids = list(dict.fromkeys(user_id for user_id in external_user_ids if user_id))
+        connected: Dict[str, List[str]] = {}
+        if not unique_ids:
+            return connected
+
+        try:
+            redis_client = await redis.get_client()
+            cached_values = await redis_client.mget(
+                [CONNECTIONS_CACHE_KEY.format(external_user_id=user_id) for user_id in unique_ids]
+            )
+            for user_id, cached in zip(unique_ids, cached_values):
+                if cached is not None:
+                    connected[user_id] = json.loads(cached)
+        except Exception as e:
+            logger.warning(f"Failed to read cached Pipedream connections: {str(e)}")
+
+        semaphore = asyncio.Semaphore(CONNECTION_CHECK_CONCURRENCY)
+
+        async def lookup(user_id: str):
+            async with semaphore:
+                try:
+                    connections = await self.pipedream_client.get_connections(user_id)
+                except Exception as e:
+                    logger.warning(f"Error checking connection status: {str(e)}")
+                    return user_id, []
+                return user_id, await cache_connected_apps(user_id, connections)
+
+        missing = [user_id for user_id in unique_ids if user_id not in connected]
+        if missing:
+            connected.update(await asyncio.gather(*(lookup(user_id) for user_id in missing)))
+        return connected
     
     async def create_profile(
         self, 
@@ -143,11 +212,8 @@ class ProfileManager:
             
             # Check if already connected
             try:
-                connections = await self.pipedream_client.get_connections(external_user_id)
-                is_connected = any(
-                    conn.get('name_slug') == request.app_slug 
-                    for conn in connections
-                )
+                connected_apps = await self._get_connected_apps([external_user_id])
+                is_connected = request.app_slug in connected_apps.get(external_user_id, [])
                 profile['is_connected'] = is_connected
                 
                 if is_connected:
@@ -212,45 +278,46 @@ class ProfileManager:
             
             result = await query.order('created_at', desc=True).execute()
             
-            profiles = []
+            rows = []
             for profile_data in result.data:
                 try:
-                    decrypted_config = decrypt_data(profile_data['encrypted_config'])
+                    decrypted_config = decrypt_profile_config(profile_data)
                     config = json.loads(decrypted_config)
-                    
-                    profile_data['app_slug'] = config.get('app_slug', '')
-                    profile_data['app_name'] = config.get('app_name', '')
-                    profile_data['external_user_id'] = config.get('external_user_id', '')
-                    profile_data['enabled_tools'] = config.get('enabled_tools', [])
-                    
-                    is_connected = False
-                    try:
-                        connections = await self.pipedream_client.get_connections(
-                            profile_data['external_user_id']
-                        )
-                        
-                        is_connected = any(
-                            conn.get('name_slug') == profile_data['app_slug'] 
-                            for conn in connections
-                        )
-                        
-                        if is_connected and profile_data.get('last_used_at') is None:
-                            await client.table('user_mcp_credential_profiles').update({
-                                'last_used_at': datetime.utcnow().isoformat()
-                            }).eq('profile_id', profile_data['profile_id']).execute()
-                            
-                            profile_data['last_used_at'] = datetime.utcnow()
-                            
-                    except Exception as e:
-                        logger.warning(f"Error checking connection status: {str(e)}")
-                    
-                    profile_data['is_connected'] = is_connected
-                    
-                    profiles.append(PipedreamProfile(**profile_data))
-                    
                 except Exception as e:
                     logger.error(f"Error decrypting profile config: {str(e)}")
                     continue
+
+                profile_data['app_slug'] = config.get('app_slug', '')
+                profile_data['app_name'] = config.get('app_name', '')
+                profile_data['external_user_id'] = config.get('external_user_id', '')
+                profile_data['enabled_tools'] = config.get('enabled_tools', [])
+                rows.append(profile_data)
+
+            connected_apps = await self._get_connected_apps([row['external_user_id'] for row in rows])
+
+            profiles = []
+            first_used_ids = []
+            now = datetime.utcnow()
+            for profile_data in rows:
+                is_connected = profile_data['app_slug'] in connected_apps.get(profile_data['external_user_id'], [])
+                if is_connected and profile_data.get('last_used_at') is None:
+                    first_used_ids.append(profile_data['profile_id'])
+                    profile_data['last_used_at'] = now
+                profile_data['is_connected'] = is_connected
+
+                try:
+                    profiles.append(PipedreamProfile(**profile_data))
+                except Exception as e:
+                    logger.error(f"Error building credential profile: {str(e)}")
+
+            # Record the first use of newly connected profiles in a single write
+            if first_used_ids:
+                try:
+                    await client.table('user_mcp_credential_profiles').update({
+                        'last_used_at': now.isoformat()
+                    }).in_('profile_id', first_used_ids).execute()
+                except Exception as e:
+                    logger.warning(f"Error updating last_used_at for connected profiles: {str(e)}")
             
             return profiles
             
@@ -273,7 +340,7 @@ class ProfileManager:
             profile_data = result.data
 
             try:
-                decrypted_config = decrypt_data(profile_data['encrypted_config'])
+                decrypted_config = decrypt_profile_config(profile_data)
                 config = json.loads(decrypted_config)
 
                 profile_data['app_slug'] = config.get('app_slug', '')
@@ -281,20 +348,10 @@ class ProfileManager:
                 profile_data['external_user_id'] = config.get('external_user_id', '')
                 profile_data['enabled_tools'] = config.get('enabled_tools', [])
                 
-                is_connected = False
-                try:
-                    connections = await self.pipedream_client.get_connections(
-                        profile_data['external_user_id']
-                    )
-                    
-                    is_connected = any(
-                        conn.get('name_slug') == profile_data['app_slug'] 
-                        for conn in connections
-                    )
-                except Exception as e:
-                    logger.warning(f"Error checking connection status: {str(e)}")
-                
-                profile_data['is_connected'] = is_connected
+                connected_apps = await self._get_connected_apps([profile_data['external_user_id']])
+                profile_data['is_connected'] = profile_data['app_slug'] in connected_apps.get(
+                    profile_data['external_user_id'], []
+                )
                 
                 return PipedreamProfile(**profile_data)
                 
@@ -358,6 +415,7 @@ class ProfileManager:
                 result = await client.table('user_mcp_credential_profiles').update(
                     update_data
                 ).eq('profile_id', profile_id).eq('account_id', account_id).execute()
+                credential_cache.invalidate(profile_id)
             
             return await self.get_profile(account_id, profile_id)
             
@@ -378,6 +436,7 @@ class ProfileManager:
             await client.table('user_mcp_credential_profiles').delete().eq(
                 'profile_id', profile_id
             ).eq('account_id', account_id).execute()
+            credential_cache.invalidate(profile_id)
             
             logger.info(f"Deleted credential profile: {profile_id}")
             
@@ -400,6 +459,9 @@ class ProfileManager:
                 app or profile.app_slug
             )
 
+            # The user is about to change their connections
+            await invalidate_connected_apps(profile.external_user_id)
+
             client = await self.db.client
             await client.table('user_mcp_credential_profiles').update({
                 'last_used_at': datetime.utcnow().isoformat()
@@ -426,6 +488,7 @@ class ProfileManager:
                 raise ValueError("Profile not found")
             
             connections = await self.pipedream_client.get_connections(profile.external_user_id)
+            await cache_connected_apps(profile.external_user_id, connections)
             
             return connections
             
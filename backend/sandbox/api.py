@@ -1,27 +1,41 @@
+import json
 import os
 import urllib.parse
-from typing import Optional
+from typing import Optional, List
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, APIRouter, Form, Depends, Request
 from fastapi.responses import Response
 from pydantic import BaseModel
 from daytona_sdk import AsyncSandbox
 
-from sandbox.sandbox import get_or_start_sandbox, delete_sandbox
+from sandbox.sandbox import get_or_start_sandbox, delete_sandbox, invalidate_sandbox_state
+from sandbox.file_transfer import upload_files, create_archive
 from utils.logger import logger
 from utils.auth_utils import get_optional_user_id
 from services.supabase import DBConnection
+from services import redis
 
 # Initialize shared resources
 router = APIRouter(tags=["sandbox"])
 db = None
 
+# Project ownership and account membership rarely change, but file browsers hit these
+# endpoints many times per second, so lookups are cached briefly across workers
+SANDBOX_ACCESS_TTL = 30
+SANDBOX_PROJECT_KEY = "sandbox_project:{sandbox_id}"
+ACCOUNT_MEMBER_KEY = "account_member:{account_id}:{user_id}"
+
 def initialize(_db: DBConnection):
     """Initialize the sandbox API with resources from the main API."""
     global db
     db = _db
     logger.info("Initialized sandbox API with database connection")
 
+class ArchiveRequest(BaseModel):
+    """Model for a batched download request"""
+    paths: List[str]
+    compress: bool = True
+
 class FileInfo(BaseModel):
     """Model for file information"""
     name: str
@@ -66,6 +80,54 @@ def normalize_path(path: str) -> str:
         logger.error(f"Error normalizing path '{path}': {str(e)}")
         return path  # Return original path if decoding fails
 
+async def get_sandbox_project(client, sandbox_id: str) -> Optional[dict]:
+    """Find the project that owns a sandbox, using the shared cache when possible."""
+    cache_key = SANDBOX_PROJECT_KEY.format(sandbox_id=sandbox_id)
+    try:
+        cached = await redis.get(cache_key)
+        if cached:
+            return json.loads(cached)
+    except Exception as e:
+        logger.warning(f"Failed to read cached project for sandbox {sandbox_id}: {str(e)}")
+    
+    project_result = await client.table('projects').select('*').filter('sandbox->>id', 'eq', sandbox_id).execute()
+    if not project_result.data or len(project_result.data) == 0:
+        return None
+    
+    project_data = project_result.data[0]
+    try:
+        await redis.set(cache_key, json.dumps(project_data, default=str), ex=SANDBOX_ACCESS_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to cache project for sandbox {sandbox_id}: {str(e)}")
+    return project_data
+
+async def is_account_member(client, account_id: str, user_id: str) -> bool:
+    """Check account membership. Only positive results are cached, so newly granted access applies immediately."""
+    cache_key = ACCOUNT_MEMBER_KEY.format(account_id=account_id, user_id=user_id)
+    try:
+        if await redis.get(cache_key):
+            return True
+    except Exception as e:
+        logger.warning(f"Failed to read cached membership for account {account_id}: {str(e)}")
+    
+    account_user_result = await client.schema('basejump').from_('account_user').select('account_role').eq('user_id', user_id).eq('account_id', account_id).execute()
+    if not (account_user_result.data and len(account_user_result.data) > 0):
+        return False
+    
+    try:
+        await redis.set(cache_key, "1", ex=SANDBOX_ACCESS_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to cache membership for account {account_id}: {str(e)}")
+    return True
+
+async def invalidate_sandbox_access(sandbox_id: str):
+    """Drop cached project and sandbox state, e.g. after the sandbox was deleted or failed."""
+    try:
+        await redis.delete(SANDBOX_PROJECT_KEY.format(sandbox_id=sandbox_id))
+    except Exception as e:
+        logger.warning(f"Failed to invalidate cached project for sandbox {sandbox_id}: {str(e)}")
+    await invalidate_sandbox_state(sandbox_id)
+
 async def verify_sandbox_access(client, sandbox_id: str, user_id: Optional[str] = None):
     """
     Verify that a user has access to a specific sandbox based on account membership.
@@ -82,12 +144,10 @@ async def verify_sandbox_access(client, sandbox_id: str, user_id: Optional[str]
         HTTPException: If the user doesn't have access to the sandbox or sandbox doesn't exist
     """
     # Find the project that owns this sandbox
-    project_result = await client.table('projects').select('*').filter('sandbox->>id', 'eq', sandbox_id).execute()
+    project_data = await get_sandbox_project(client, sandbox_id)
     
-    if not project_result.data or len(project_result.data) == 0:
+    if not project_data:
         raise HTTPException(status_code=404, detail="Sandbox not found")
-    
-    project_data = project_result.data[0]
 
     if project_data.get('is_public'):
         return project_data
@@ -99,10 +159,8 @@ async def verify_sandbox_access(client, sandbox_id: str, user_id: Optional[str]
     account_id = project_data.get('account_id')
     
     # Verify account membership
-    if account_id:
-        account_user_result = await client.schema('basejump').from_('account_user').select('account_role').eq('user_id', user_id).eq('account_id', account_id).execute()
-        if account_user_result.data and len(account_user_result.data) > 0:
-            return project_data
+    if account_id and await is_account_member(client, account_id, user_id):
+        return project_data
     
     raise HTTPException(status_code=403, detail="Not authorized to access this sandbox")
 
@@ -121,9 +179,9 @@ async def get_sandbox_by_id_safely(client, sandbox_id: str) -> AsyncSandbox:
         HTTPException: If the sandbox doesn't exist or can't be retrieved
     """
     # Find the project that owns this sandbox
-    project_result = await client.table('projects').select('project_id').filter('sandbox->>id', 'eq', sandbox_id).execute()
+    project_data = await get_sandbox_project(client, sandbox_id)
     
-    if not project_result.data or len(project_result.data) == 0:
+    if not project_data:
         logger.error(f"No project found for sandbox ID: {sandbox_id}")
         raise HTTPException(status_code=404, detail="Sandbox not found - no project owns this sandbox ID")
     
@@ -139,6 +197,8 @@ async def get_sandbox_by_id_safely(client, sandbox_id: str) -> AsyncSandbox:
         return sandbox
     except Exception as e:
         logger.error(f"Error retrieving sandbox {sandbox_id}: {str(e)}")
+        # The cached handle may belong to a sandbox that has since stopped
+        await invalidate_sandbox_state(sandbox_id)
         raise HTTPException(status_code=500, detail=f"Failed to retrieve sandbox: {str(e)}")
 
 @router.post("/sandboxes/{sandbox_id}/files")
@@ -173,6 +233,84 @@ async def create_file(
         return {"status": "success", "created": True, "path": path}
     except Exception as e:
         logger.error(f"Error creating file in sandbox {sandbox_id}: {str(e)}")
+        await invalidate_sandbox_state(sandbox_id)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/sandboxes/{sandbox_id}/files/batch")
+async def create_files(
+    sandbox_id: str,
+    path: str = Form(...),
+    files: List[UploadFile] = File(...),
+    request: Request = None,
+    user_id: Optional[str] = Depends(get_optional_user_id)
+):
+    """Upload several files into a sandbox directory with a single archive transfer"""
+    # Normalize the path to handle UTF-8 encoding correctly
+    path = normalize_path(path)
+    
+    logger.info(f"Received batch upload request for sandbox {sandbox_id}, path: {path}, files: {len(files)}, user_id: {user_id}")
+    client = await db.client
+    
+    # Verify the user has access to this sandbox
+    await verify_sandbox_access(client, sandbox_id, user_id)
+    
+    try:
+        # Get sandbox using the safer method
+        sandbox = await get_sandbox_by_id_safely(client, sandbox_id)
+        
+        uploads = [
+            (f"{path.rstrip('/')}/{file.filename.replace('/', '_')}", file.file)
+            for file in files if file.filename
+        ]
+        manifest = await upload_files(sandbox, uploads)
+        logger.info(f"Uploaded {len(manifest)} files to {path} in sandbox {sandbox_id}")
+        
+        return {
+            "status": "success",
+            "files": [{"path": file_path, **entry} for file_path, entry in manifest.items()]
+        }
+    except Exception as e:
+        logger.error(f"Error uploading files to sandbox {sandbox_id}: {str(e)}")
+        await invalidate_sandbox_state(sandbox_id)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for file in files:
+            await file.close()
+
+@router.post("/sandboxes/{sandbox_id}/files/archive")
+async def download_archive(
+    sandbox_id: str,
+    archive_request: ArchiveRequest,
+    request: Request = None,
+    user_id: Optional[str] = Depends(get_optional_user_id)
+):
+    """Download several files or directories from the sandbox as one tar archive"""
+    paths = [normalize_path(path) for path in archive_request.paths]
+    
+    logger.info(f"Received archive request for sandbox {sandbox_id}, paths: {len(paths)}, user_id: {user_id}")
+    if not paths:
+        raise HTTPException(status_code=400, detail="No paths requested")
+    client = await db.client
+    
+    # Verify the user has access to this sandbox
+    await verify_sandbox_access(client, sandbox_id, user_id)
+    
+    try:
+        # Get sandbox using the safer method
+        sandbox = await get_sandbox_by_id_safely(client, sandbox_id)
+        
+        content, _ = await create_archive(sandbox, paths, archive_request.compress)
+        filename = "files.tar.gz" if archive_request.compress else "files.tar"
+        logger.info(f"Created archive of {len(paths)} paths ({len(content)} bytes) from sandbox {sandbox_id}")
+        
+        return Response(
+            content=content,
+            media_type="application/gzip" if archive_request.compress else "application/x-tar",
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
+    except Exception as e:
+        logger.error(f"Error creating archive in sandbox {sandbox_id}: {str(e)}")
+        await invalidate_sandbox_state(sandbox_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/sandboxes/{sandbox_id}/files")
@@ -218,6 +356,7 @@ async def list_files(
         return {"files": [file.dict() for file in result]}
     except Exception as e:
         logger.error(f"Error listing files in sandbox {sandbox_id}: {str(e)}")
+        await invalidate_sandbox_state(sandbox_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/sandboxes/{sandbox_id}/files/content")
@@ -274,6 +413,7 @@ async def read_file(
         raise
     except Exception as e:
         logger.error(f"Error reading file in sandbox {sandbox_id}: {str(e)}")
+        await invalidate_sandbox_state(sandbox_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/sandboxes/{sandbox_id}/files")
@@ -304,6 +444,7 @@ async def delete_file(
         return {"status": "success", "deleted": True, "path": path}
     except Exception as e:
         logger.error(f"Error deleting file in sandbox {sandbox_id}: {str(e)}")
+        await invalidate_sandbox_state(sandbox_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/sandboxes/{sandbox_id}")
@@ -322,6 +463,7 @@ async def delete_sandbox_route(
     try:
         # Delete the sandbox using the sandbox module function
         await delete_sandbox(sandbox_id)
+        await invalidate_sandbox_access(sandbox_id)
         
         return {"status": "success", "deleted": True, "sandbox_id": sandbox_id}
     except Exception as e:
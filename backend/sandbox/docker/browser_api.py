@@ -1,56 +1,238 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Body
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, ElementHandle
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import asyncio
 import json
 import logging
-import base64
 from dataclasses import dataclass, field
 from datetime import datetime
 import os
 import random
 from functools import cached_property
 import traceback
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import pytesseract
 from PIL import Image
 import io
+from file_api import file_mutation_service
+
+# OCR is CPU bound and takes seconds per screenshot, so it runs in worker processes
+# and only when the agent asks for the page text
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "2"))
+OCR_CACHE_SIZE = 64
+
+# Upper bounds for waiting on a page to settle after an action. Pages that are already
+# idle return as soon as the DOM has been quiet for SETTLE_DOM_QUIET_MS.
+SETTLE_MAX_WAIT_MS = int(os.getenv("BROWSER_SETTLE_MAX_WAIT_MS", "5000"))
+SETTLE_NETWORK_IDLE_MS = int(os.getenv("BROWSER_SETTLE_NETWORK_IDLE_MS", "3000"))
+SETTLE_DOM_QUIET_MS = int(os.getenv("BROWSER_SETTLE_DOM_QUIET_MS", "50"))
+
+# Resolves once no DOM mutation has been observed for quietMs, or after timeoutMs
+DOM_QUIET_JS = """
+({quietMs, timeoutMs}) => new Promise(resolve => {
+    let quietTimer = null;
+    let limitTimer = null;
+    const observer = new MutationObserver(() => {
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(done, quietMs);
+    });
+    function done() {
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(limitTimer);
+        resolve();
+    }
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    quietTimer = setTimeout(done, quietMs);
+    limitTimer = setTimeout(done, timeoutMs);
+})
+"""
+
+# Finds the visible interactive element at a 1-based position, in the same order as PAGE_STATE_JS
+ELEMENT_LOCATOR_JS = """
+(targetElementInfo) => {
+    const interactiveElements = Array.from(document.querySelectorAll(
+        'a, button, input, select, textarea, [role="button"], [role="link"], [role="checkbox"], [role="radio"], [tabindex]:not([tabindex="-1"])'
+    ));
+    
+    const visibleElements = interactiveElements.filter(el => {
+        const style = window.getComputedStyle(el);
+        const rect = el.getBoundingClientRect();
+        return style.display !== 'none' && style.visibility !== 'hidden' && style.opacity !== '0' && rect.width > 0 && rect.height > 0;
+    });
+
+    if (targetElementInfo.position > 0 && targetElementInfo.position <= visibleElements.length) {
+        // Return the element at the specified position (1-based)
+        return visibleElements[targetElementInfo.position - 1];
+    }
+    return null; // Element not found at the expected position
+}
+"""
+
+# Collects interactive elements, URL, title, scroll position and viewport in one round trip
+PAGE_STATE_JS = """
+() => {
+    // Helper function to get all attributes as an object
+    function getAttributes(el) {
+        const attributes = {};
+        for (const attr of el.attributes) {
+            attributes[attr.name] = attr.value;
+        }
+        return attributes;
+    }
+    
+    // Find all potentially interactive elements
+    const interactiveElements = Array.from(document.querySelectorAll(
+        'a, button, input, select, textarea, [role="button"], [role="link"], [role="checkbox"], [role="radio"], [tabindex]:not([tabindex="-1"])'
+    ));
+    
+    // Filter for visible elements
+    const visibleElements = interactiveElements.filter(el => {
+        const style = window.getComputedStyle(el);
+        const rect = el.getBoundingClientRect();
+        return style.display !== 'none' && 
+               style.visibility !== 'hidden' && 
+               style.opacity !== '0' &&
+               rect.width > 0 && 
+               rect.height > 0;
+    });
+    
+    // Map to our expected structure
+    const elements = visibleElements.map((el, index) => {
+        const rect = el.getBoundingClientRect();
+        const isInViewport = rect.top >= 0 && 
+                          rect.left >= 0 && 
+                          rect.bottom <= window.innerHeight &&
+                          rect.right <= window.innerWidth;
+        
+        return {
+            index: index + 1,
+            tagName: el.tagName.toLowerCase(),
+            text: el.innerText || el.value || '',
+            attributes: getAttributes(el),
+            isVisible: true,
+            isInteractive: true,
+            pageCoordinates: {
+                x: rect.left + window.scrollX,
+                y: rect.top + window.scrollY,
+                width: rect.width,
+                height: rect.height
+            },
+            viewportCoordinates: {
+                x: rect.left,
+                y: rect.top,
+                width: rect.width,
+                height: rect.height
+            },
+            isInViewport: isInViewport
+        };
+    });
+    
+    const body = document.body;
+    const html = document.documentElement;
+    const totalHeight = Math.max(
+        body ? body.scrollHeight : 0, body ? body.offsetHeight : 0,
+        html.clientHeight, html.scrollHeight, html.offsetHeight
+    );
+    const scrollY = window.scrollY || window.pageYOffset;
+    const windowHeight = window.innerHeight;
+    
+    return {
+        elements: elements,
+        url: window.location.href,
+        title: document.title,
+        pixelsAbove: scrollY,
+        pixelsBelow: Math.max(0, totalHeight - scrollY - windowHeight),
+        viewportWidth: window.innerWidth,
+        viewportHeight: windowHeight
+    };
+}
+"""
+
+def run_ocr(image_path: str) -> str:
+    """Extract text from an image file. Runs in the OCR process pool."""
+    with Image.open(image_path) as image:
+        return pytesseract.image_to_string(image).strip()
+
+# Screenshots are written to disk as compact WebP/JPEG and fetched by the backend as raw
+# bytes, instead of being shipped base64-encoded inside every JSON response
+SCREENSHOT_FORMAT = os.getenv("BROWSER_SCREENSHOT_FORMAT", "webp").lower()
+SCREENSHOT_QUALITY = int(os.getenv("BROWSER_SCREENSHOT_QUALITY", "60"))
+SCREENSHOT_MAX_WIDTH = int(os.getenv("BROWSER_SCREENSHOT_MAX_WIDTH", "1024"))
+SCREENSHOT_MAX_BYTES = int(os.getenv("BROWSER_SCREENSHOT_MAX_BYTES", str(512 * 1024)))
+SCREENSHOT_MIN_QUALITY = 20
+# Number of recent screenshot files kept on disk for the backend and OCR to read
+SCREENSHOT_HISTORY = 16
+
+def perceptual_hash(image: Image.Image, hash_size: int = 16) -> str:
+    """Difference hash of the image; visually identical screenshots get the same hash"""
+    pixels = list(image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            offset = row * (hash_size + 1) + col
+            bits = (bits << 1) | (pixels[offset] > pixels[offset + 1])
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+def encode_screenshot(raw: bytes, image_format: str, quality: int, max_width: int, max_bytes: int) -> tuple:
+    """Downscale and re-encode a raw screenshot, lowering quality until it fits max_bytes
+    Returns a tuple of (encoded bytes, perceptual hash, width, height)
+    """
+    with Image.open(io.BytesIO(raw)) as image:
+        image = image.convert("RGB")
+        if image.width > max_width:
+            image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+        phash = perceptual_hash(image)
+        while True:
+            buffer = io.BytesIO()
+            image.save(buffer, format="WEBP" if image_format == "webp" else "JPEG", quality=quality)
+            if buffer.tell() <= max_bytes or quality <= SCREENSHOT_MIN_QUALITY:
+                return buffer.getvalue(), phash, image.width, image.height
+            quality = max(SCREENSHOT_MIN_QUALITY, quality - 15)
 
 #######################################################
 # Action model definitions
 #######################################################
 
+class SettleOptions(BaseModel):
+    """How long to wait for the page to settle before returning the browser state"""
+    wait_for_selector: Optional[str] = None
+    settle_timeout_ms: Optional[int] = None
+
 class Position(BaseModel):
     x: int
     y: int
 
-class ClickElementAction(BaseModel):
+class ClickElementAction(SettleOptions):
     index: int
 
-class ClickCoordinatesAction(BaseModel):
+class ClickCoordinatesAction(SettleOptions):
     x: int
     y: int
 
-class GoToUrlAction(BaseModel):
+class GoToUrlAction(SettleOptions):
     url: str
 
-class InputTextAction(BaseModel):
+class InputTextAction(SettleOptions):
     index: int
     text: str
 
-class ScrollAction(BaseModel):
+class ScrollAction(SettleOptions):
     amount: Optional[int] = None
 
-class SendKeysAction(BaseModel):
+class SendKeysAction(SettleOptions):
     keys: str
 
-class SearchGoogleAction(BaseModel):
+class SearchGoogleAction(SettleOptions):
     query: str
 
 class SwitchTabAction(BaseModel):
     page_id: int
 
-class OpenTabAction(BaseModel):
+class OpenTabAction(SettleOptions):
     url: str
 
 class CloseTabAction(BaseModel):
@@ -71,6 +253,18 @@ class DragDropAction(BaseModel):
     steps: Optional[int] = 10
     delay_ms: Optional[int] = 5
 
+class BatchStep(SettleOptions):
+    action: str
+    params: Dict[str, Any] = {}
+    wait_ms: Optional[int] = None  # Extra pause after the step has settled
+
+class BatchAction(BaseModel):
+    steps: List[BatchStep]
+    abort_on_failure: bool = True
+
+class PageTextAction(BaseModel):
+    pass
+
 class DoneAction(BaseModel):
     success: bool = True
     text: str = ""
@@ -79,6 +273,27 @@ class DoneAction(BaseModel):
 # DOM Structure Models
 #######################################################
 
+# Attributes that identify an element across page states; elements without any of
+# them are identified by their tag and text
+ELEMENT_IDENTITY_ATTRIBUTES = ["id", "name", "href", "src", "role", "aria-label", "placeholder", "type", "title", "alt"]
+
+def element_identity(element: Dict[str, Any]) -> str:
+    """Identity key of an element collected by PAGE_STATE_JS, stable while the element stays on the page"""
+    attributes = element.get('attributes', {})
+    parts = [element.get('tagName', '')]
+    parts.extend(f"{name}={attributes[name]}" for name in ELEMENT_IDENTITY_ATTRIBUTES if attributes.get(name))
+    if len(parts) == 1:
+        parts.append((element.get('text') or '').strip()[:80])
+    return "|".join(parts)
+
+@dataclass
+class PageElementIndex:
+    """Stable highlight indices for one page, plus the elements last reported to the client"""
+    url: str
+    indices: Dict[str, int] = field(default_factory=dict)
+    next_index: int = 1
+    reported: Optional[Dict[int, str]] = None
+
 @dataclass
 class CoordinateSet:
     x: int = 0
@@ -133,6 +348,7 @@ class DOMElementNode(DOMBaseNode):
     viewport_coordinates: Optional[CoordinateSet] = None
     page_coordinates: Optional[CoordinateSet] = None
     viewport_info: Optional[ViewportInfo] = None
+    dom_position: Optional[int] = None  # 1-based position among the visible interactive elements
     
     def __repr__(self) -> str:
         tag_str = f'<{self.tag_name}'
@@ -181,6 +397,42 @@ class DOMElementNode(DOMBaseNode):
         collect_text(self, 0)
         return '\n'.join(text_parts).strip()
     
+    def to_clickable_string(self, include_attributes: list[str] | None = None) -> str:
+        """Format this element as a single [index]<tag> line."""
+        attributes_str = ''
+        text = self.get_all_text_till_next_clickable_element()
+        
+        # Process attributes for display
+        display_attributes = []
+        if include_attributes:
+            for key, value in self.attributes.items():
+                if key in include_attributes and value and value != self.tag_name:
+                    if text and value in text:
+                        continue  # Skip if attribute value is already in the text
+                    display_attributes.append(str(value))
+        
+        attributes_str = ';'.join(display_attributes)
+        
+        # Build the element string
+        line = f'[{self.highlight_index}]<{self.tag_name}'
+        
+        # Add important attributes for identification
+        for attr_name in ['id', 'href', 'name', 'value', 'type']:
+            if attr_name in self.attributes and self.attributes[attr_name]:
+                line += f' {attr_name}="{self.attributes[attr_name]}"'
+        
+        # Add the text content if available
+        if text:
+            line += f'> {text}'
+        elif attributes_str:
+            line += f'> {attributes_str}'
+        else:
+            # If no text and no attributes, use the tag name
+            line += f'> {self.tag_name.upper()}'
+        
+        line += ' </>'
+        return line
+    
     def clickable_elements_to_string(self, include_attributes: list[str] | None = None) -> str:
         """Convert the processed DOM content to HTML."""
         formatted_text = []
@@ -189,39 +441,7 @@ class DOMElementNode(DOMBaseNode):
             if isinstance(node, DOMElementNode):
                 # Add element with highlight_index
                 if node.highlight_index is not None:
-                    attributes_str = ''
-                    text = node.get_all_text_till_next_clickable_element()
-                    
-                    # Process attributes for display
-                    display_attributes = []
-                    if include_attributes:
-                        for key, value in node.attributes.items():
-                            if key in include_attributes and value and value != node.tag_name:
-                                if text and value in text:
-                                    continue  # Skip if attribute value is already in the text
-                                display_attributes.append(str(value))
-                    
-                    attributes_str = ';'.join(display_attributes)
-                    
-                    # Build the element string
-                    line = f'[{node.highlight_index}]<{node.tag_name}'
-                    
-                    # Add important attributes for identification
-                    for attr_name in ['id', 'href', 'name', 'value', 'type']:
-                        if attr_name in node.attributes and node.attributes[attr_name]:
-                            line += f' {attr_name}="{node.attributes[attr_name]}"'
-                    
-                    # Add the text content if available
-                    if text:
-                        line += f'> {text}'
-                    elif attributes_str:
-                        line += f'> {attributes_str}'
-                    else:
-                        # If no text and no attributes, use the tag name
-                        line += f'> {node.tag_name.upper()}'
-                    
-                    line += ' </>'
-                    formatted_text.append(line)
+                    formatted_text.append(node.to_clickable_string(include_attributes))
                 
                 # Process children regardless
                 for child in node.children:
@@ -237,6 +457,16 @@ class DOMElementNode(DOMBaseNode):
         result = '\n'.join(formatted_text)
         return result if result.strip() else "No interactive elements found"
 
+@dataclass
+class Screenshot:
+    path: str
+    sha256: str
+    phash: str
+    format: str
+    width: int
+    height: int
+    size: int
+
 @dataclass
 class DOMState:
     element_tree: DOMElementNode
@@ -245,6 +475,8 @@ class DOMState:
     title: str = ""
     pixels_above: int = 0
     pixels_below: int = 0
+    viewport_width: int = 0
+    viewport_height: int = 0
 
 #######################################################
 # Browser Action Result Model
@@ -259,7 +491,13 @@ class BrowserActionResult(BaseModel):
     url: Optional[str] = None
     title: Optional[str] = None
     elements: Optional[str] = None  # Formatted string of clickable elements
-    screenshot_base64: Optional[str] = None
+    elements_diff: Optional[str] = None  # Added, removed and changed elements since the previous state
+    elements_summary: Optional[str] = None
+    full_state: bool = True  # False when only elements_diff is returned
+    screenshot_path: Optional[str] = None  # Path of the screenshot file inside the sandbox
+    screenshot_hash: Optional[str] = None
+    screenshot_phash: Optional[str] = None
+    screenshot_format: Optional[str] = None
     pixels_above: int = 0
     pixels_below: int = 0
     content: Optional[str] = None
@@ -289,6 +527,11 @@ class BrowserAutomation:
         self.include_attributes = ["id", "href", "src", "alt", "aria-label", "placeholder", "name", "role", "title", "value"]
         self.screenshot_dir = os.path.join(os.getcwd(), "screenshots")
         os.makedirs(self.screenshot_dir, exist_ok=True)
+        self.ocr_executor: Optional[ProcessPoolExecutor] = None
+        self.ocr_semaphore = asyncio.Semaphore(OCR_MAX_WORKERS)
+        self.ocr_cache: OrderedDict[str, str] = OrderedDict()
+        self.screenshot_files: OrderedDict[str, str] = OrderedDict()
+        self.element_indices: Dict[Page, PageElementIndex] = {}
         
         # Register routes
         self.router.on_startup.append(self.startup)
@@ -306,6 +549,9 @@ class BrowserAutomation:
         self.router.post("/automation/input_text")(self.input_text)
         self.router.post("/automation/send_keys")(self.send_keys)
         
+        # Scripted multi-step flows
+        self.router.post("/automation/batch")(self.batch_actions)
+        
         # Tab management
         self.router.post("/automation/switch_tab")(self.switch_tab)
         self.router.post("/automation/open_tab")(self.open_tab)
@@ -313,6 +559,8 @@ class BrowserAutomation:
         
         # Content actions
         self.router.post("/automation/extract_content")(self.extract_content)
+        self.router.post("/automation/get_page_text")(self.get_page_text)
+        self.router.post("/automation/get_state")(self.get_state)
         self.router.post("/automation/save_pdf")(self.save_pdf)
         
         # Scroll actions
@@ -386,6 +634,8 @@ class BrowserAutomation:
             await self.browser_context.close()
         if self.browser:
             await self.browser.close()
+        if self.ocr_executor:
+            self.ocr_executor.shutdown(wait=False, cancel_futures=True)
 
     async def handle_page_created(self, page: Page):
         """Handle new page creation"""
@@ -404,143 +654,145 @@ class BrowserAutomation:
         """Get a map of selectable elements on the page"""
         page = await self.get_current_page()
         
-        # Create a selector map for interactive elements
-        selector_map = {}
-        
         try:
-            # More comprehensive JavaScript to find interactive elements
-            elements_js = """
-            (() => {
-                // Helper function to get all attributes as an object
-                function getAttributes(el) {
-                    const attributes = {};
-                    for (const attr of el.attributes) {
-                        attributes[attr.name] = attr.value;
-                    }
-                    return attributes;
-                }
-                
-                // Find all potentially interactive elements
-                const interactiveElements = Array.from(document.querySelectorAll(
-                    'a, button, input, select, textarea, [role="button"], [role="link"], [role="checkbox"], [role="radio"], [tabindex]:not([tabindex="-1"])'
-                ));
-                
-                // Filter for visible elements
-                const visibleElements = interactiveElements.filter(el => {
-                    const style = window.getComputedStyle(el);
-                    const rect = el.getBoundingClientRect();
-                    return style.display !== 'none' && 
-                           style.visibility !== 'hidden' && 
-                           style.opacity !== '0' &&
-                           rect.width > 0 && 
-                           rect.height > 0;
-                });
-                
-                // Map to our expected structure
-                return visibleElements.map((el, index) => {
-                    const rect = el.getBoundingClientRect();
-                    const isInViewport = rect.top >= 0 && 
-                                      rect.left >= 0 && 
-                                      rect.bottom <= window.innerHeight &&
-                                      rect.right <= window.innerWidth;
-                    
-                    return {
-                        index: index + 1,
-                        tagName: el.tagName.toLowerCase(),
-                        text: el.innerText || el.value || '',
-                        attributes: getAttributes(el),
-                        isVisible: true,
-                        isInteractive: true,
-                        pageCoordinates: {
-                            x: rect.left + window.scrollX,
-                            y: rect.top + window.scrollY,
-                            width: rect.width,
-                            height: rect.height
-                        },
-                        viewportCoordinates: {
-                            x: rect.left,
-                            y: rect.top,
-                            width: rect.width,
-                            height: rect.height
-                        },
-                        isInViewport: isInViewport
-                    };
-                });
-            })();
-            """
-            
-            elements = await page.evaluate(elements_js)
-            print(f"Found {len(elements)} interactive elements in selector map")
-            
-            # Create a root element for the tree
-            root = DOMElementNode(
-                is_visible=True,
-                tag_name="body",
-                is_interactive=False,
-                is_top_element=True
-            )
-            
-            # Create element nodes for each element
-            for idx, el in enumerate(elements):
-                # Create coordinate sets
-                page_coordinates = None
-                viewport_coordinates = None
-                
-                if 'pageCoordinates' in el:
-                    coords = el['pageCoordinates']
-                    page_coordinates = CoordinateSet(
-                        x=coords.get('x', 0),
-                        y=coords.get('y', 0),
-                        width=coords.get('width', 0),
-                        height=coords.get('height', 0)
-                    )
-                
-                if 'viewportCoordinates' in el:
-                    coords = el['viewportCoordinates']
-                    viewport_coordinates = CoordinateSet(
-                        x=coords.get('x', 0),
-                        y=coords.get('y', 0),
-                        width=coords.get('width', 0),
-                        height=coords.get('height', 0)
-                    )
-                
-                # Create the element node
-                element_node = DOMElementNode(
-                    is_visible=el.get('isVisible', True),
-                    tag_name=el.get('tagName', 'div'),
-                    attributes=el.get('attributes', {}),
-                    is_interactive=el.get('isInteractive', True),
-                    is_in_viewport=el.get('isInViewport', False),
-                    highlight_index=el.get('index', idx + 1),
-                    page_coordinates=page_coordinates,
-                    viewport_coordinates=viewport_coordinates
-                )
-                
-                # Add a text node if there's text content
-                if el.get('text'):
-                    text_node = DOMTextNode(is_visible=True, text=el.get('text', ''))
-                    text_node.parent = element_node
-                    element_node.children.append(text_node)
-                
-                selector_map[el.get('index', idx + 1)] = element_node
-                root.children.append(element_node)
-                element_node.parent = root
-                
+            page_state = await page.evaluate(PAGE_STATE_JS)
+            self.assign_stable_indices(page, page_state)
+            return self.build_selector_map(page_state.get('elements', []))
         except Exception as e:
             print(f"Error getting selector map: {e}")
             traceback.print_exc()
-            # Create a dummy element to avoid breaking tests
-            dummy = DOMElementNode(
-                is_visible=True,
-                tag_name="a",
-                attributes={'href': '#'},
-                is_interactive=True,
-                highlight_index=1
+            return self.build_dummy_selector_map()
+    
+    def assign_stable_indices(self, page: Page, page_state: Dict[str, Any]):
+        """Replace the positional element indices with indices that stay stable on the page
+        
+        An element keeps its index for as long as the page URL doesn't change, so indices
+        the agent has already seen stay valid and state changes can be reported as diffs.
+        The original 1-based position is kept as 'position' for locating the element.
+        """
+        url = (page_state.get('url') or page.url).split('#')[0]
+        index_state = self.element_indices.get(page)
+        if index_state is None or index_state.url != url:
+            index_state = PageElementIndex(url=url)
+            self.element_indices[page] = index_state
+        
+        occurrences: Dict[str, int] = {}
+        for position, element in enumerate(page_state.get('elements', []), start=1):
+            identity = element_identity(element)
+            occurrences[identity] = occurrences.get(identity, 0) + 1
+            key = f"{identity}#{occurrences[identity]}"
+            if key not in index_state.indices:
+                index_state.indices[key] = index_state.next_index
+                index_state.next_index += 1
+            element['position'] = position
+            element['index'] = index_state.indices[key]
+    
+    def diff_elements(self, page: Page, dom_state: DOMState, full_state: bool = False) -> Optional[Dict[str, str]]:
+        """Diff the elements against the state last reported for this page
+        
+        Returns None when the full element list should be sent instead: on the first state
+        of a page, when full_state is requested, or when most elements changed anyway.
+        """
+        index_state = self.element_indices.get(page)
+        if index_state is None:
+            return None
+        current = {
+            index: element.to_clickable_string(self.include_attributes)
+            for index, element in dom_state.selector_map.items()
+        }
+        previous = index_state.reported
+        index_state.reported = current
+        if previous is None or full_state:
+            return None
+        
+        added = [line for index, line in current.items() if index not in previous]
+        changed = [line for index, line in current.items() if index in previous and previous[index] != line]
+        removed = [index for index in previous if index not in current]
+        if len(added) + len(changed) > len(current) / 2:
+            return None
+        
+        diff_lines = [f"+ {line}" for line in added]
+        diff_lines.extend(f"~ {line}" for line in changed)
+        diff_lines.extend(f"- [{index}]" for index in removed)
+        unchanged = len(current) - len(added) - len(changed)
+        return {
+            'elements_diff': '\n'.join(diff_lines),
+            'elements_summary': f"{len(added)} added, {len(changed)} changed, {len(removed)} removed, {unchanged} unchanged interactive elements"
+        }
+    
+    def build_dummy_selector_map(self) -> Dict[int, DOMElementNode]:
+        """Create a dummy element to avoid breaking tests"""
+        dummy = DOMElementNode(
+            is_visible=True,
+            tag_name="a",
+            attributes={'href': '#'},
+            is_interactive=True,
+            highlight_index=1
+        )
+        dummy_text = DOMTextNode(is_visible=True, text="Dummy Element")
+        dummy_text.parent = dummy
+        dummy.children.append(dummy_text)
+        return {1: dummy}
+    
+    def build_selector_map(self, elements: List[Dict[str, Any]]) -> Dict[int, DOMElementNode]:
+        """Build the selector map from the interactive elements collected by PAGE_STATE_JS"""
+        selector_map = {}
+        print(f"Found {len(elements)} interactive elements in selector map")
+        
+        # Create a root element for the tree
+        root = DOMElementNode(
+            is_visible=True,
+            tag_name="body",
+            is_interactive=False,
+            is_top_element=True
+        )
+        
+        # Create element nodes for each element
+        for idx, el in enumerate(elements):
+            # Create coordinate sets
+            page_coordinates = None
+            viewport_coordinates = None
+            
+            if 'pageCoordinates' in el:
+                coords = el['pageCoordinates']
+                page_coordinates = CoordinateSet(
+                    x=coords.get('x', 0),
+                    y=coords.get('y', 0),
+                    width=coords.get('width', 0),
+                    height=coords.get('height', 0)
+                )
+            
+            if 'viewportCoordinates' in el:
+                coords = el['viewportCoordinates']
+                viewport_coordinates = CoordinateSet(
+                    x=coords.get('x', 0),
+                    y=coords.get('y', 0),
+                    width=coords.get('width', 0),
+                    height=coords.get('height', 0)
+                )
+            
+            # Create the element node
+            element_node = DOMElementNode(
+                is_visible=el.get('isVisible', True),
+                tag_name=el.get('tagName', 'div'),
+                attributes=el.get('attributes', {}),
+                is_interactive=el.get('isInteractive', True),
+                is_in_viewport=el.get('isInViewport', False),
+                highlight_index=el.get('index', idx + 1),
+                page_coordinates=page_coordinates,
+                viewport_coordinates=viewport_coordinates,
+                dom_position=el.get('position', idx + 1)
             )
-            dummy_text = DOMTextNode(is_visible=True, text="Dummy Element")
-            dummy_text.parent = dummy
-            dummy.children.append(dummy_text)
-            selector_map[1] = dummy
+            
+            # Add a text node if there's text content
+            if el.get('text'):
+                text_node = DOMTextNode(is_visible=True, text=el.get('text', ''))
+                text_node.parent = element_node
+                element_node.children.append(text_node)
+            
+            selector_map[el.get('index', idx + 1)] = element_node
+            root.children.append(element_node)
+            element_node.parent = root
         
         return selector_map
     
@@ -548,7 +800,17 @@ class BrowserAutomation:
         """Get the current DOM state including element tree and selector map"""
         try:
             page = await self.get_current_page()
-            selector_map = await self.get_selector_map()
+            
+            # Elements, URL, title, scroll and viewport info in a single evaluate round trip
+            try:
+                page_state = await page.evaluate(PAGE_STATE_JS)
+                self.assign_stable_indices(page, page_state)
+                selector_map = self.build_selector_map(page_state.get('elements', []))
+            except Exception as e:
+                print(f"Error getting page state: {e}")
+                traceback.print_exc()
+                page_state = {}
+                selector_map = self.build_dummy_selector_map()
             
             # Create a root element
             root = DOMElementNode(
@@ -564,48 +826,15 @@ class BrowserAutomation:
                     element.parent = root
                     root.children.append(element)
             
-            # Get basic page info
-            url = page.url
-            try:
-                title = await page.title()
-            except:
-                title = "Unknown Title"
-            
-            # Get more accurate scroll information - fix JavaScript syntax
-            try:
-                scroll_info = await page.evaluate("""
-                () => {
-                    const body = document.body;
-                    const html = document.documentElement;
-                    const totalHeight = Math.max(
-                        body.scrollHeight, body.offsetHeight,
-                        html.clientHeight, html.scrollHeight, html.offsetHeight
-                    );
-                    const scrollY = window.scrollY || window.pageYOffset;
-                    const windowHeight = window.innerHeight;
-                    
-                    return {
-                        pixelsAbove: scrollY,
-                        pixelsBelow: Math.max(0, totalHeight - scrollY - windowHeight),
-                        totalHeight: totalHeight,
-                        viewportHeight: windowHeight
-                    };
-                }
-                """)
-                pixels_above = scroll_info.get('pixelsAbove', 0)
-                pixels_below = scroll_info.get('pixelsBelow', 0)
-            except Exception as e:
-                print(f"Error getting scroll info: {e}")
-                pixels_above = 0
-                pixels_below = 0
-            
             return DOMState(
                 element_tree=root,
                 selector_map=selector_map,
-                url=url,
-                title=title,
-                pixels_above=pixels_above,
-                pixels_below=pixels_below
+                url=page_state.get('url') or page.url,
+                title=page_state.get('title') or "Unknown Title",
+                pixels_above=page_state.get('pixelsAbove', 0),
+                pixels_below=page_state.get('pixelsBelow', 0),
+                viewport_width=page_state.get('viewportWidth', 0),
+                viewport_height=page_state.get('viewportHeight', 0)
             )
         except Exception as e:
             print(f"Error getting DOM state: {e}")
@@ -633,35 +862,110 @@ class BrowserAutomation:
                 pixels_below=0
             )
     
-    async def take_screenshot(self) -> str:
-        """Take a screenshot and return as base64 encoded string"""
-        try:
-            page = await self.get_current_page()
-            
-            # Wait for network to be idle and DOM to be stable
+    async def wait_for_page_settle(self, page: Page, settle: Optional[SettleOptions] = None):
+        """Wait for the page to settle after an action
+        
+        Waits for network idle, then for an optional selector to become visible, then for
+        DOM mutations to stop. All steps share one deadline, so the total wait is bounded
+        by settle.settle_timeout_ms (or SETTLE_MAX_WAIT_MS).
+        """
+        max_wait_ms = SETTLE_MAX_WAIT_MS
+        if settle and settle.settle_timeout_ms is not None:
+            max_wait_ms = settle.settle_timeout_ms
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_wait_ms / 1000
+        
+        def remaining_ms() -> int:
+            return max(0, int((deadline - loop.time()) * 1000))
+        
+        # Playwright treats a timeout of 0 as "no timeout", so every step checks the budget first
+        if remaining_ms() > 0:
             try:
-                await page.wait_for_load_state("networkidle", timeout=60000)  # Increased timeout to 60s
+                await page.wait_for_load_state("networkidle", timeout=min(SETTLE_NETWORK_IDLE_MS, remaining_ms()) or 1)
             except Exception as e:
-                print(f"Warning: Network idle timeout, proceeding anyway: {e}")
-            
-            # Wait for any animations to complete
-            # await page.wait_for_timeout(1000)  # Wait 1 second for animations
+                print(f"Network idle not reached while settling, proceeding anyway: {e}")
+        
+        if settle and settle.wait_for_selector and remaining_ms() > 0:
+            try:
+                await page.wait_for_selector(settle.wait_for_selector, state="visible", timeout=remaining_ms() or 1)
+            except Exception as e:
+                print(f"Selector {settle.wait_for_selector} not visible while settling: {e}")
+        
+        if remaining_ms() > 0:
+            try:
+                await page.evaluate(DOM_QUIET_JS, {"quietMs": SETTLE_DOM_QUIET_MS, "timeoutMs": remaining_ms()})
+            except Exception as e:
+                # The execution context is destroyed if the action triggered a navigation
+                print(f"DOM mutation wait interrupted while settling: {e}")
+    
+    async def locate_element(self, page: Page, element: DOMElementNode) -> Optional[ElementHandle]:
+        """Find the live element handle for an element from the selector map"""
+        element_info = {'position': element.dom_position or element.highlight_index}
+        handle = await page.evaluate_handle(ELEMENT_LOCATOR_JS, element_info)
+        return handle.as_element()
+    
+    async def fill_element(self, page: Page, element: DOMElementNode, text: str):
+        """Type text into an element from the selector map"""
+        if element.attributes.get("id"):
+            await page.fill(f"#{element.attributes['id']}", text)
+        elif element.attributes.get("class"):
+            class_selector = f".{element.attributes['class'].replace(' ', '.')}"
+            await page.fill(class_selector, text)
+        else:
+            handle = await self.locate_element(page, element)
+            if handle is None:
+                raise ValueError(f"Could not locate element with index {element.highlight_index}")
+            await handle.fill(text)
+    
+    async def take_screenshot(self) -> Optional[Screenshot]:
+        """Take a viewport screenshot, encode it compactly and write it to the screenshot directory"""
+        try:
+            page = await self.get_current_page()
             
-            # Take screenshot with increased timeout and better options
-            screenshot_bytes = await page.screenshot(
+            # Capture at CSS scale so HiDPI devices don't produce oversized images
+            raw = await page.screenshot(
                 type='jpeg',
-                quality=60,
+                quality=90,
                 full_page=False,
                 timeout=60000,  # Increased timeout to 60s
-                scale='device'  # Use device scale factor
+                scale='css'
             )
             
-            return base64.b64encode(screenshot_bytes).decode('utf-8')
+            encoded, phash, width, height = await asyncio.to_thread(
+                encode_screenshot, raw, SCREENSHOT_FORMAT, SCREENSHOT_QUALITY, SCREENSHOT_MAX_WIDTH, SCREENSHOT_MAX_BYTES
+            )
+            sha256 = hashlib.sha256(encoded).hexdigest()
+            image_format = "webp" if SCREENSHOT_FORMAT == "webp" else "jpeg"
+            path = os.path.join(self.screenshot_dir, f"state_{sha256[:16]}.{image_format}")
+            
+            if sha256 not in self.screenshot_files:
+                with open(path, "wb") as f:
+                    f.write(encoded)
+                self.screenshot_files[sha256] = path
+                # Rotate old screenshots out so the directory doesn't grow unbounded
+                while len(self.screenshot_files) > SCREENSHOT_HISTORY:
+                    _, old_path = self.screenshot_files.popitem(last=False)
+                    try:
+                        os.remove(old_path)
+                    except OSError:
+                        pass
+            else:
+                self.screenshot_files.move_to_end(sha256)
+            
+            return Screenshot(
+                path=path,
+                sha256=sha256,
+                phash=phash,
+                format=image_format,
+                width=width,
+                height=height,
+                size=len(encoded)
+            )
         except Exception as e:
             print(f"Error taking screenshot: {e}")
             traceback.print_exc()
-            # Return an empty string rather than failing
-            return ""
+            # Return None rather than failing
+            return None
     
     async def save_screenshot_to_file(self) -> str:
         """Take a screenshot and save to file, returning the path"""
@@ -678,35 +982,42 @@ class BrowserAutomation:
             print(f"Error saving screenshot: {e}")
             return ""
     
-    async def extract_ocr_text_from_screenshot(self, screenshot_base64: str) -> str:
-        """Extract text from screenshot using OCR"""
-        if not screenshot_base64:
+    async def extract_ocr_text_from_screenshot(self, screenshot: Optional[Screenshot]) -> str:
+        """Extract text from screenshot using OCR, cached by screenshot hash"""
+        if not screenshot:
             return ""
             
         try:
-            # Decode base64 to image
-            image_bytes = base64.b64decode(screenshot_base64)
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            # Extract text using pytesseract
-            ocr_text = pytesseract.image_to_string(image)
-            
-            # Clean up the text
-            ocr_text = ocr_text.strip()
-            
+            screenshot_hash = screenshot.sha256
+            if screenshot_hash in self.ocr_cache:
+                self.ocr_cache.move_to_end(screenshot_hash)
+                return self.ocr_cache[screenshot_hash]
+            
+            if self.ocr_executor is None:
+                self.ocr_executor = ProcessPoolExecutor(max_workers=OCR_MAX_WORKERS)
+            
+            # Bound queued OCR jobs so a burst of requests can't pile up work in the pool
+            async with self.ocr_semaphore:
+                loop = asyncio.get_running_loop()
+                ocr_text = await loop.run_in_executor(self.ocr_executor, run_ocr, screenshot.path)
+            
+            self.ocr_cache[screenshot_hash] = ocr_text
+            if len(self.ocr_cache) > OCR_CACHE_SIZE:
+                self.ocr_cache.popitem(last=False)
             return ocr_text
         except Exception as e:
             print(f"Error performing OCR: {e}")
             traceback.print_exc()
             return ""
     
-    async def get_updated_browser_state(self, action_name: str) -> tuple:
+    async def get_updated_browser_state(self, action_name: str, settle: Optional[SettleOptions] = None, full_state: bool = False) -> tuple:
         """Helper method to get updated browser state after any action
         Returns a tuple of (dom_state, screenshot, elements, metadata)
         """
         try:
-            # Wait a moment for any potential async processes to settle
-            await asyncio.sleep(0.5)
+            # Wait for network and DOM activity triggered by the action to settle
+            page = await self.get_current_page()
+            await self.wait_for_page_settle(page, settle)
             
             # Get updated state
             dom_state = await self.get_current_dom_state()
@@ -718,7 +1029,6 @@ class BrowserAutomation:
             )
             
             # Collect additional metadata
-            page = await self.get_current_page()
             metadata = {}
             
             # Get element count
@@ -743,28 +1053,17 @@ class BrowserAutomation:
             
             metadata['interactive_elements'] = interactive_elements
             
-            # Get viewport dimensions - Fix syntax error in JavaScript
-            try:
-                viewport = await page.evaluate("""
-                () => {
-                    return {
-                        width: window.innerWidth,
-                        height: window.innerHeight
-                    };
-                }
-                """)
-                metadata['viewport_width'] = viewport.get('width', 0)
-                metadata['viewport_height'] = viewport.get('height', 0)
-            except Exception as e:
-                print(f"Error getting viewport dimensions: {e}")
-                metadata['viewport_width'] = 0
-                metadata['viewport_height'] = 0
+            metadata['viewport_width'] = dom_state.viewport_width
+            metadata['viewport_height'] = dom_state.viewport_height
             
-            # Extract OCR text from screenshot if available
-            ocr_text = ""
-            if screenshot:
-                ocr_text = await self.extract_ocr_text_from_screenshot(screenshot)
-                metadata['ocr_text'] = ocr_text
+            # Report only what changed since the previous state of this page when possible
+            elements_diff = self.diff_elements(page, dom_state, full_state)
+            if elements_diff:
+                metadata.update(elements_diff)
+                metadata['interactive_elements'] = None
+                elements = ""
+            else:
+                metadata['elements_summary'] = f"{len(dom_state.selector_map)} interactive elements"
             
             print(f"Got updated state after {action_name}: {len(dom_state.selector_map)} elements")
             return dom_state, screenshot, elements, metadata
@@ -772,9 +1071,9 @@ class BrowserAutomation:
             print(f"Error getting updated state after {action_name}: {e}")
             traceback.print_exc()
             # Return empty values in case of error
-            return None, "", "", {}
+            return None, None, "", {}
 
-    def build_action_result(self, success: bool, message: str, dom_state, screenshot: str, 
+    def build_action_result(self, success: bool, message: str, dom_state, screenshot: Optional[Screenshot], 
                               elements: str, metadata: dict, error: str = "", content: str = None,
                               fallback_url: str = None) -> BrowserActionResult:
         """Helper method to build a consistent BrowserActionResult"""
@@ -789,7 +1088,13 @@ class BrowserAutomation:
             url=dom_state.url if dom_state else fallback_url or "",
             title=dom_state.title if dom_state else "",
             elements=elements,
-            screenshot_base64=screenshot,
+            elements_diff=metadata.get('elements_diff'),
+            elements_summary=metadata.get('elements_summary'),
+            full_state=not metadata.get('elements_diff'),
+            screenshot_path=screenshot.path if screenshot else None,
+            screenshot_hash=screenshot.sha256 if screenshot else None,
+            screenshot_phash=screenshot.phash if screenshot else None,
+            screenshot_format=screenshot.format if screenshot else None,
             pixels_above=dom_state.pixels_above if dom_state else 0,
             pixels_below=dom_state.pixels_below if dom_state else 0,
             content=content,
@@ -807,10 +1112,9 @@ class BrowserAutomation:
         try:
             page = await self.get_current_page()
             await page.goto(action.url, wait_until="domcontentloaded")
-            await page.wait_for_load_state("networkidle", timeout=10000)
             
             # Get updated state after action
-            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"navigate_to({action.url})")
+            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"navigate_to({action.url})", action)
             
             result = self.build_action_result(
                 True,
@@ -862,7 +1166,7 @@ class BrowserAutomation:
             await page.wait_for_load_state()
             
             # Get updated state after action
-            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"search_google({action.query})")
+            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"search_google({action.query})", action)
             
             return self.build_action_result(
                 True,
@@ -974,12 +1278,8 @@ class BrowserAutomation:
             # Perform the click at the specified coordinates
             await page.mouse.click(action.x, action.y)
             
-            # Give time for any navigation or DOM updates to occur
-            await page.wait_for_load_state("networkidle", timeout=5000)
-            
-            await asyncio.sleep(1)
             # Get updated state after action
-            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"click_coordinates({action.x}, {action.y})")
+            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"click_coordinates({action.x}, {action.y})", action)
             
             return self.build_action_result(
                 True,
@@ -997,7 +1297,6 @@ class BrowserAutomation:
             
             # Try to get state even after error
             try:
-                await asyncio.sleep(1)
                 dom_state, screenshot, elements, metadata = await self.get_updated_browser_state("click_coordinates_error_recovery")
                 return self.build_action_result(
                     False,
@@ -1046,36 +1345,12 @@ class BrowserAutomation:
             element_to_click = selector_map[action.index]
             print(f"Attempting to click element: {element_to_click}")
 
-            # Construct a more reliable selector using JavaScript evaluation
-            # Find the element based on its properties captured in selector_map
-            js_selector_script = """
-            (targetElementInfo) => {
-                const interactiveElements = Array.from(document.querySelectorAll(
-                    'a, button, input, select, textarea, [role="button"], [role="link"], [role="checkbox"], [role="radio"], [tabindex]:not([tabindex="-1"])'
-                ));
-                
-                const visibleElements = interactiveElements.filter(el => {
-                    const style = window.getComputedStyle(el);
-                    const rect = el.getBoundingClientRect();
-                    return style.display !== 'none' && style.visibility !== 'hidden' && style.opacity !== '0' && rect.width > 0 && rect.height > 0;
-                });
-
-                if (targetElementInfo.index > 0 && targetElementInfo.index <= visibleElements.length) {
-                    // Return the element at the specified index (1-based)
-                    return visibleElements[targetElementInfo.index - 1];
-                }
-                return null; // Element not found at the expected index
-            }
-            """
-            
-            element_info = {'index': action.index} # Pass the target index to the script
-            
-            target_element_handle = await page.evaluate_handle(js_selector_script, element_info)
+            target_element_handle = await self.locate_element(page, element_to_click)
 
             click_success = False
             error_message = ""
 
-            if await target_element_handle.evaluate("node => node !== null"):
+            if target_element_handle is not None:
                 try:
                     # Use Playwright's recommended way: click the handle
                     # Add timeout and wait for element to be stable
@@ -1092,15 +1367,8 @@ class BrowserAutomation:
                  print(error_message)
 
 
-            # Wait for potential page changes/network activity
-            try:
-                await page.wait_for_load_state("networkidle", timeout=5000)
-            except Exception as wait_error:
-                print(f"Timeout or error waiting for network idle after click: {wait_error}")
-            await asyncio.sleep(1)
-
-            # Get updated state after action
-            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"click_element({action.index})")
+            # Get updated state after action, once page changes/network activity have settled
+            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"click_element({action.index})", action)
 
             return self.build_action_result(
                 click_success,
@@ -1165,26 +1433,11 @@ class BrowserAutomation:
                     error=f"Element with index {action.index} not found"
                 )
             
-            # In a real implementation, we would use the selector map to get the element's
-            # properties and use them to find and type into the element
             element = selector_map[action.index]
+            await self.fill_element(page, element, action.text)
             
-            # Use CSS selector or XPath to locate and type into the element
-            await page.wait_for_timeout(500)  # Small delay before typing
-            
-            # Demo implementation - would use proper selectors in production
-            if element.attributes.get("id"):
-                await page.fill(f"#{element.attributes['id']}", action.text)
-            elif element.attributes.get("class"):
-                class_selector = f".{element.attributes['class'].replace(' ', '.')}"
-                await page.fill(class_selector, action.text)
-            else:
-                # Fallback to xpath
-                await page.fill(f"//{element.tag_name}[{action.index}]", action.text)
-            
-            await asyncio.sleep(1)
             # Get updated state after action
-            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"input_text({action.index}, '{action.text}')")
+            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"input_text({action.index}, '{action.text}')", action)
             
             return self.build_action_result(
                 True,
@@ -1214,9 +1467,8 @@ class BrowserAutomation:
             page = await self.get_current_page()
             await page.keyboard.press(action.keys)
             
-            await asyncio.sleep(1)
             # Get updated state after action
-            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"send_keys({action.keys})")
+            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"send_keys({action.keys})", action)
             
             return self.build_action_result(
                 True,
@@ -1240,6 +1492,96 @@ class BrowserAutomation:
                 content=None
             )
     
+    # Batch Actions
+    
+    async def run_batch_step(self, page: Page, step: BatchStep):
+        """Perform a single batch step without collecting browser state; raises on failure"""
+        params = step.params
+        
+        if step.action == "navigate_to":
+            await page.goto(params["url"], wait_until="domcontentloaded")
+        elif step.action == "go_back":
+            await page.go_back()
+        elif step.action == "click_coordinates":
+            await page.mouse.click(int(params["x"]), int(params["y"]))
+        elif step.action == "send_keys":
+            await page.keyboard.press(params["keys"])
+        elif step.action == "scroll_down":
+            await page.evaluate(f"window.scrollBy(0, {int(params.get('amount') or 0)} || window.innerHeight);")
+        elif step.action == "scroll_up":
+            await page.evaluate(f"window.scrollBy(0, -({int(params.get('amount') or 0)} || window.innerHeight));")
+        elif step.action == "scroll_to_text":
+            await page.get_by_text(params["text"], exact=False).first.scroll_into_view_if_needed(timeout=5000)
+        elif step.action == "wait":
+            await asyncio.sleep(min(float(params.get("seconds", 1)), 30))
+        elif step.action in ("click_element", "input_text", "select_dropdown_option"):
+            index = int(params["index"])
+            selector_map = await self.get_selector_map()
+            if index not in selector_map:
+                raise ValueError(f"Element with index {index} not found")
+            element = selector_map[index]
+            if step.action == "input_text":
+                await self.fill_element(page, element, params["text"])
+                return
+            handle = await self.locate_element(page, element)
+            if handle is None:
+                raise ValueError(f"Could not locate element with index {index}")
+            if step.action == "click_element":
+                await handle.click(timeout=5000)
+            elif element.tag_name.lower() == 'select':
+                await handle.select_option(label=params["text"])
+            else:
+                await handle.click(timeout=5000)
+                await self.wait_for_page_settle(page, SettleOptions(settle_timeout_ms=500))
+                await page.click(f"text={params['text']}", timeout=5000)
+        else:
+            raise ValueError(f"Unsupported batch action: {step.action}")
+    
+    async def batch_actions(self, action: BatchAction = Body(...)):
+        """Run an ordered list of actions and return one consolidated state at the end
+        
+        Each step settles (network idle, DOM quiet or its wait_for_selector) before the
+        next one runs. With abort_on_failure the remaining steps are skipped after the
+        first failure.
+        """
+        step_results = []
+        for number, step in enumerate(action.steps, start=1):
+            try:
+                page = await self.get_current_page()
+                await self.run_batch_step(page, step)
+                # The last step settles while the final state is collected
+                if number < len(action.steps):
+                    await self.wait_for_page_settle(page, step)
+                if step.wait_ms:
+                    await asyncio.sleep(step.wait_ms / 1000)
+                step_results.append({"step": number, "action": step.action, "success": True})
+            except Exception as e:
+                print(f"Batch step {number} ({step.action}) failed: {e}")
+                step_results.append({"step": number, "action": step.action, "success": False, "error": str(e)})
+                if action.abort_on_failure:
+                    break
+        
+        succeeded = sum(1 for result in step_results if result["success"])
+        all_succeeded = succeeded == len(action.steps)
+        message = f"Completed {succeeded} of {len(action.steps)} steps"
+        failed = next((result for result in step_results if not result["success"]), None)
+        if failed:
+            message += f"; step {failed['step']} ({failed['action']}) failed: {failed['error']}"
+        
+        last_step = action.steps[-1] if action.steps and len(step_results) == len(action.steps) else None
+        dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"batch({len(action.steps)} steps)", last_step)
+        
+        return self.build_action_result(
+            all_succeeded,
+            message,
+            dom_state,
+            screenshot,
+            elements,
+            metadata,
+            error="" if all_succeeded else message,
+            content=json.dumps(step_results)
+        )
+    
     # Tab Management Actions
     
     async def switch_tab(self, action: SwitchTabAction = Body(...)):
@@ -1295,7 +1637,6 @@ class BrowserAutomation:
             
             # Navigate to the URL
             await new_page.goto(action.url, wait_until="domcontentloaded")
-            await new_page.wait_for_load_state("networkidle", timeout=10000)
             print(f"Navigated to URL in new tab: {action.url}")
             
             # Add to page list and make it current
@@ -1304,7 +1645,7 @@ class BrowserAutomation:
             print(f"New tab added as index {self.current_page_index}")
             
             # Get updated state after action
-            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"open_tab({action.url})")
+            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"open_tab({action.url})", action)
             
             return self.build_action_result(
                 True,
@@ -1340,6 +1681,7 @@ class BrowserAutomation:
                 url = page.url
                 await page.close()
                 self.pages.pop(action.page_id)
+                self.element_indices.pop(page, None)
                 
                 # Adjust current index if needed
                 if self.current_page_index >= len(self.pages):
@@ -1432,6 +1774,68 @@ class BrowserAutomation:
                 content=None
             )
     
+    async def get_state(self, _: NoParamsAction = Body(...)):
+        """Return the full browser state, including every interactive element
+        
+        Later actions on the same page report element diffs against this state.
+        """
+        try:
+            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state("get_state", full_state=True)
+            
+            return self.build_action_result(
+                True,
+                "Retrieved full browser state",
+                dom_state,
+                screenshot,
+                elements,
+                metadata,
+                error="",
+                content=None
+            )
+        except Exception as e:
+            return self.build_action_result(
+                False,
+                str(e),
+                None,
+                "",
+                "",
+                {},
+                error=str(e),
+                content=None
+            )
+    
+    async def get_page_text(self, action: PageTextAction = Body(...)):
+        """Extract the visible page text from a screenshot using OCR
+        
+        OCR results are cached by the hash of the freshly captured screenshot, so
+        asking again for an unchanged page doesn't rerun OCR.
+        """
+        try:
+            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state("get_page_text")
+            metadata['ocr_text'] = await self.extract_ocr_text_from_screenshot(screenshot)
+            
+            return self.build_action_result(
+                True,
+                "Extracted page text from screenshot",
+                dom_state,
+                screenshot,
+                elements,
+                metadata,
+                error="",
+                content=None
+            )
+        except Exception as e:
+            return self.build_action_result(
+                False,
+                str(e),
+                None,
+                "",
+                "",
+                {},
+                error=str(e),
+                content=None
+            )
+    
     async def save_pdf(self):
         """Save the current page as a PDF"""
         try:
@@ -1481,10 +1885,8 @@ class BrowserAutomation:
                 await page.evaluate("window.scrollBy(0, window.innerHeight);")
                 amount_str = "one page"
             
-            await page.wait_for_timeout(500)  # Wait for scroll to complete
-            
             # Get updated state after action
-            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"scroll_down({amount_str})")
+            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"scroll_down({amount_str})", action)
             
             return self.build_action_result(
                 True,
@@ -1519,10 +1921,8 @@ class BrowserAutomation:
                 await page.evaluate("window.scrollBy(0, -window.innerHeight);")
                 amount_str = "one page"
             
-            await page.wait_for_timeout(500)  # Wait for scroll to complete
-            
             # Get updated state after action
-            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"scroll_up({amount_str})")
+            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"scroll_up({amount_str})", action)
             
             return self.build_action_result(
                 True,
@@ -1561,7 +1961,6 @@ class BrowserAutomation:
                 try:
                     if await locator.count() > 0 and await locator.first.is_visible():
                         await locator.first.scroll_into_view_if_needed()
-                        await asyncio.sleep(0.5)  # Wait for scroll to complete
                         found = True
                         break
                 except Exception:
@@ -1633,7 +2032,8 @@ class BrowserAutomation:
                     # For other dropdown types, try to get options using a more generic approach
                     # Example for custom dropdowns - would need refinement in real implementation
                     await page.click(f"#{element.attributes.get('id')}") if element.attributes.get('id') else None
-                    await page.wait_for_timeout(500)
+                    # Wait for the dropdown to render its options
+                    await self.wait_for_page_settle(page, SettleOptions(settle_timeout_ms=500))
                     
                     options_js = """
                     Array.from(document.querySelectorAll('.dropdown-item, [role="option"], li'))
@@ -1720,13 +2120,11 @@ class BrowserAutomation:
                 else:
                     await page.click(f"//{element.tag_name}[{index}]")
                 
-                await page.wait_for_timeout(500)
+                await self.wait_for_page_settle(page, SettleOptions(settle_timeout_ms=500))
                 
                 # Then try to click the option
                 await page.click(f"text={option_text}")
             
-            await page.wait_for_timeout(500)
-            
             # Get updated state after action
             dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"select_dropdown_option({index}, '{option_text}')")
             
@@ -1851,6 +2249,9 @@ async def health_check():
 # Include automation service router with /api prefix
 api_app.include_router(automation_service.router, prefix="/api")
 
+# Include in-place file mutation endpoints served from the same process
+api_app.include_router(file_mutation_service.router, prefix="/api")
+
 async def test_browser_api():
     """Test the browser automation API functionality"""
     try:
@@ -1885,11 +2286,12 @@ async def test_browser_api():
                 print(f"  [{el['index']}] <{el['tag_name']}> {el.get('text', '')[:30]}")
         
         # Screenshot info
-        print(f"\nScreenshot captured: {'Yes' if result.screenshot_base64 else 'No'}")
+        print(f"\nScreenshot captured: {'Yes' if result.screenshot_path else 'No'}")
         print(f"Viewport size: {result.viewport_width}x{result.viewport_height}")
         
         # Test OCR extraction from screenshot
         print("\n--- Testing OCR Text Extraction ---")
+        result = await automation_service.get_page_text(PageTextAction())
         if result.ocr_text:
             print("OCR text extracted from screenshot:")
             print("=== OCR TEXT START ===")
@@ -2019,7 +2421,7 @@ async def test_browser_api_2():
                 print(f"  [{el['index']}] <{el['tag_name']}> {el.get('text', '')[:30]}")
         
         # Screenshot info
-        print(f"\nScreenshot captured: {'Yes' if result.screenshot_base64 else 'No'}")
+        print(f"\nScreenshot captured: {'Yes' if result.screenshot_path else 'No'}")
         print(f"Viewport size: {result.viewport_width}x{result.viewport_height}")
         
         await asyncio.sleep(2)
@@ -0,0 +1,240 @@
+from fastapi import APIRouter
+from pydantic import BaseModel
+from typing import Optional, List, Tuple
+import difflib
+import hashlib
+import logging
+import os
+import re
+import tempfile
+
+#######################################################
+# Request model definitions
+#######################################################
+
+WORKSPACE_DIR = "/workspace"
+
+class StrReplaceRequest(BaseModel):
+    path: str
+    old_str: str
+    new_str: str
+
+class EditOperation(BaseModel):
+    old_str: str
+    new_str: str
+
+class MultiEditRequest(BaseModel):
+    path: str
+    edits: List[EditOperation]
+
+class PatchRequest(BaseModel):
+    path: str
+    diff: str
+
+#######################################################
+# File Mutation Result Model
+#######################################################
+
+class FileMutationResult(BaseModel):
+    success: bool = True
+    message: str = ""
+    error: str = ""
+    path: Optional[str] = None
+    sha256: Optional[str] = None  # Hash of the file content after the mutation
+    size: Optional[int] = None
+    diff: Optional[str] = None  # Unified diff of the change, truncated to MAX_DIFF_LINES
+    first_changed_line: Optional[int] = None  # 1-based line number of the first change
+
+class FileMutationError(Exception):
+    """Raised when an edit cannot be applied to the current file content."""
+
+#######################################################
+# Unified diff application
+#######################################################
+
+_HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+def _parse_hunks(diff: str) -> List[Tuple[int, List[str], List[str]]]:
+    """Parse a unified diff into (old_start, old_lines, new_lines) hunks for a single file."""
+    hunks = []
+    current = None
+    for line in diff.splitlines():
+        if line.startswith(("--- ", "+++ ", "diff ", "index ")) and current is None:
+            continue
+        match = _HUNK_HEADER_RE.match(line)
+        if match:
+            current = (int(match.group(1)), [], [])
+            hunks.append(current)
+            continue
+        if current is None:
+            continue
+        if line.startswith("\\"):  # "\ No newline at end of file"
+            continue
+        tag, text = (line[0], line[1:]) if line else (" ", "")
+        if tag == " ":
+            current[1].append(text)
+            current[2].append(text)
+        elif tag == "-":
+            current[1].append(text)
+        elif tag == "+":
+            current[2].append(text)
+        else:
+            raise FileMutationError(f"Invalid diff line: {line!r}")
+    if not hunks:
+        raise FileMutationError("Diff contains no hunks")
+    return hunks
+
+def apply_unified_diff(content: str, diff: str) -> str:
+    """Apply a unified diff to `content`, tolerating hunks that moved by a few lines."""
+    lines = content.split("\n")
+    offset = 0
+    for old_start, old_lines, new_lines in _parse_hunks(diff):
+        expected = max(old_start - 1, 0) + offset
+        position = None
+        # Search outwards from the expected position for the hunk's context
+        for distance in range(len(lines) + 1):
+            for candidate in (expected - distance, expected + distance):
+                if 0 <= candidate <= len(lines) - len(old_lines) and lines[candidate:candidate + len(old_lines)] == old_lines:
+                    position = candidate
+                    break
+            if position is not None:
+                break
+        if position is None:
+            raise FileMutationError(f"Hunk starting at line {old_start} does not match the file content")
+        lines[position:position + len(old_lines)] = new_lines
+        offset = position - max(old_start - 1, 0) + len(new_lines) - len(old_lines)
+    return "\n".join(lines)
+
+#######################################################
+# File Mutation Implementation
+#######################################################
+
+class FileMutationService:
+    """Applies edits to workspace files in place so callers never transfer whole files.
+
+    Handlers are plain functions so FastAPI runs their file IO in its threadpool
+    instead of blocking the event loop shared with browser automation.
+    """
+
+    MAX_DIFF_LINES = 60
+
+    def __init__(self):
+        self.router = APIRouter()
+        self.logger = logging.getLogger("file_mutation")
+
+        self.router.post("/files/str_replace")(self.str_replace)
+        self.router.post("/files/multi_edit")(self.multi_edit)
+        self.router.post("/files/apply_patch")(self.apply_patch)
+
+    def _resolve_path(self, path: str) -> str:
+        """Resolve a workspace-relative or absolute path, refusing paths outside the workspace."""
+        full_path = os.path.realpath(os.path.join(WORKSPACE_DIR, path.lstrip("/").removeprefix("workspace/")))
+        if full_path != WORKSPACE_DIR and not full_path.startswith(WORKSPACE_DIR + "/"):
+            raise FileMutationError(f"Path '{path}' is outside of {WORKSPACE_DIR}")
+        if not os.path.isfile(full_path):
+            raise FileMutationError(f"File '{path}' does not exist")
+        return full_path
+
+    def _read(self, full_path: str) -> str:
+        with open(full_path, "r", encoding="utf-8", newline="") as f:
+            return f.read()
+
+    def _write_atomic(self, full_path: str, content: str) -> bytes:
+        """Write through a temp file in the same directory and rename it over the original."""
+        data = content.encode("utf-8")
+        mode = os.stat(full_path).st_mode
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(full_path), prefix=".tmp-edit-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, full_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return data
+
+    def _replace_once(self, content: str, old_str: str, new_str: str) -> str:
+        occurrences = content.count(old_str)
+        if occurrences == 0:
+            raise FileMutationError(f"String '{old_str}' not found in file")
+        if occurrences > 1:
+            lines = [i + 1 for i, line in enumerate(content.split('\n')) if old_str in line]
+            raise FileMutationError(f"Multiple occurrences found in lines {lines}. Please ensure string is unique")
+        return content.replace(old_str, new_str)
+
+    def _commit(self, path: str, full_path: str, old_content: str, new_content: str, message: str) -> FileMutationResult:
+        """Persist the new content and describe the change with a short diff."""
+        data = self._write_atomic(full_path, new_content)
+        diff_lines = list(difflib.unified_diff(
+            old_content.split("\n"), new_content.split("\n"),
+            fromfile=path, tofile=path, lineterm="", n=2
+        ))
+        first_changed_line = None
+        for line in diff_lines:
+            match = _HUNK_HEADER_RE.match(line)
+            if match:
+                first_changed_line = int(match.group(3))
+                break
+        if len(diff_lines) > self.MAX_DIFF_LINES:
+            omitted = len(diff_lines) - self.MAX_DIFF_LINES
+            diff_lines = diff_lines[:self.MAX_DIFF_LINES] + [f"... ({omitted} more diff lines)"]
+        return FileMutationResult(
+            success=True,
+            message=message,
+            path=path,
+            sha256=hashlib.sha256(data).hexdigest(),
+            size=len(data),
+            diff="\n".join(diff_lines),
+            first_changed_line=first_changed_line
+        )
+
+    def str_replace(self, request: StrReplaceRequest) -> FileMutationResult:
+        """Replace a string that must appear exactly once in the file"""
+        try:
+            full_path = self._resolve_path(request.path)
+            content = self._read(full_path)
+            new_content = self._replace_once(content, request.old_str, request.new_str)
+            return self._commit(request.path, full_path, content, new_content, "Replacement successful.")
+        except (FileMutationError, UnicodeDecodeError) as e:
+            return FileMutationResult(success=False, error=str(e), path=request.path)
+        except Exception as e:
+            self.logger.error(f"str_replace failed for {request.path}: {e}")
+            return FileMutationResult(success=False, error=f"Error replacing string: {e}", path=request.path)
+
+    def multi_edit(self, request: MultiEditRequest) -> FileMutationResult:
+        """Apply an ordered batch of unique-string replacements; nothing is written if any edit fails"""
+        try:
+            full_path = self._resolve_path(request.path)
+            content = self._read(full_path)
+            new_content = content
+            for i, edit in enumerate(request.edits):
+                try:
+                    new_content = self._replace_once(new_content, edit.old_str, edit.new_str)
+                except FileMutationError as e:
+                    raise FileMutationError(f"Edit {i + 1} of {len(request.edits)}: {e}")
+            return self._commit(request.path, full_path, content, new_content, f"Applied {len(request.edits)} edits.")
+        except (FileMutationError, UnicodeDecodeError) as e:
+            return FileMutationResult(success=False, error=str(e), path=request.path)
+        except Exception as e:
+            self.logger.error(f"multi_edit failed for {request.path}: {e}")
+            return FileMutationResult(success=False, error=f"Error editing file: {e}", path=request.path)
+
+    def apply_patch(self, request: PatchRequest) -> FileMutationResult:
+        """Apply a single-file unified diff; nothing is written if any hunk fails"""
+        try:
+            full_path = self._resolve_path(request.path)
+            content = self._read(full_path)
+            new_content = apply_unified_diff(content, request.diff)
+            return self._commit(request.path, full_path, content, new_content, "Patch applied successfully.")
+        except (FileMutationError, UnicodeDecodeError) as e:
+            return FileMutationResult(success=False, error=str(e), path=request.path)
+        except Exception as e:
+            self.logger.error(f"apply_patch failed for {request.path}: {e}")
+            return FileMutationResult(success=False, error=f"Error applying patch: {e}", path=request.path)
+
+# Create singleton instance
+file_mutation_service = FileMutationService()
@@ -0,0 +1,294 @@
+"""
+Batched file transfer between the backend and a Daytona sandbox.
+
+Instead of one upload/download round trip per file (plus a directory listing to
+verify each upload), files are packed into a single tar archive, moved with one
+filesystem call and unpacked/packed inside the sandbox with a single exec. Each
+exec also returns sha256 hashes of the transferred files, which are used to
+verify the transfer.
+
+Transfers are split into archives of at most MAX_BATCH_BYTES. Upload archives are
+built in a temporary file rather than in memory, and files larger than the limit
+are uploaded in parts and joined inside the sandbox, so at most one batch is held
+in memory at a time.
+"""
+
+import base64
+import hashlib
+import io
+import os
+import shlex
+import tarfile
+import tempfile
+import time
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+from uuid import uuid4
+
+from daytona_sdk import AsyncSandbox
+
+from utils.logger import logger
+
+# Raw bytes packed into a single archive, and the part size for larger files; bigger
+# transfers are split so memory stays bounded
+MAX_BATCH_BYTES = 32 * 1024 * 1024
+# Chunk size used when hashing file objects
+HASH_CHUNK_SIZE = 1024 * 1024
+
+FileSource = Union[bytes, BinaryIO]
+
+
+class FileTransferError(Exception):
+    """Raised when a batched transfer command fails inside the sandbox."""
+
+
+async def _run_script(sandbox: AsyncSandbox, script: str, timeout: int = 300):
+    """Run a shell script in the sandbox without having to escape it for the exec command line."""
+    encoded = base64.b64encode(script.encode()).decode()
+    return await sandbox.process.exec(f"/bin/sh -c \"echo {encoded} | base64 -d | /bin/sh\"", timeout=timeout)
+
+
+def _parse_sha256sum(output: str) -> Dict[str, str]:
+    """Parse `sha256sum` output into a path -> hash map."""
+    hashes = {}
+    for line in output.splitlines():
+        digest, _, path = line.strip().partition("  ")
+        if len(digest) == 64 and path:
+            hashes[path] = digest
+    return hashes
+
+
+def _source_size(source: FileSource) -> int:
+    if isinstance(source, bytes):
+        return len(source)
+    position = source.tell()
+    source.seek(0, io.SEEK_END)
+    size = source.tell() - position
+    source.seek(position)
+    return size
+
+
+def _hash_source(source: FileSource) -> str:
+    """Hash a file without loading file objects into memory; file objects are rewound afterwards."""
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    position = source.tell()
+    for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    source.seek(position)
+    return digest.hexdigest()
+
+
+def _batch_files(
+    files: List[Tuple[str, FileSource]]
+) -> Tuple[List[List[Tuple[str, FileSource, int]]], List[Tuple[str, FileSource, int]]]:
+    """Group files into batches of at most MAX_BATCH_BYTES.
+
+    Files larger than MAX_BATCH_BYTES are returned separately, to be uploaded in parts.
+    """
+    batches: List[List[Tuple[str, FileSource, int]]] = []
+    large: List[Tuple[str, FileSource, int]] = []
+    current: List[Tuple[str, FileSource, int]] = []
+    current_size = 0
+    for path, source in files:
+        size = _source_size(source)
+        if size > MAX_BATCH_BYTES:
+            large.append((path, source, size))
+            continue
+        if current and current_size + size > MAX_BATCH_BYTES:
+            batches.append(current)
+            current, current_size = [], 0
+        current.append((path, source, size))
+        current_size += size
+    if current:
+        batches.append(current)
+    return batches, large
+
+
+async def _upload_in_parts(sandbox: AsyncSandbox, path: str, source: FileSource, size: int) -> Dict[str, object]:
+    """Upload a file larger than MAX_BATCH_BYTES as parts of that size and join them in the sandbox."""
+    digest = _hash_source(source)
+    view = memoryview(source) if isinstance(source, bytes) else None
+    position = source.tell() if view is None else 0
+    prefix = f"/tmp/upload-{uuid4().hex}"
+    parts = []
+    try:
+        for offset in range(0, size, MAX_BATCH_BYTES):
+            chunk = bytes(view[offset:offset + MAX_BATCH_BYTES]) if view is not None else source.read(MAX_BATCH_BYTES)
+            part_path = f"{prefix}.part{len(parts)}"
+            parts.append(part_path)
+            await sandbox.fs.upload_file(chunk, part_path)
+    except Exception:
+        await _run_script(sandbox, f"rm -f {prefix}.part*", timeout=30)
+        raise
+    finally:
+        if view is None:
+            source.seek(position)
+
+    quoted_path = shlex.quote(path)
+    response = await _run_script(
+        sandbox,
+        f"mkdir -p {shlex.quote(os.path.dirname(path) or '/')} && cat {' '.join(parts)} > {quoted_path} ; "
+        f"status=$? ; rm -f {' '.join(parts)} ; "
+        f"[ $status -eq 0 ] && chmod 644 {quoted_path} && sha256sum -- {quoted_path}"
+    )
+    if response.exit_code != 0:
+        raise FileTransferError(f"Joining upload parts of {path} failed: {response.result}")
+    verified = _parse_sha256sum(response.result).get(path) == digest
+    if not verified:
+        logger.warning(f"Upload verification failed for {path} in sandbox {sandbox.id}")
+    return {"size": size, "sha256": digest, "verified": verified}
+
+
+async def upload_files(
+    sandbox: AsyncSandbox,
+    files: List[Tuple[str, FileSource]],
+    compress: bool = False
+) -> Dict[str, Dict[str, object]]:
+    """Upload many files to absolute sandbox paths using one archive per batch.
+
+    Args:
+        sandbox: Sandbox to upload to
+        files: (absolute target path, content) pairs; content is bytes or a binary file object
+        compress: Gzip the archive, worthwhile for text-heavy uploads over slow links
+
+    Returns:
+        Manifest mapping each target path to its size, sha256 and whether the hash
+        computed inside the sandbox after extraction matches the source.
+    """
+    manifest: Dict[str, Dict[str, object]] = {}
+    batches, large_files = _batch_files(files)
+    for batch in batches:
+        expected = {}
+        archive_options = {"mode": "w:gz", "compresslevel": 1} if compress else {"mode": "w"}
+        # The archive is written to disk and read back once, as the sandbox API takes bytes
+        with tempfile.TemporaryFile() as archive_file:
+            with tarfile.open(fileobj=archive_file, **archive_options) as archive:
+                for path, source, size in batch:
+                    expected[path] = (_hash_source(source), size)
+                    info = tarfile.TarInfo(name=path.lstrip("/"))
+                    info.size = size
+                    info.mode = 0o644
+                    info.mtime = int(time.time())
+                    archive.addfile(info, io.BytesIO(source) if isinstance(source, bytes) else source)
+            archive_file.seek(0)
+            archive_bytes = archive_file.read()
+
+        archive_path = f"/tmp/upload-{uuid4().hex}.tar{'.gz' if compress else ''}"
+        await sandbox.fs.upload_file(archive_bytes, archive_path)
+        del archive_bytes
+
+        quoted_paths = " ".join(shlex.quote(path) for path in expected)
+        response = await _run_script(
+            sandbox,
+            f"tar -x{'z' if compress else ''}f {archive_path} -C / ; status=$? ; rm -f {archive_path} ; "
+            f"[ $status -eq 0 ] && sha256sum -- {quoted_paths}"
+        )
+        if response.exit_code != 0:
+            raise FileTransferError(f"Extracting upload archive failed: {response.result}")
+
+        remote_hashes = _parse_sha256sum(response.result)
+        for path, (digest, size) in expected.items():
+            verified = remote_hashes.get(path) == digest
+            if not verified:
+                logger.warning(f"Upload verification failed for {path} in sandbox {sandbox.id}")
+            manifest[path] = {"size": size, "sha256": digest, "verified": verified}
+
+    for path, source, size in large_files:
+        manifest[path] = await _upload_in_parts(sandbox, path, source, size)
+
+    logger.debug(
+        f"Uploaded {len(manifest)} files to sandbox {sandbox.id} in {len(batches)} archives "
+        f"and {len(large_files)} multi-part uploads"
+    )
+    return manifest
+
+
+async def create_archive(
+    sandbox: AsyncSandbox,
+    paths: List[str],
+    compress: bool = True
+) -> Tuple[bytes, Dict[str, str]]:
+    """Pack files or directories from the sandbox into one archive and download it.
+
+    Returns:
+        The archive bytes (member names are relative to /) and the sha256 of every
+        requested regular file that exists. Missing paths are skipped.
+    """
+    archive_path = f"/tmp/download-{uuid4().hex}.tar{'.gz' if compress else ''}"
+    members = " ".join(shlex.quote(path.lstrip("/")) for path in paths)
+    response = await _run_script(
+        sandbox,
+        f"cd / && sha256sum -- {members} 2>/dev/null ; "
+        f"tar -c{'z' if compress else ''}f {archive_path} --ignore-failed-read -- {members} 2>/dev/null ; true"
+    )
+    hashes = {f"/{path}": digest for path, digest in _parse_sha256sum(response.result).items()}
+    try:
+        content = await sandbox.fs.download_file(archive_path)
+    finally:
+        await _run_script(sandbox, f"rm -f {archive_path}", timeout=30)
+    return content, hashes
+
+
+async def download_files(
+    sandbox: AsyncSandbox,
+    paths: List[str],
+    compress: bool = True,
+    max_file_size: Optional[int] = None
+) -> Dict[str, bytes]:
+    """Download many files (or the files inside directories) from absolute sandbox paths.
+
+    The files are listed, hashed and packed inside the sandbox with a single exec, into
+    archives of at most MAX_BATCH_BYTES of content that are downloaded and unpacked one
+    at a time. Files larger than `max_file_size` are left out inside the sandbox, and
+    files whose content does not match the hash computed there are dropped.
+    """
+    if not paths:
+        return {}
+    prefix = f"/tmp/download-{uuid4().hex}"
+    extension = ".tar.gz" if compress else ".tar"
+    members = " ".join(shlex.quote(path.lstrip("/")) for path in paths)
+    size_filter = f" -size -{max_file_size + 1}c" if max_file_size is not None else ""
+    # Start a new archive whenever the next file would push the current one past the
+    # limit; a single larger file still gets an archive of its own
+    split_lists = (
+        f"awk -v max={MAX_BATCH_BYTES} -v prefix={prefix} "
+        "'{ size = $1; name = substr($0, length($1) + 2); "
+        "if (count == 0 || (total + size > max && files > 0)) { count++; total = 0; files = 0 } "
+        "total += size; files++; print name > (prefix \".\" count \".list\") } "
+        "END { print \"archives:\" count + 0 }' "
+        f"{prefix}.sizes"
+    )
+    response = await _run_script(
+        sandbox,
+        f"cd / && find {members} -type f{size_filter} -exec stat -c '%s %n' {{}} + 2>/dev/null > {prefix}.sizes ; "
+        f"cut -d ' ' -f 2- {prefix}.sizes | tr '\\n' '\\0' | xargs -0 -r sha256sum -- ; "
+        f"{split_lists} ; "
+        f"for list in {prefix}.*.list ; do [ -f \"$list\" ] && "
+        f"tar -c{'z' if compress else ''}f \"${{list%.list}}{extension}\" --ignore-failed-read -T \"$list\" 2>/dev/null ; done ; true"
+    )
+    hashes = {f"/{path}": digest for path, digest in _parse_sha256sum(response.result).items()}
+    archive_count = 0
+    for line in response.result.splitlines():
+        if line.startswith("archives:"):
+            archive_count = int(line.partition(":")[2] or 0)
+
+    files: Dict[str, bytes] = {}
+    try:
+        for index in range(1, archive_count + 1):
+            content = await sandbox.fs.download_file(f"{prefix}.{index}{extension}")
+            with tarfile.open(fileobj=io.BytesIO(content), mode="r|*") as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    path = f"/{member.name}"
+                    data = archive.extractfile(member).read()
+                    expected = hashes.get(path)
+                    if expected and expected != hashlib.sha256(data).hexdigest():
+                        logger.warning(f"Download verification failed for {path} in sandbox {sandbox.id}")
+                        continue
+                    files[path] = data
+            del content
+    finally:
+        await _run_script(sandbox, f"rm -f {prefix}.*", timeout=30)
+    return files
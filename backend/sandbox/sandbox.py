@@ -1,5 +1,10 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
 from daytona_sdk import AsyncDaytona, DaytonaConfig, CreateSandboxFromImageParams, AsyncSandbox, SessionExecuteRequest, Resources, SandboxState
 from dotenv import load_dotenv
+from services import redis
 from utils.logger import logger
 from utils.config import config
 from utils.config import Configuration
@@ -30,17 +35,66 @@ else:
 
 daytona = AsyncDaytona(daytona_config)
 
+# Resolved sandbox state is shared across workers through Redis. Keep the TTL well
+# below the sandbox auto-stop interval so a sandbox stopped by Daytona is noticed quickly.
+SANDBOX_STATE_TTL = 30
+SANDBOX_STATE_KEY = "sandbox_state:{sandbox_id}"
+
+# Sandbox handles can't be shared through Redis, so each worker keeps its own, for
+# the most recently used sandboxes and no longer than their auto-stop interval
+SANDBOX_HANDLE_TTL = 15 * 60
+SANDBOX_HANDLE_MAX_ENTRIES = 256
+_sandbox_handles: "OrderedDict[str, Tuple[AsyncSandbox, float]]" = OrderedDict()
+
+async def _get_cached_state(sandbox_id: str) -> Optional[str]:
+    try:
+        return await redis.get(SANDBOX_STATE_KEY.format(sandbox_id=sandbox_id))
+    except Exception as e:
+        logger.warning(f"Failed to read cached state for sandbox {sandbox_id}: {str(e)}")
+        return None
+
+async def _cache_sandbox(sandbox: AsyncSandbox):
+    """Remember the sandbox handle and share its current state with other workers."""
+    _sandbox_handles[sandbox.id] = (sandbox, time.monotonic() + SANDBOX_HANDLE_TTL)
+    _sandbox_handles.move_to_end(sandbox.id)
+    while len(_sandbox_handles) > SANDBOX_HANDLE_MAX_ENTRIES:
+        _sandbox_handles.popitem(last=False)
+    state = sandbox.state.value if isinstance(sandbox.state, SandboxState) else str(sandbox.state)
+    try:
+        await redis.set(SANDBOX_STATE_KEY.format(sandbox_id=sandbox.id), state, ex=SANDBOX_STATE_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to cache state for sandbox {sandbox.id}: {str(e)}")
+
+async def invalidate_sandbox_state(sandbox_id: str):
+    """Drop the cached handle and state so the next lookup goes to Daytona."""
+    _sandbox_handles.pop(sandbox_id, None)
+    try:
+        await redis.delete(SANDBOX_STATE_KEY.format(sandbox_id=sandbox_id))
+    except Exception as e:
+        logger.warning(f"Failed to invalidate cached state for sandbox {sandbox_id}: {str(e)}")
+
 async def get_or_start_sandbox(sandbox_id: str) -> AsyncSandbox:
     """Retrieve a sandbox by ID, check its state, and start it if needed."""
     
     logger.info(f"Getting or starting sandbox with ID: {sandbox_id}")
 
+    # A sandbox recently seen running by any worker doesn't need another state check
+    entry = _sandbox_handles.get(sandbox_id)
+    if entry is not None and time.monotonic() >= entry[1]:
+        del _sandbox_handles[sandbox_id]
+        entry = None
+    if entry is not None and await _get_cached_state(sandbox_id) == SandboxState.STARTED.value:
+        logger.debug(f"Using cached handle for running sandbox {sandbox_id}")
+        _sandbox_handles.move_to_end(sandbox_id)
+        return entry[0]
+
     try:
         sandbox = await daytona.get(sandbox_id)
         
         # Check if sandbox needs to be started
         if sandbox.state == SandboxState.ARCHIVED or sandbox.state == SandboxState.STOPPED:
             logger.info(f"Sandbox is in {sandbox.state} state. Starting...")
+            await invalidate_sandbox_state(sandbox_id)
             try:
                 await daytona.start(sandbox)
                 # Wait a moment for the sandbox to initialize
@@ -54,6 +108,7 @@ async def get_or_start_sandbox(sandbox_id: str) -> AsyncSandbox:
                 logger.error(f"Error starting sandbox: {e}")
                 raise e
         
+        await _cache_sandbox(sandbox)
         logger.info(f"Sandbox {sandbox_id} is ready")
         return sandbox
         
@@ -135,6 +190,7 @@ async def delete_sandbox(sandbox_id: str) -> bool:
         
         # Delete the sandbox
         await daytona.delete(sandbox)
+        await invalidate_sandbox_state(sandbox_id)
         
         logger.info(f"Successfully deleted sandbox {sandbox_id}")
         return True
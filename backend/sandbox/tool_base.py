@@ -1,4 +1,9 @@
-from typing import Optional
+import asyncio
+import json
+from uuid import uuid4
+from typing import Optional, Dict, Any, Tuple
+
+import aiohttp
 
 from agentpress.thread_manager import ThreadManager
 from agentpress.tool import Tool
@@ -7,11 +12,33 @@ from sandbox.sandbox import get_or_start_sandbox
 from utils.logger import logger
 from utils.files_utils import clean_path
 
+# Shared keep-alive HTTP session for calls to in-sandbox API servers through their
+# preview links, and the resolved (url, token) per sandbox
+_api_session: Optional[aiohttp.ClientSession] = None
+_api_endpoints: Dict[str, Tuple[str, Optional[str]]] = {}
+
+class SandboxChannelUnavailable(Exception):
+    """Raised when the in-sandbox API server can't be reached through the preview link."""
+
+class SandboxApiError(Exception):
+    """Raised when a request to the in-sandbox API server failed after it may have reached it."""
+
+def _get_api_session() -> aiohttp.ClientSession:
+    global _api_session
+    if _api_session is None or _api_session.closed:
+        _api_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=16, keepalive_timeout=60)
+        )
+    return _api_session
+
 class SandboxToolsBase(Tool):
     """Base class for all sandbox tools that provides project-based sandbox access."""
     
     # Class variable to track if sandbox URLs have been printed
     _urls_printed = False
+
+    # Port of the in-sandbox API server (browser automation and file mutation endpoints)
+    SANDBOX_API_PORT = 8003
     
     def __init__(self, project_id: str, thread_manager: Optional[ThreadManager] = None):
         super().__init__()
@@ -21,6 +48,7 @@ class SandboxToolsBase(Tool):
         self._sandbox = None
         self._sandbox_id = None
         self._sandbox_pass = None
+        self._api_channel_available = True
 
     async def _ensure_sandbox(self) -> AsyncSandbox:
         """Ensure we have a valid sandbox instance, retrieving it from the project if needed."""
@@ -81,6 +109,138 @@ class SandboxToolsBase(Tool):
             raise RuntimeError("Sandbox ID not initialized. Call _ensure_sandbox() first.")
         return self._sandbox_id
 
+    async def _get_api_endpoint(self) -> Tuple[str, Optional[str]]:
+        """Resolve the preview URL and access token of the in-sandbox API server."""
+        endpoint = _api_endpoints.get(self.sandbox_id)
+        if endpoint is None:
+            preview_link = await self.sandbox.get_preview_link(self.SANDBOX_API_PORT)
+            url = preview_link.url if hasattr(preview_link, 'url') else str(preview_link)
+            endpoint = (url.rstrip('/'), getattr(preview_link, 'token', None))
+            _api_endpoints[self.sandbox_id] = endpoint
+        return endpoint
+
+    async def _post_over_channel(self, endpoint: str, payload: Dict[str, Any], timeout: int, raise_errors: bool = False) -> Optional[Dict[str, Any]]:
+        """POST to the in-sandbox API server over the shared keep-alive HTTP session.
+
+        Raises SandboxChannelUnavailable if the preview link can't be connected to or
+        rejects the request, in which case nothing reached the API server. Returns None
+        if the API server doesn't serve the endpoint; other failures return None too,
+        or raise SandboxApiError when `raise_errors` is set.
+        """
+        try:
+            base_url, token = await self._get_api_endpoint()
+        except Exception as e:
+            raise SandboxChannelUnavailable(f"failed to resolve preview link: {str(e)}") from e
+        headers = {"X-Daytona-Preview-Token": token} if token else {}
+        try:
+            response = await _get_api_session().post(
+                f"{base_url}/api/{endpoint}",
+                json=payload,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            )
+        except aiohttp.ClientConnectorError as e:
+            raise SandboxChannelUnavailable(str(e)) from e
+        async with response:
+            # Authentication errors come from the preview proxy, not the API server
+            if response.status in (401, 403):
+                raise SandboxChannelUnavailable(f"preview link rejected the request (HTTP {response.status})")
+            if response.status in (404, 405):
+                logger.debug(f"Sandbox API {endpoint} not served (HTTP {response.status})")
+                return None
+            if response.status >= 400:
+                logger.debug(f"Sandbox API {endpoint} returned HTTP {response.status}")
+                if raise_errors:
+                    raise SandboxApiError(f"sandbox API {endpoint} returned HTTP {response.status}")
+                return None
+            try:
+                return await response.json(content_type=None)
+            except json.JSONDecodeError:
+                logger.warning(f"Invalid JSON response from sandbox API {endpoint}")
+                if raise_errors:
+                    raise SandboxApiError(f"invalid JSON response from sandbox API {endpoint}")
+                return None
+
+    async def _exec_sandbox_api(self, endpoint: str, payload: Dict[str, Any], timeout: int, raise_errors: bool = False) -> Optional[Dict[str, Any]]:
+        """POST to the in-sandbox API server with curl through process exec.
+
+        The payload is uploaded to a temporary file first, so large payloads never hit
+        the command line length limit and need no shell escaping. The HTTP status is
+        appended to the output so a missing endpoint can be told apart from a failure.
+        """
+        payload_path = f"/tmp/sandbox-api-{uuid4().hex}.json"
+        try:
+            await self.sandbox.fs.upload_file(json.dumps(payload).encode(), payload_path)
+        except Exception as e:
+            logger.warning(f"Failed to upload payload for sandbox API {endpoint}: {str(e)}")
+            if raise_errors:
+                raise SandboxApiError(f"failed to upload payload for sandbox API {endpoint}: {str(e)}") from e
+            return None
+        url = f"http://localhost:{self.SANDBOX_API_PORT}/api/{endpoint}"
+        command = (
+            f"curl -s -X POST '{url}' -H 'Content-Type: application/json' "
+            f"--data-binary @{payload_path} -w '\\n%{{http_code}}'"
+        )
+        try:
+            response = await self.sandbox.process.exec(command, timeout=timeout)
+        finally:
+            try:
+                await self.sandbox.fs.delete_file(payload_path)
+            except Exception as e:
+                logger.debug(f"Failed to remove sandbox API payload {payload_path}: {str(e)}")
+        # curl exit code 7: nothing is listening, i.e. the sandbox runs no API server
+        if response.exit_code == 7:
+            logger.debug(f"Sandbox API {endpoint} unavailable (no API server)")
+            return None
+        body, _, status = (response.result or "").rpartition("\n")
+        status = status.strip()
+        if status in ("404", "405"):
+            logger.debug(f"Sandbox API {endpoint} not served (HTTP {status})")
+            return None
+        if response.exit_code != 0 or not status.startswith("2"):
+            logger.debug(f"Sandbox API {endpoint} failed (exit code {response.exit_code}, HTTP {status or 'n/a'})")
+            if raise_errors:
+                raise SandboxApiError(f"sandbox API {endpoint} failed (exit code {response.exit_code}, HTTP {status or 'n/a'})")
+            return None
+        try:
+            return json.loads(body)
+        except json.JSONDecodeError:
+            logger.warning(f"Invalid JSON response from sandbox API {endpoint}")
+            if raise_errors:
+                raise SandboxApiError(f"invalid JSON response from sandbox API {endpoint}")
+            return None
+
+    async def _call_sandbox_api(self, endpoint: str, payload: Dict[str, Any], timeout: int = 30, raise_errors: bool = False) -> Optional[Dict[str, Any]]:
+        """POST a JSON payload to the in-sandbox API server and return the parsed response.
+
+        Requests go over a persistent HTTP connection through the sandbox preview link;
+        if that channel can't be reached, this tool falls back to curl over process exec.
+        Returns None if the endpoint is unavailable, e.g. on sandboxes built from an
+        older image. Other failures (timeouts, server errors) also return None unless
+        `raise_errors` is set, in which case they raise SandboxApiError; use it for
+        requests that must not be repeated by another route.
+        """
+        if self._api_channel_available:
+            try:
+                return await self._post_over_channel(endpoint, payload, timeout, raise_errors)
+            except SandboxChannelUnavailable as e:
+                logger.info(f"Sandbox API channel unreachable, falling back to exec: {str(e)}")
+                self._api_channel_available = False
+                _api_endpoints.pop(self.sandbox_id, None)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # The request may already have been applied, so it isn't retried over exec
+                logger.warning(f"Sandbox API request {endpoint} failed: {str(e)}")
+                if raise_errors:
+                    raise SandboxApiError(f"sandbox API request {endpoint} failed: {str(e) or type(e).__name__}") from e
+                return None
+        return await self._exec_sandbox_api(endpoint, payload, timeout, raise_errors)
+
+    def _publish_progress(self, content: Dict[str, Any]) -> None:
+        """Stream a transient progress event for the running tool call to the client."""
+        if self.thread_manager is None:
+            return
+        self.thread_manager.response_processor.publish_tool_progress(content)
+
     def clean_path(self, path: str) -> str:
         """Clean and normalize a path to be relative to /workspace."""
         cleaned_path = clean_path(path, self.workspace_path)
@@ -0,0 +1,12 @@
+-- Migration: Private storage bucket for image context
+-- Images the agent asks to see are stored here instead of as base64 in
+-- messages.content; the image_context message only keeps a reference and
+-- the backend hands out short-lived signed URLs
+
+BEGIN;
+
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('image-context', 'image-context', false)
+ON CONFLICT (id) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,102 @@
+BEGIN;
+
+-- Creates an agent installed from a template together with its first version and
+-- bumps the template's download count, all in one transaction. The account is trusted
+-- as given, so only the backend (service role) may call it.
+CREATE OR REPLACE FUNCTION install_template_agent(
+    p_template_id UUID,
+    p_account_id UUID,
+    p_name TEXT,
+    p_description TEXT,
+    p_system_prompt TEXT,
+    p_configured_mcps JSONB,
+    p_custom_mcps JSONB,
+    p_agentpress_tools JSONB,
+    p_avatar TEXT,
+    p_avatar_color TEXT
+)
+RETURNS JSONB
+SECURITY DEFINER
+SET search_path = public
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_agent_id UUID;
+    v_version_id UUID;
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM agent_templates
+        WHERE template_id = p_template_id
+        AND (is_public = TRUE OR creator_id = p_account_id)
+    ) THEN
+        RAISE EXCEPTION 'Template not found or access denied';
+    END IF;
+
+    INSERT INTO agents (
+        account_id,
+        name,
+        description,
+        system_prompt,
+        configured_mcps,
+        custom_mcps,
+        agentpress_tools,
+        is_default,
+        avatar,
+        avatar_color
+    ) VALUES (
+        p_account_id,
+        p_name,
+        p_description,
+        p_system_prompt,
+        COALESCE(p_configured_mcps, '[]'::jsonb),
+        COALESCE(p_custom_mcps, '[]'::jsonb),
+        COALESCE(p_agentpress_tools, '{}'::jsonb),
+        FALSE,
+        p_avatar,
+        p_avatar_color
+    ) RETURNING agent_id INTO v_agent_id;
+
+    INSERT INTO agent_versions (
+        agent_id,
+        version_number,
+        version_name,
+        system_prompt,
+        configured_mcps,
+        custom_mcps,
+        agentpress_tools,
+        is_active,
+        created_by
+    ) VALUES (
+        v_agent_id,
+        1,
+        'v1',
+        p_system_prompt,
+        COALESCE(p_configured_mcps, '[]'::jsonb),
+        COALESCE(p_custom_mcps, '[]'::jsonb),
+        COALESCE(p_agentpress_tools, '{}'::jsonb),
+        TRUE,
+        p_account_id
+    ) RETURNING version_id INTO v_version_id;
+
+    UPDATE agents
+    SET current_version_id = v_version_id,
+        version_count = 1
+    WHERE agent_id = v_agent_id;
+
+    UPDATE agent_templates
+    SET download_count = COALESCE(download_count, 0) + 1
+    WHERE template_id = p_template_id;
+
+    RETURN jsonb_build_object(
+        'agent_id', v_agent_id,
+        'version_id', v_version_id
+    );
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION install_template_agent FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION install_template_agent TO service_role;
+
+COMMENT ON FUNCTION install_template_agent IS 'Creates an agent and its initial version from a template and increments the template download count in one transaction';
+
+COMMIT;
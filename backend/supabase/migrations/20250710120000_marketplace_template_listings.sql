@@ -0,0 +1,123 @@
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Public templates in listing form. Refreshed by the backend whenever a template is
+-- published or unpublished (refresh_marketplace_template_listings, service role only).
+CREATE MATERIALIZED VIEW IF NOT EXISTS marketplace_template_listings AS
+SELECT
+    template_id,
+    name,
+    description,
+    mcp_requirements,
+    agentpress_tools,
+    COALESCE(tags, '{}') AS tags,
+    download_count,
+    marketplace_published_at,
+    created_at,
+    avatar,
+    avatar_color,
+    COALESCE(is_kortix_team, FALSE) AS is_kortix_team,
+    COALESCE(marketplace_published_at, created_at) AS sort_published_at,
+    lower(name || ' ' || COALESCE(description, '')) AS search_text
+FROM agent_templates
+WHERE is_public = TRUE;
+
+-- Required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_marketplace_template_listings_template_id
+    ON marketplace_template_listings(template_id);
+-- Matches the listing order, so keyset pages are index range scans
+CREATE INDEX IF NOT EXISTS idx_marketplace_template_listings_order
+    ON marketplace_template_listings(is_kortix_team DESC, sort_published_at DESC, template_id DESC);
+CREATE INDEX IF NOT EXISTS idx_marketplace_template_listings_tags
+    ON marketplace_template_listings USING gin(tags);
+CREATE INDEX IF NOT EXISTS idx_marketplace_template_listings_search
+    ON marketplace_template_listings USING gin(search_text gin_trgm_ops);
+
+CREATE OR REPLACE FUNCTION refresh_marketplace_template_listings()
+RETURNS VOID
+SECURITY DEFINER
+SET search_path = public
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY marketplace_template_listings;
+END;
+$$;
+
+-- One page of marketplace templates plus the total number of matches.
+-- Pass the cursor (last row's is_kortix_team, sort_published_at and template_id) for
+-- keyset pagination; p_offset is only applied when no cursor is given.
+-- download_count is read from agent_templates so installs show up without a refresh.
+CREATE OR REPLACE FUNCTION get_marketplace_template_listings(
+    p_search TEXT DEFAULT NULL,
+    p_tags TEXT[] DEFAULT NULL,
+    p_limit INTEGER DEFAULT 50,
+    p_offset INTEGER DEFAULT 0,
+    p_cursor_is_kortix_team BOOLEAN DEFAULT NULL,
+    p_cursor_published_at TIMESTAMPTZ DEFAULT NULL,
+    p_cursor_template_id UUID DEFAULT NULL
+)
+RETURNS JSONB
+SECURITY DEFINER
+SET search_path = public
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_templates JSONB;
+    v_total_count BIGINT;
+BEGIN
+    SELECT count(*) INTO v_total_count
+    FROM marketplace_template_listings l
+    WHERE (p_search IS NULL OR l.search_text LIKE '%' || lower(p_search) || '%')
+      AND (p_tags IS NULL OR l.tags && p_tags);
+
+    SELECT COALESCE(jsonb_agg(to_jsonb(page) ORDER BY page.is_kortix_team DESC, page.sort_published_at DESC, page.template_id DESC), '[]'::jsonb)
+    INTO v_templates
+    FROM (
+        SELECT
+            l.template_id,
+            l.name,
+            l.description,
+            l.mcp_requirements,
+            l.agentpress_tools,
+            l.tags,
+            COALESCE(t.download_count, l.download_count) AS download_count,
+            l.marketplace_published_at,
+            l.created_at,
+            l.avatar,
+            l.avatar_color,
+            l.is_kortix_team,
+            l.sort_published_at
+        FROM marketplace_template_listings l
+        LEFT JOIN agent_templates t ON t.template_id = l.template_id
+        WHERE (p_search IS NULL OR l.search_text LIKE '%' || lower(p_search) || '%')
+          AND (p_tags IS NULL OR l.tags && p_tags)
+          AND (
+              p_cursor_template_id IS NULL
+              OR (l.is_kortix_team, l.sort_published_at, l.template_id)
+                 < (p_cursor_is_kortix_team, p_cursor_published_at, p_cursor_template_id)
+          )
+        ORDER BY l.is_kortix_team DESC, l.sort_published_at DESC, l.template_id DESC
+        OFFSET CASE WHEN p_cursor_template_id IS NULL THEN GREATEST(p_offset, 0) ELSE 0 END
+        LIMIT p_limit
+    ) page;
+
+    RETURN jsonb_build_object(
+        'templates', v_templates,
+        'total_count', v_total_count
+    );
+END;
+$$;
+
+GRANT SELECT ON marketplace_template_listings TO authenticated, service_role;
+GRANT EXECUTE ON FUNCTION get_marketplace_template_listings TO authenticated, service_role;
+REVOKE EXECUTE ON FUNCTION refresh_marketplace_template_listings FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION refresh_marketplace_template_listings TO service_role;
+
+COMMENT ON MATERIALIZED VIEW marketplace_template_listings IS 'Public agent templates with precomputed sort key and search text for marketplace listings';
+COMMENT ON FUNCTION get_marketplace_template_listings IS 'Returns one keyset-paginated page of marketplace templates and the total match count';
+COMMENT ON FUNCTION refresh_marketplace_template_listings IS 'Refreshes the marketplace listing view after templates are published or unpublished';
+
+COMMIT;
@@ -0,0 +1,161 @@
+BEGIN;
+
+-- Tool presence helpers used by the generated columns below. They only look at
+-- their arguments, so they are safe to mark IMMUTABLE.
+CREATE OR REPLACE FUNCTION agent_mcp_names(p_configured_mcps JSONB)
+RETURNS TEXT[]
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT COALESCE(array_agg(mcp->>'name'), '{}')
+    FROM jsonb_array_elements(
+        CASE WHEN jsonb_typeof(p_configured_mcps) = 'array' THEN p_configured_mcps ELSE '[]'::jsonb END
+    ) AS mcp
+    WHERE jsonb_typeof(mcp) = 'object' AND mcp ? 'name';
+$$;
+
+CREATE OR REPLACE FUNCTION agent_enabled_agentpress_tools(p_agentpress_tools JSONB)
+RETURNS TEXT[]
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT COALESCE(array_agg(tool.key ORDER BY tool.key), '{}')
+    FROM jsonb_each(
+        CASE WHEN jsonb_typeof(p_agentpress_tools) = 'object' THEN p_agentpress_tools ELSE '{}'::jsonb END
+    ) AS tool
+    WHERE jsonb_typeof(tool.value) = 'object' AND tool.value->'enabled' = 'true'::jsonb;
+$$;
+
+-- 'mcp:<name>' for each configured MCP and 'agentpress:<tool>' for each enabled tool
+CREATE OR REPLACE FUNCTION agent_tool_names(p_configured_mcps JSONB, p_agentpress_tools JSONB)
+RETURNS TEXT[]
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT ARRAY(SELECT 'mcp:' || name FROM unnest(agent_mcp_names(p_configured_mcps)) AS name)
+        || ARRAY(SELECT 'agentpress:' || name FROM unnest(agent_enabled_agentpress_tools(p_agentpress_tools)) AS name);
+$$;
+
+ALTER TABLE agents ADD COLUMN IF NOT EXISTS has_mcp_tools BOOLEAN
+    GENERATED ALWAYS AS (
+        CASE WHEN jsonb_typeof(configured_mcps) = 'array' THEN jsonb_array_length(configured_mcps) > 0 ELSE FALSE END
+    ) STORED;
+ALTER TABLE agents ADD COLUMN IF NOT EXISTS has_agentpress_tools BOOLEAN
+    GENERATED ALWAYS AS (cardinality(agent_enabled_agentpress_tools(agentpress_tools)) > 0) STORED;
+ALTER TABLE agents ADD COLUMN IF NOT EXISTS tool_names TEXT[]
+    GENERATED ALWAYS AS (agent_tool_names(configured_mcps, agentpress_tools)) STORED;
+ALTER TABLE agents ADD COLUMN IF NOT EXISTS tools_count INTEGER
+    GENERATED ALWAYS AS (
+        CASE WHEN jsonb_typeof(configured_mcps) = 'array' THEN jsonb_array_length(configured_mcps) ELSE 0 END
+        + cardinality(agent_enabled_agentpress_tools(agentpress_tools))
+    ) STORED;
+
+-- Keyset pagination needs non-null sort keys
+UPDATE agents SET created_at = NOW() WHERE created_at IS NULL;
+UPDATE agents SET updated_at = created_at WHERE updated_at IS NULL;
+ALTER TABLE agents ALTER COLUMN created_at SET NOT NULL;
+ALTER TABLE agents ALTER COLUMN updated_at SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_agents_account_created_at ON agents(account_id, created_at, agent_id);
+CREATE INDEX IF NOT EXISTS idx_agents_account_updated_at ON agents(account_id, updated_at, agent_id);
+CREATE INDEX IF NOT EXISTS idx_agents_account_name ON agents(account_id, name, agent_id);
+CREATE INDEX IF NOT EXISTS idx_agents_account_tools_count ON agents(account_id, tools_count, agent_id);
+CREATE INDEX IF NOT EXISTS idx_agents_account_has_mcp_tools ON agents(account_id, has_mcp_tools);
+CREATE INDEX IF NOT EXISTS idx_agents_account_has_agentpress_tools ON agents(account_id, has_agentpress_tools);
+CREATE INDEX IF NOT EXISTS idx_agents_tool_names ON agents USING gin(tool_names);
+
+-- One page of an account's agents, each with its current version joined in, plus the
+-- total number of matching agents. Runs with the caller's privileges, so row level
+-- security still applies. Pass the sort value and agent_id of the previous page's
+-- last row as the cursor for keyset pagination; p_offset is only used without one.
+CREATE OR REPLACE FUNCTION get_account_agents(
+    p_account_id UUID,
+    p_search TEXT DEFAULT NULL,
+    p_has_default BOOLEAN DEFAULT NULL,
+    p_has_mcp_tools BOOLEAN DEFAULT NULL,
+    p_has_agentpress_tools BOOLEAN DEFAULT NULL,
+    p_tools TEXT[] DEFAULT NULL,
+    p_sort_by TEXT DEFAULT 'created_at',
+    p_sort_order TEXT DEFAULT 'desc',
+    p_limit INTEGER DEFAULT 20,
+    p_offset INTEGER DEFAULT 0,
+    p_cursor_value TEXT DEFAULT NULL,
+    p_cursor_agent_id UUID DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_sort_column TEXT;
+    v_sort_type TEXT;
+    v_direction TEXT;
+    v_where TEXT;
+    v_total BIGINT;
+    v_agents JSONB;
+BEGIN
+    v_sort_column := CASE p_sort_by
+        WHEN 'name' THEN 'name'
+        WHEN 'updated_at' THEN 'updated_at'
+        WHEN 'tools_count' THEN 'tools_count'
+        ELSE 'created_at'
+    END;
+    v_sort_type := CASE v_sort_column
+        WHEN 'name' THEN 'text'
+        WHEN 'tools_count' THEN 'integer'
+        ELSE 'timestamptz'
+    END;
+    v_direction := CASE WHEN lower(p_sort_order) = 'asc' THEN 'ASC' ELSE 'DESC' END;
+
+    v_where := 'a.account_id = $1'
+        || ' AND ($2::text IS NULL OR a.name ILIKE ''%'' || $2 || ''%'' OR a.description ILIKE ''%'' || $2 || ''%'')'
+        || ' AND ($3::boolean IS NULL OR a.is_default = $3)'
+        || ' AND ($4::boolean IS NULL OR a.has_mcp_tools = $4)'
+        || ' AND ($5::boolean IS NULL OR a.has_agentpress_tools = $5)'
+        || ' AND ($6::text[] IS NULL OR a.tool_names && $6)';
+
+    EXECUTE 'SELECT count(*) FROM agents a WHERE ' || v_where
+    INTO v_total
+    USING p_account_id, p_search, p_has_default, p_has_mcp_tools, p_has_agentpress_tools, p_tools;
+
+    EXECUTE format(
+        'SELECT COALESCE(jsonb_agg(page.agent ORDER BY page.sort_value %1$s, page.agent_id %1$s), ''[]''::jsonb)
+         FROM (
+             SELECT a.%2$I AS sort_value,
+                    a.agent_id,
+                    to_jsonb(a) || jsonb_build_object(''current_version'', to_jsonb(v)) AS agent
+             FROM agents a
+             LEFT JOIN agent_versions v ON v.version_id = a.current_version_id
+             WHERE %3$s
+               AND ($9::uuid IS NULL OR (a.%2$I, a.agent_id) %4$s ($10::%5$s, $9))
+             ORDER BY a.%2$I %1$s, a.agent_id %1$s
+             OFFSET $8
+             LIMIT $7
+         ) page',
+        v_direction,
+        v_sort_column,
+        v_where,
+        CASE v_direction WHEN 'ASC' THEN '>' ELSE '<' END,
+        v_sort_type
+    )
+    INTO v_agents
+    USING p_account_id, p_search, p_has_default, p_has_mcp_tools, p_has_agentpress_tools, p_tools,
+          p_limit, CASE WHEN p_cursor_agent_id IS NULL THEN GREATEST(p_offset, 0) ELSE 0 END,
+          p_cursor_agent_id, p_cursor_value;
+
+    RETURN jsonb_build_object(
+        'agents', v_agents,
+        'total', v_total
+    );
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION get_account_agents TO authenticated, service_role;
+
+COMMENT ON COLUMN agents.has_mcp_tools IS 'Generated: agent has at least one configured MCP server';
+COMMENT ON COLUMN agents.has_agentpress_tools IS 'Generated: agent has at least one enabled AgentPress tool';
+COMMENT ON COLUMN agents.tool_names IS 'Generated: mcp:<name> and agentpress:<tool> entries used for tool filters';
+COMMENT ON COLUMN agents.tools_count IS 'Generated: configured MCP servers plus enabled AgentPress tools';
+COMMENT ON FUNCTION get_account_agents IS 'Returns one filtered, sorted, keyset-paginated page of an account''s agents with their current versions and the total count';
+
+COMMIT;
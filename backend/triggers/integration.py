@@ -7,6 +7,7 @@ from .core import TriggerResult, TriggerEvent
 from services.supabase import DBConnection
 from utils.logger import logger
 from agent.run_agent import get_stream_context, run_agent_run_stream
+from agent.config_cache import get_agent_config
 
 class TriggerExecutor:
     def __init__(self, db_connection: DBConnection):
@@ -128,33 +129,8 @@ class WorkflowTriggerExecutor:
     
     async def _get_agent_config(self, agent_id: str) -> Optional[Dict[str, Any]]:
         client = await self.db.client
-        
-        result = await client.table('agents').select(
-            '*, agent_versions!current_version_id(*)'
-        ).eq('agent_id', agent_id).execute()
-        
-        if not result.data:
-            return None
-        
-        agent_data = result.data[0]
-        
-        # Use version data if available
-        if agent_data.get('agent_versions'):
-            version_data = agent_data['agent_versions']
-            return {
-                'agent_id': agent_data['agent_id'],
-                'name': agent_data['name'],
-                'description': agent_data.get('description'),
-                'system_prompt': version_data['system_prompt'],
-                'configured_mcps': version_data.get('configured_mcps', []),
-                'custom_mcps': version_data.get('custom_mcps', []),
-                'agentpress_tools': version_data.get('agentpress_tools', {}),
-                'account_id': agent_data['account_id'],
-                'current_version_id': agent_data.get('current_version_id'),
-                'version_name': version_data.get('version_name', 'v1')
-            }
-        
-        return agent_data
+        # Resolved once per agent version and shared with run start through the config cache
+        return await get_agent_config(client, agent_id)
     
     async def _create_workflow_thread(
         self,
@@ -551,34 +527,8 @@ class AgentTriggerExecutor:
     async def _get_agent_config(self, agent_id: str) -> Optional[Dict[str, Any]]:
         """Get agent configuration from database."""
         client = await self.db.client
-        
-        # Get agent with current version
-        result = await client.table('agents').select(
-            '*, agent_versions!current_version_id(*)'
-        ).eq('agent_id', agent_id).execute()
-        
-        if not result.data:
-            return None
-        
-        agent_data = result.data[0]
-        
-        # Use version data if available
-        if agent_data.get('agent_versions'):
-            version_data = agent_data['agent_versions']
-            return {
-                'agent_id': agent_data['agent_id'],
-                'name': agent_data['name'],
-                'description': agent_data.get('description'),
-                'system_prompt': version_data['system_prompt'],
-                'configured_mcps': version_data.get('configured_mcps', []),
-                'custom_mcps': version_data.get('custom_mcps', []),
-                'agentpress_tools': version_data.get('agentpress_tools', {}),
-                'account_id': agent_data['account_id'],
-                'current_version_id': agent_data.get('current_version_id'),
-                'version_name': version_data.get('version_name', 'v1')
-            }
-        
-        return agent_data
+        # Resolved once per agent version and shared with run start through the config cache
+        return await get_agent_config(client, agent_id)
     
     async def _create_trigger_thread(
         self,
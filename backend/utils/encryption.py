@@ -4,50 +4,72 @@ Simple encryption utilities for Pipedream credential profiles.
 
 import os
 import base64
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
 from cryptography.fernet import Fernet
 from utils.logger import logger
 
+# Decrypted credential configs are kept in process memory only, for a short time
+CREDENTIAL_CACHE_TTL = 300
+CREDENTIAL_CACHE_MAX_ENTRIES = 1024
+
+_encryption_key: Optional[bytes] = None
+_cipher: Optional[Fernet] = None
+
 
 def get_encryption_key() -> bytes:
-    """Get or create encryption key for credentials."""
+    """Get or create encryption key for credentials. The key is resolved once per process."""
+    global _encryption_key
+    if _encryption_key is not None:
+        return _encryption_key
+
     key_env = os.getenv("MCP_CREDENTIAL_ENCRYPTION_KEY")
-    
+
     if key_env:
         try:
             if isinstance(key_env, str):
-                return key_env.encode('utf-8')
+                _encryption_key = key_env.encode('utf-8')
             else:
-                return key_env
+                _encryption_key = key_env
+            return _encryption_key
         except Exception as e:
             logger.error(f"Invalid encryption key: {e}")
-    
+
     # Generate a new key as fallback
     logger.warning("No encryption key found, generating new key for this session")
-    key = Fernet.generate_key()
+    _encryption_key = Fernet.generate_key()
     logger.info(f"Generated new encryption key. Set this in your environment:")
-    logger.info(f"MCP_CREDENTIAL_ENCRYPTION_KEY={key.decode()}")
-    return key
+    logger.info(f"MCP_CREDENTIAL_ENCRYPTION_KEY={_encryption_key.decode()}")
+    return _encryption_key
+
+
+def get_cipher() -> Fernet:
+    """Fernet instance for the credential key, constructed once per process."""
+    global _cipher
+    if _cipher is None:
+        _cipher = Fernet(get_encryption_key())
+    return _cipher
 
 
 def encrypt_data(data: str) -> str:
     """
     Encrypt a string and return base64 encoded encrypted data.
-    
+
     Args:
         data: String data to encrypt
-        
+
     Returns:
         Base64 encoded encrypted string
     """
-    encryption_key = get_encryption_key()
-    cipher = Fernet(encryption_key)
-    
+    cipher = get_cipher()
+
     # Convert string to bytes
     data_bytes = data.encode('utf-8')
-    
+
     # Encrypt the data
     encrypted_bytes = cipher.encrypt(data_bytes)
-    
+
     # Return base64 encoded string
     return base64.b64encode(encrypted_bytes).decode('utf-8')
 
@@ -55,21 +77,106 @@ def encrypt_data(data: str) -> str:
 def decrypt_data(encrypted_data: str) -> str:
     """
     Decrypt base64 encoded encrypted data and return the original string.
-    
+
     Args:
         encrypted_data: Base64 encoded encrypted string
-        
+
     Returns:
         Decrypted string
     """
-    encryption_key = get_encryption_key()
-    cipher = Fernet(encryption_key)
-    
+    cipher = get_cipher()
+
     # Decode base64 to get encrypted bytes
     encrypted_bytes = base64.b64decode(encrypted_data.encode('utf-8'))
-    
+
     # Decrypt the data
     decrypted_bytes = cipher.decrypt(encrypted_bytes)
-    
+
     # Return as string
-    return decrypted_bytes.decode('utf-8') 
\ No newline at end of file
+    return decrypted_bytes.decode('utf-8')
+
+
+class DecryptedCredentialCache:
+    """Process-local cache of decrypted credential configs.
+
+    Entries are keyed by profile ID and hold a version built from the row's
+    updated_at and config_hash, so a changed row never returns an old plaintext.
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted beyond `max_entries`. Nothing is written outside process memory.
+    """
+
+    def __init__(self, ttl: int = CREDENTIAL_CACHE_TTL, max_entries: int = CREDENTIAL_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, str, float]]" = OrderedDict()
+
+    @staticmethod
+    def version(profile_data: dict) -> str:
+        return f"{profile_data.get('updated_at')}:{profile_data.get('config_hash')}"
+
+    def get(self, profile_id: str, version: str) -> Optional[str]:
+        entry = self._entries.get(profile_id)
+        if entry is None:
+            return None
+        cached_version, plaintext, expires_at = entry
+        if cached_version != version or time.monotonic() >= expires_at:
+            del self._entries[profile_id]
+            return None
+        self._entries.move_to_end(profile_id)
+        return plaintext
+
+    def set(self, profile_id: str, version: str, plaintext: str) -> None:
+        self._entries[profile_id] = (version, plaintext, time.monotonic() + self.ttl)
+        self._entries.move_to_end(profile_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, profile_id: str) -> None:
+        self._entries.pop(str(profile_id), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+credential_cache = DecryptedCredentialCache()
+
+
+def decrypt_profile_config(profile_data: dict, decrypt: Optional[Callable[[dict], str]] = None) -> str:
+    """Decrypt a profile row's encrypted_config, reusing a cached plaintext when the row is unchanged.
+
+    `decrypt` turns the row into plaintext on a cache miss; it defaults to decrypt_data
+    on the row's encrypted_config.
+    """
+    profile_id = str(profile_data['profile_id'])
+    version = DecryptedCredentialCache.version(profile_data)
+    plaintext = credential_cache.get(profile_id, version)
+    if plaintext is None:
+        if decrypt is None:
+            plaintext = decrypt_data(profile_data['encrypted_config'])
+        else:
+            plaintext = decrypt(profile_data)
+        credential_cache.set(profile_id, version, plaintext)
+    return plaintext
+
+
+if __name__ == "__main__":
+    # Micro-benchmark of the decrypt path: python -m utils.encryption
+    import json
+    import timeit
+
+    iterations = 2000
+    config_json = json.dumps({"app_slug": "slack", "external_user_id": "user_123", "enabled_tools": ["send_message"] * 10})
+    encrypted = encrypt_data(config_json)
+    row = {"profile_id": "benchmark", "encrypted_config": encrypted, "updated_at": "now", "config_hash": "hash"}
+    key = get_encryption_key()
+
+    def uncached_per_call_cipher():
+        Fernet(key).decrypt(base64.b64decode(encrypted.encode('utf-8'))).decode('utf-8')
+
+    results = {
+        "Fernet built per call (previous)": timeit.timeit(uncached_per_call_cipher, number=iterations),
+        "shared Fernet instance": timeit.timeit(lambda: decrypt_data(encrypted), number=iterations),
+        "decrypted credential cache": timeit.timeit(lambda: decrypt_profile_config(row), number=iterations),
+    }
+    for name, seconds in results.items():
+        print(f"{name:36s} {seconds / iterations * 1e6:8.2f} us/decrypt")
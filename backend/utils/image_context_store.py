@@ -0,0 +1,135 @@
+"""
+Blob storage for images the agent asked to see.
+
+The vision tool stores the compressed image here and writes only a small reference
+into the `image_context` message; the agent run resolves the reference to a URL (or
+a data URL for providers that can't fetch URLs) right before the next LLM call, and
+deletes the image once that call has completed.
+
+Images are stored in a private Supabase storage bucket by default. Setting
+IMAGE_CONTEXT_STORE=local keeps them on the local filesystem instead, which is
+useful for tests and local development without storage.
+"""
+
+import base64
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from uuid import uuid4
+
+from services.supabase import DBConnection
+from utils.logger import logger
+
+IMAGE_CONTEXT_STORE = os.getenv("IMAGE_CONTEXT_STORE", "supabase")
+IMAGE_CONTEXT_BUCKET = "image-context"
+IMAGE_CONTEXT_LOCAL_DIR = os.getenv(
+    "IMAGE_CONTEXT_LOCAL_DIR", os.path.join(tempfile.gettempdir(), "image-context")
+)
+# Lifetime of signed URLs handed to LLM providers
+SIGNED_URL_TTL = 3600
+# Signed URLs are reused until they are this close to expiring
+SIGNED_URL_REFRESH_MARGIN = 300
+SIGNED_URL_CACHE_MAX_ENTRIES = 1024
+
+IMAGE_EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+
+_signed_urls: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+
+def _object_key(thread_id: str, mime_type: str) -> str:
+    """Unique key per stored image, so deleting one reference never affects another."""
+    return f"{thread_id}/{uuid4().hex}.{IMAGE_EXTENSIONS.get(mime_type, 'bin')}"
+
+
+def _cache_signed_url(key: str, url: str):
+    """Remember a signed URL, dropping expired entries and the least recently used beyond the cap."""
+    now = time.time()
+    for cached_key in [k for k, (_, expires_at) in _signed_urls.items() if expires_at <= now]:
+        del _signed_urls[cached_key]
+    _signed_urls[key] = (url, now + SIGNED_URL_TTL)
+    _signed_urls.move_to_end(key)
+    while len(_signed_urls) > SIGNED_URL_CACHE_MAX_ENTRIES:
+        _signed_urls.popitem(last=False)
+
+
+async def store_image_context(thread_id: str, image_bytes: bytes, mime_type: str) -> Dict[str, Any]:
+    """Store an image and return the reference to keep in the image_context message.
+
+    Returns:
+        Dict with `store`, `key` and `mime_type`
+    """
+    key = _object_key(thread_id, mime_type)
+    if IMAGE_CONTEXT_STORE == "local":
+        path = os.path.join(IMAGE_CONTEXT_LOCAL_DIR, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(image_bytes)
+    else:
+        db = DBConnection()
+        client = await db.client
+        await client.storage.from_(IMAGE_CONTEXT_BUCKET).upload(
+            key,
+            image_bytes,
+            {"content-type": mime_type, "upsert": "true"}
+        )
+    logger.debug(f"Stored image context {key} ({len(image_bytes)} bytes) in {IMAGE_CONTEXT_STORE} store")
+    return {"store": IMAGE_CONTEXT_STORE, "key": key, "mime_type": mime_type}
+
+
+async def load_image_context(reference: Dict[str, Any]) -> bytes:
+    """Read the stored image bytes for a reference."""
+    if reference["store"] == "local":
+        with open(os.path.join(IMAGE_CONTEXT_LOCAL_DIR, reference["key"]), "rb") as f:
+            return f.read()
+    db = DBConnection()
+    client = await db.client
+    return await client.storage.from_(IMAGE_CONTEXT_BUCKET).download(reference["key"])
+
+
+async def get_image_context_url(reference: Dict[str, Any], allow_remote_url: bool = True) -> Optional[str]:
+    """Resolve a reference to a URL an LLM provider can read.
+
+    Returns a (cached) signed URL when `allow_remote_url` is set and the image is in
+    object storage; otherwise the image is loaded and returned as a data URL.
+    """
+    key = reference["key"]
+    if allow_remote_url and reference["store"] != "local":
+        cached = _signed_urls.get(key)
+        if cached and cached[1] - time.time() > SIGNED_URL_REFRESH_MARGIN:
+            _signed_urls.move_to_end(key)
+            return cached[0]
+        db = DBConnection()
+        client = await db.client
+        signed = await client.storage.from_(IMAGE_CONTEXT_BUCKET).create_signed_url(key, SIGNED_URL_TTL)
+        url = signed.get("signedURL") or signed.get("signedUrl")
+        if url:
+            _cache_signed_url(key, url)
+            return url
+        logger.warning(f"Could not create a signed URL for image context {key}, falling back to inline data")
+
+    image_bytes = await load_image_context(reference)
+    return f"data:{reference['mime_type']};base64,{base64.b64encode(image_bytes).decode('utf-8')}"
+
+
+async def delete_image_context(reference: Dict[str, Any]):
+    """Delete a stored image once the LLM call it was attached to has completed."""
+    key = reference["key"]
+    _signed_urls.pop(key, None)
+    try:
+        if reference["store"] == "local":
+            os.remove(os.path.join(IMAGE_CONTEXT_LOCAL_DIR, key))
+        else:
+            db = DBConnection()
+            client = await db.client
+            await client.storage.from_(IMAGE_CONTEXT_BUCKET).remove([key])
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Failed to delete image context {key}: {str(e)}")